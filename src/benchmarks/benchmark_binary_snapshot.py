@@ -0,0 +1,34 @@
+import pickle
+import random
+import time
+
+from src.domain.grade import Grade
+from src.repository.binary_snapshot import encode_grades, decode_grades
+
+NUMBER_OF_GRADES = 1000000
+
+
+def run_benchmark():
+    """
+    Compare the size and the load time of 1M grades stored with pickle and with the binary snapshot format
+    """
+    grades = [Grade(grade_index // 1000, grade_index % 1000, random.choice([None, 4, 7, 10]))
+              for grade_index in range(NUMBER_OF_GRADES)]
+    pickled_grades = pickle.dumps(grades)
+    snapshot = encode_grades(grades)
+
+    start_time = time.perf_counter()
+    pickle.loads(pickled_grades)
+    pickle_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    decode_grades(snapshot)
+    snapshot_time = time.perf_counter() - start_time
+
+    print("format".ljust(10) + "bytes".rjust(12) + "load seconds".rjust(14))
+    print("pickle".ljust(10) + str(len(pickled_grades)).rjust(12) + ("%.3f" % pickle_time).rjust(14))
+    print("snapshot".ljust(10) + str(len(snapshot)).rjust(12) + ("%.3f" % snapshot_time).rjust(14))
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,58 @@
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from src.domain.grade import Grade
+from src.repository.grade_repository import GradeRepository, GradeColumnarRepository
+
+NUMBER_OF_GRADES = 1000000
+
+
+def run_benchmark():
+    """
+    Compare the memory used by 1M grades kept as objects and kept in the columnar grade store, the time needed to
+    reopen the columnar file and the time of the average grade ranking
+    """
+    grade_values = [random.choice([None, 4, 7, 10]) for grade_index in range(NUMBER_OF_GRADES)]
+    directory = tempfile.TemporaryDirectory()
+    grades_file = os.path.join(directory.name, "grades.col")
+
+    tracemalloc.start()
+    object_repository = GradeRepository()
+    for grade_index in range(NUMBER_OF_GRADES):
+        object_repository.add_grade(Grade(grade_index // 1000, grade_index % 1000, grade_values[grade_index]))
+    object_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    columnar_repository = GradeColumnarRepository(grades_file)
+    for grade_index in range(NUMBER_OF_GRADES):
+        columnar_repository.add_grade(Grade(grade_index // 1000, grade_index % 1000, grade_values[grade_index]))
+    columnar_repository.close()
+
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    columnar_repository = GradeColumnarRepository(grades_file)
+    open_time = time.perf_counter() - start_time
+    columnar_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start_time = time.perf_counter()
+    object_repository.get_students_sorted_descending_by_average_grade()
+    object_ranking_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    columnar_repository.get_students_sorted_descending_by_average_grade()
+    columnar_ranking_time = time.perf_counter() - start_time
+
+    print("repository".ljust(12) + "heap bytes".rjust(14) + "open seconds".rjust(14) + "ranking seconds".rjust(17))
+    print("objects".ljust(12) + str(object_memory).rjust(14) + "-".rjust(14) +
+          ("%.3f" % object_ranking_time).rjust(17))
+    print("columnar".ljust(12) + str(columnar_memory).rjust(14) + ("%.4f" % open_time).rjust(14) +
+          ("%.3f" % columnar_ranking_time).rjust(17))
+    columnar_repository.close()
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,194 @@
+import io
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+from src.repository.assigment_repository import AssignmentRepository, AssignmentRepositoryException
+from src.repository.grade_repository import GradeRepository, GradeRepositoryException
+from src.repository.student_repository import StudentRepository, StudentRepositoryException
+from src.repository.undo_redo_repository import UndoRedoRepository
+from src.services.assignment_service import AssignmentService
+from src.services.grade_service import GradeService
+from src.services.statistics_cache import StatisticsCache
+from src.services.student_service import StudentService, STUDENT_NAMES
+from src.services.transaction_service import TransactionService
+from src.services.undo_redo_service import UndoRedoService, UndoRedoServiceException
+
+NUMBER_OF_WORKERS = 16
+OPERATIONS_PER_WORKER = 2000
+NUMBER_OF_STUDENTS = 2000
+NUMBER_OF_ASSIGNMENTS = 50
+ASSIGNMENTS_PER_STUDENT = 10
+# the errors a worker expects, e.g. grading a student who was just removed by another worker
+REJECTED_ERRORS = (StudentRepositoryException, AssignmentRepositoryException, GradeRepositoryException,
+                   UndoRedoServiceException)
+# operation -> share of the operations of a worker
+OPERATION_MIX = (("grade", 55), ("give", 15), ("report", 10), ("list", 10), ("remove student", 5), ("undo", 3),
+                 ("redo", 2))
+
+
+class Services:
+    def __init__(self):
+        """
+        Build in-memory repositories and services which share one undo history, filled with students, assignments and
+        the grades given to every student
+        """
+        self.student_repository = StudentRepository()
+        self.assignment_repository = AssignmentRepository()
+        self.grade_repository = GradeRepository()
+        self.undo_redo_service = UndoRedoService(UndoRedoRepository(max_operations=None),
+                                                 (self.student_repository, self.assignment_repository,
+                                                  self.grade_repository))
+        self.student_service = StudentService(self.student_repository, self.undo_redo_service)
+        self.assignment_service = AssignmentService(self.assignment_repository, self.undo_redo_service)
+        self.grade_service = GradeService(self.grade_repository, self.student_repository,
+                                          self.assignment_repository, self.undo_redo_service,
+                                          statistics_cache=StatisticsCache())
+        self.transaction_service = TransactionService(self.student_repository, self.assignment_repository,
+                                                      self.grade_repository, self.undo_redo_service)
+        for assignment_id in range(NUMBER_OF_ASSIGNMENTS):
+            # half of the deadlines have passed, so the late students report isn't empty
+            self.assignment_service.add_assignment(assignment_id, "Assignment " + str(assignment_id),
+                                                   date.today() + timedelta(days=assignment_id - 25))
+        for student_id in range(NUMBER_OF_STUDENTS):
+            self.student_service.add_student(student_id, STUDENT_NAMES[student_id % len(STUDENT_NAMES)],
+                                             911 + student_id % 7)
+            for assignment_index in range(ASSIGNMENTS_PER_STUDENT):
+                self.grade_service.add_grade((student_id + assignment_index) % NUMBER_OF_ASSIGNMENTS, student_id)
+
+
+def run_worker(services, worker_index):
+    """
+    Run the operations of a teaching assistant: mostly grading and giving assignments, with reports, listings,
+    removals of students, undo and redo in between
+    :param services: a Services object shared by all the workers
+    :param worker_index: a integer, the seed of the random operations of the worker
+    :return: a dictionary operation -> [number of done operations, number of rejected operations]
+    """
+    generator = random.Random(worker_index)
+    operations = [operation for operation, share in OPERATION_MIX for _ in range(share)]
+    worker_counts = dict((operation, [0, 0]) for operation, share in OPERATION_MIX)
+    for _ in range(OPERATIONS_PER_WORKER):
+        operation = generator.choice(operations)
+        student_id = generator.randrange(NUMBER_OF_STUDENTS)
+        assignment_id = generator.randrange(NUMBER_OF_ASSIGNMENTS)
+        try:
+            if operation == "grade":
+                # one of the assignments the student got at the start
+                assignment_id = (student_id + generator.randrange(ASSIGNMENTS_PER_STUDENT)) % NUMBER_OF_ASSIGNMENTS
+                services.grade_service.grade_student(assignment_id, student_id, generator.randint(1, 10))
+            elif operation == "give":
+                services.grade_service.give_assignment(assignment_id, student_id)
+            elif operation == "report":
+                report_name = generator.choice(("average ranking", "late students"))
+                services.grade_service.export_report(report_name, io.StringIO(), "csv")
+            elif operation == "list":
+                services.student_service.list_students()
+            elif operation == "remove student":
+                with services.transaction_service.transaction():
+                    services.student_service.check_valid_student(student_id)
+                    services.grade_service.remove_grades(student_id, 1)
+                    services.student_service.remove_student(student_id)
+            elif operation == "undo":
+                services.undo_redo_service.undo()
+            else:
+                services.undo_redo_service.redo()
+            worker_counts[operation][0] += 1
+        except REJECTED_ERRORS:
+            worker_counts[operation][1] += 1
+    return worker_counts
+
+
+def grade_key(grade):
+    return grade.assignment_id, grade.student_id
+
+
+def check_invariants(services):
+    """
+    Check that the repositories and the undo history are consistent after the workers stopped
+    :return: a list of strings which describe the broken invariants, empty if all of them hold
+    """
+    errors = []
+    student_data = services.student_repository.get_student_data()
+    assignment_data = services.assignment_repository.get_assignment_data()
+    grades = list(services.grade_repository.get_grade_data())
+    orphan_grades = [grade for grade in grades
+                     if grade.student_id not in student_data or grade.assignment_id not in assignment_data]
+    if len(orphan_grades) != 0:
+        errors.append(str(len(orphan_grades)) + " grades of removed students or assignments")
+    grades_by_student = dict()
+    for grade in grades:
+        grades_by_student.setdefault(grade.student_id, []).append(grade)
+    for student in student_data:
+        student_grades = grades_by_student.get(student.student_id, [])
+        if sorted(services.grade_repository.get_grades_of_student(student.student_id), key=grade_key) != \
+                sorted(student_grades, key=grade_key):
+            errors.append("the grade index of student " + str(student.student_id) + " is out of date")
+        graded_values = [grade.grade_value for grade in student_grades if grade.grade_value is not None]
+        expected_average = sum(graded_values) / len(graded_values) if len(graded_values) != 0 else None
+        average = services.grade_repository.get_average_grade_of_student(student.student_id)
+        if (average is None) != (expected_average is None) or \
+                average is not None and abs(average - expected_average) > 1e-9:
+            errors.append("the average of student " + str(student.student_id) + " is out of date")
+    ungraded_grades = [grade for grade in grades if grade.grade_value is None]
+    if sorted(services.grade_repository.get_ungraded_grades(), key=grade_key) != sorted(ungraded_grades, key=grade_key):
+        errors.append("the ungraded grades index is out of date")
+    students_in_groups = sum(len(services.student_repository.get_students_in_group(group))
+                             for group in range(911, 918))
+    if students_in_groups != len(student_data):
+        errors.append("the group index has " + str(students_in_groups) + " students instead of " +
+                      str(len(student_data)))
+    metrics = services.undo_redo_service.get_history_metrics()
+    if metrics["undoable_operations"] + metrics["redoable_operations"] != metrics["operations"]:
+        errors.append("the position in the undo history is out of range")
+    return errors
+
+
+def run_workers(number_of_workers):
+    """
+    Run the workers on fresh services, each on its own thread
+    :return: a tuple (seconds, dictionary operation -> [done, rejected], list of broken invariants)
+    """
+    services = Services()
+    counts = dict((operation, [0, 0]) for operation, share in OPERATION_MIX)
+    counts_lock = threading.Lock()
+
+    def run_counted_worker(worker_index):
+        worker_counts = run_worker(services, worker_index)
+        with counts_lock:
+            for operation, (done, rejected) in worker_counts.items():
+                counts[operation][0] += done
+                counts[operation][1] += rejected
+
+    workers = [threading.Thread(target=run_counted_worker, args=(worker_index,))
+               for worker_index in range(number_of_workers)]
+    start_time = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed_time = time.perf_counter() - start_time
+    return elapsed_time, counts, check_invariants(services)
+
+
+def run_benchmark():
+    """
+    Run the same mix of operations on 1 and on 16 workers, print the throughput of every operation and check the
+    invariants of the repositories after every run
+    """
+    for number_of_workers in (1, NUMBER_OF_WORKERS):
+        elapsed_time, counts, errors = run_workers(number_of_workers)
+        total_operations = number_of_workers * OPERATIONS_PER_WORKER
+        print(str(number_of_workers) + " workers: " + str(total_operations) + " operations in " +
+              ("%.3f" % elapsed_time) + " s, " + ("%.0f" % (total_operations / elapsed_time)) + " operations/s")
+        print("operation".ljust(16) + "done".rjust(8) + "rejected".rjust(10) + "ops/s".rjust(10))
+        for operation, (done, rejected) in counts.items():
+            print(operation.ljust(16) + str(done).rjust(8) + str(rejected).rjust(10) +
+                  ("%.0f" % ((done + rejected) / elapsed_time)).rjust(10))
+        print("invariants: " + ("ok" if len(errors) == 0 else "; ".join(errors[:10])))
+        print()
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,45 @@
+import time
+import tracemalloc
+
+from src.domain.grade import Grade
+
+NUMBER_OF_GRADES = 1000000
+
+
+class GradeWithDict(Grade):
+    """
+    A grade with a per-object __dict__, laid out like the grades were before they got __slots__
+    """
+    pass
+
+
+def measure_grades(grade_class):
+    """
+    Create 1M grades of a class
+    :param grade_class: the class of the grades
+    :return: a tuple (bytes per grade, seconds for comparing every grade with itself and with the next grade)
+    """
+    tracemalloc.start()
+    grades = [grade_class(grade_index // 1000, grade_index % 1000, grade_index % 10 + 1)
+              for grade_index in range(NUMBER_OF_GRADES)]
+    bytes_per_grade = tracemalloc.get_traced_memory()[0] / NUMBER_OF_GRADES
+    tracemalloc.stop()
+    start_time = time.perf_counter()
+    for grade, next_grade in zip(grades, grades[1:]):
+        grade == grade
+        grade == next_grade
+    return bytes_per_grade, time.perf_counter() - start_time
+
+
+def run_benchmark():
+    """
+    Compare the memory used by 1M grades with a __dict__ and with __slots__
+    """
+    print("grades".ljust(12) + "bytes/grade".rjust(14) + "compare seconds".rjust(18))
+    for name, grade_class in (("__dict__", GradeWithDict), ("__slots__", Grade)):
+        bytes_per_grade, compare_time = measure_grades(grade_class)
+        print(name.ljust(12) + ("%.1f" % bytes_per_grade).rjust(14) + ("%.3f" % compare_time).rjust(18))
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,35 @@
+import time
+
+from src.repository.iter_sort_filter import Iterator
+
+ENTITY_COUNTS = [1000, 10000, 100000, 1000000]
+
+
+def time_one_pass(number_of_entities):
+    """
+    Fill an Iterator container and measure one full pass over it
+    :param number_of_entities: a integer which represents how many entities are stored in the container
+    :return: the number of seconds needed for iterating over all the entities
+    """
+    container = Iterator()
+    for key in range(number_of_entities):
+        container[key] = key
+    start_time = time.perf_counter()
+    for entity in container:
+        pass
+    return time.perf_counter() - start_time
+
+
+def run_benchmark():
+    """
+    Print the time per pass and per entity; for a linear iteration the time per entity stays roughly constant
+    """
+    print("entities".rjust(10) + "seconds".rjust(12) + "ns/entity".rjust(12))
+    for number_of_entities in ENTITY_COUNTS:
+        elapsed_time = time_one_pass(number_of_entities)
+        print(str(number_of_entities).rjust(10) + ("%.4f" % elapsed_time).rjust(12) +
+              ("%.1f" % (elapsed_time / number_of_entities * 1e9)).rjust(12))
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,42 @@
+import os
+import random
+import tempfile
+import time
+
+from src.domain.grade import Grade
+from src.repository.grade_repository import GradeColumnarRepository
+from src.services.statistics_engine import StatisticsEngine
+
+NUMBER_OF_STUDENTS = 50000
+NUMBER_OF_ASSIGNMENTS = 100
+
+
+def run_benchmark():
+    """
+    Compare the time of the average grade ranking over 5M grades computed by the grade repository and by the numpy
+    statistics engine, and check that both give the same ranking
+    """
+    directory = tempfile.TemporaryDirectory()
+    grade_repository = GradeColumnarRepository(os.path.join(directory.name, "grades.col"))
+    for assignment_id in range(1, NUMBER_OF_ASSIGNMENTS + 1):
+        for student_id in range(NUMBER_OF_STUDENTS):
+            grade_repository.add_grade(Grade(assignment_id, student_id, random.choice([None, 4, 7, 10])))
+    statistics_engine = StatisticsEngine(grade_repository, None, None)
+
+    start_time = time.perf_counter()
+    repository_ranking = grade_repository.get_students_sorted_descending_by_average_grade()
+    repository_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    engine_ranking = statistics_engine.get_students_sorted_descending_by_average_grade()
+    engine_time = time.perf_counter() - start_time
+
+    print("same ranking: " + str(repository_ranking == engine_ranking))
+    print("repository".ljust(12) + ("%.3f" % repository_time).rjust(10) + " seconds")
+    print("numpy".ljust(12) + ("%.3f" % engine_time).rjust(10) + " seconds")
+    grade_repository.close()
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -1,4 +1,7 @@
 class Assignment:
+    # no per-object __dict__, the assignments only have these fields
+    __slots__ = ("_assignment_id", "_description", "_deadline")
+
     def __init__(self, assignment_id, description, deadline):
         """
         Initialize the assignment object
@@ -49,4 +52,15 @@ class Assignment:
         :param other: assigment object to compare
         :return: True, if they are equal, False otherwise
         """
-        return str(self) == str(other)
+        if not isinstance(other, Assignment):
+            return NotImplemented
+        return self._assignment_id == other._assignment_id and self._description == other._description and \
+            self._deadline == other._deadline
+
+    def __hash__(self):
+        """
+        Hash an assignment by its id, the only field which can't be modified, so the hash stays the same for its whole
+        life
+        :return: a integer
+        """
+        return hash(self._assignment_id)
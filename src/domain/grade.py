@@ -1,4 +1,7 @@
 class Grade:
+    # no per-object __dict__, the grades only have these fields
+    __slots__ = ("_assignment_id", "_student_id", "_grade_value")
+
     def __init__(self, assignment_id, student_id, grade_value=None):
         """
         Initialize the grade object
@@ -6,10 +9,9 @@ class Grade:
         :param student_id: integer, which represents the student id
         :param grade_value: integer, between 1 and 10, which represents the grade value
         """
-        self.check_valid_grade(grade_value)
         self._assignment_id = assignment_id
         self._student_id = student_id
-        self._grade_value = grade_value
+        self._grade_value = self.check_valid_grade(grade_value)
 
     @property
     def assignment_id(self):
@@ -25,14 +27,22 @@ class Grade:
 
     @grade_value.setter
     def grade_value(self, grade):
-        self.check_valid_grade(grade)
-        self._grade_value = grade
+        self._grade_value = self.check_valid_grade(grade)
 
     @staticmethod
     def check_valid_grade(grade):
-        if grade is not None:
-            if grade not in range(1, 11):
-                raise ValueError("Grade must be between 1 and 10")
+        """
+        Check a grade value in constant time; a whole float, e.g. 7.0, is a valid grade
+        :param grade: a number between 1 and 10, or None for an ungraded assignment
+        :return: the grade value as a integer, or None
+        :except ValueError, if the grade is not a whole number between 1 and 10
+        """
+        if grade is None:
+            return None
+        if not isinstance(grade, (int, float)) or isinstance(grade, bool) or not 1 <= grade <= 10 or \
+                grade != int(grade):
+            raise ValueError("Grade must be between 1 and 10")
+        return int(grade)
 
     def __str__(self):
         """
@@ -48,4 +58,15 @@ class Grade:
         :param other: grade object to compare
         :return: True, if they are equal, False otherwise
         """
-        return str(self) == str(other)
+        if not isinstance(other, Grade):
+            return NotImplemented
+        return self._assignment_id == other._assignment_id and self._student_id == other._student_id and \
+            self._grade_value == other._grade_value
+
+    def __hash__(self):
+        """
+        Hash a grade by its assignment id and student id, the fields which can't be modified, so the hash stays the
+        same for its whole life
+        :return: a integer
+        """
+        return hash((self._assignment_id, self._student_id))
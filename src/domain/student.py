@@ -1,4 +1,7 @@
 class Student:
+    # no per-object __dict__, the students only have these fields
+    __slots__ = ("_student_id", "_name", "_group")
+
     def __init__(self, student_id, name, group):
         """
         Initialize the student object
@@ -8,10 +11,9 @@ class Student:
         """
         self._check_student_id(student_id)
         self._check_name(name)
-        self._check_group(group)
         self._student_id = student_id
         self._name = name
-        self._group = group
+        self._group = self._check_group(group)
 
     @property
     def student_id(self):
@@ -32,8 +34,7 @@ class Student:
 
     @group.setter
     def group(self, group):
-        self._check_group(group)
-        self._group = group
+        self._group = self._check_group(group)
 
     @staticmethod
     def _check_name(name):
@@ -47,8 +48,15 @@ class Student:
 
     @staticmethod
     def _check_group(group):
-        if group not in range(911, 918):
+        """
+        Check a group number in constant time, like Grade.check_valid_grade; a whole float, e.g. 911.0, is valid
+        :return: the group number as a integer
+        :except ValueError, if the group is not a whole number between 911 and 917
+        """
+        if not isinstance(group, (int, float)) or isinstance(group, bool) or not 911 <= group <= 917 or \
+                group != int(group):
             raise ValueError("Group number must be between 911 and 917")
+        return int(group)
 
     def __str__(self):
         """
@@ -63,4 +71,13 @@ class Student:
         :param other: a student object to compare
         :return: True, if they are equal, False otherwise
         """
-        return str(self) == str(other)
+        if not isinstance(other, Student):
+            return NotImplemented
+        return self._student_id == other._student_id and self._name == other._name and self._group == other._group
+
+    def __hash__(self):
+        """
+        Hash a student by its id, the only field which can't be modified, so the hash stays the same for its whole life
+        :return: a integer
+        """
+        return hash(self._student_id)
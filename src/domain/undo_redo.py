@@ -1,3 +1,23 @@
+import sys
+
+
+def estimate_size(value):
+    """
+    Estimate the memory used by a value, together with the items of the lists, tuples, sets and dictionaries and the
+    fields of the objects with __slots__ it holds; the shared objects are counted every time they are held
+    :param value: any object
+    :return: a integer, a number of bytes
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    elif hasattr(type(value), "__slots__"):
+        size += sum(sys.getsizeof(getattr(value, slot)) for slot in type(value).__slots__ if hasattr(value, slot))
+    return size
+
+
 class Call:
     def __init__(self, function_name, *function_params):
         """
@@ -14,6 +34,12 @@ class Call:
         """
         self._function_name(*self._function_params)
 
+    def estimated_size(self):
+        """
+        :return: a integer, the estimated number of bytes used by the call and by the parameters it keeps alive
+        """
+        return sys.getsizeof(self) + estimate_size(self._function_params)
+
 
 class Operation:
     def __init__(self, undo_call, redo_call):
@@ -37,6 +63,12 @@ class Operation:
         """
         self._redo_call.call()
 
+    def estimated_size(self):
+        """
+        :return: a integer, the estimated number of bytes used by the operation and by the objects it keeps alive
+        """
+        return sys.getsizeof(self) + self._undo_call.estimated_size() + self._redo_call.estimated_size()
+
 
 class ComplexOperation:
     def __init__(self, operation):
@@ -46,11 +78,16 @@ class ComplexOperation:
         """
         self._operations = operation
 
+    @property
+    def operations(self):
+        return self._operations
+
     def undo(self):
         """
-        Call the undo function for every operation in the operations list
+        Call the undo function for every operation in the operations list, from the last one to the first one, so
+        an operation is undone only after the operations which were done after it
         """
-        for operation in self._operations:
+        for operation in reversed(self._operations):
             operation.undo()
 
     def redo(self):
@@ -60,4 +97,67 @@ class ComplexOperation:
         for operation in self._operations:
             operation.redo()
 
+    def estimated_size(self):
+        """
+        :return: a integer, the estimated number of bytes used by the operations and by the objects they keep alive
+        """
+        return sys.getsizeof(self) + sys.getsizeof(self._operations) + \
+            sum(operation.estimated_size() for operation in self._operations)
+
 
+# the operation codes of the undo records; the keys and the before/after values each operation keeps are described
+# in UndoRecordInterpreter
+ADD_STUDENTS = 1
+REMOVE_STUDENT = 2
+UPDATE_STUDENT_NAME = 3
+UPDATE_STUDENT_GROUP = 4
+ADD_ASSIGNMENTS = 5
+REMOVE_ASSIGNMENT = 6
+UPDATE_ASSIGNMENT_DESCRIPTION = 7
+UPDATE_ASSIGNMENT_DEADLINE = 8
+ADD_GRADES = 9
+GRADE = 10
+
+
+class UndoRecord:
+    # an undo record is kept for every modification in the history, so it has no per-object __dict__
+    __slots__ = ("_interpreter", "_op_code", "keys", "before", "after")
+
+    def __init__(self, interpreter, op_code, keys, before=None, after=None):
+        """
+        Initialize a compact undo record, which keeps only the data of a modification instead of the calls which undo
+        and redo it; the record is applied by an interpreter, which knows the repositories
+        :param interpreter: a UndoRecordInterpreter object which undoes and redoes the record
+        :param op_code: a integer, one of the operation codes of this module
+        :param keys: the key(s) of the modified entities; a bulk modification keeps them as arrays
+        :param before: the values of the modified fields before the modification, or None
+        :param after: the values of the modified fields after the modification, or None
+        """
+        self._interpreter = interpreter
+        self._op_code = op_code
+        self.keys = keys
+        self.before = before
+        self.after = after
+
+    @property
+    def op_code(self):
+        return self._op_code
+
+    def undo(self):
+        """
+        Undo the modification of the record
+        """
+        self._interpreter.undo(self)
+
+    def redo(self):
+        """
+        Redo the modification of the record
+        """
+        self._interpreter.redo(self)
+
+    def estimated_size(self):
+        """
+        :return: a integer, the estimated number of bytes used by the record and by the values it keeps
+        """
+        return sys.getsizeof(self) + estimate_size(self.keys) + estimate_size(self.before) + \
+            estimate_size(self.after)
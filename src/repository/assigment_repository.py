@@ -1,9 +1,15 @@
-import pickle
+from bisect import bisect_left, insort
+from contextlib import contextmanager, nullcontext
 
 from src.domain.assignment import Assignment
 from datetime import date
 
 from src.repository.iter_sort_filter import Iterator, filter_a_list
+from src.repository.binary_snapshot import encode_assignments, decode_assignments
+from src.repository.journal import Journal, JournalException
+from src.repository.sqlite_database import SqliteTable
+from src.repository.write_behind import WriteBehind
+from src.repository.read_write_lock import ReadWriteLock, reading, writing
 
 
 class AssignmentRepositoryException(Exception):
@@ -16,7 +22,15 @@ class AssignmentRepository():
         Intialize the repository for assignments
         """
         self._assignment_data = Iterator()
+        # sorted list of (deadline, assignment id)
+        self._assignments_by_deadline = []
+        # changes on every modification, so the cached statistics know when they are out of date
+        self._version = 0
+        # held for reading by the queries and for writing by the modifications, so the reports run together and the
+        # modifications one at a time
+        self._lock = ReadWriteLock()
 
+    @writing
     def add_assignment(self, assignment):
         """
         Add assignment object to assignment data
@@ -27,15 +41,21 @@ class AssignmentRepository():
             raise AssignmentRepositoryException(
                 "Assignment with id: " + str(assignment.assigment_id) + " already in repository")
         self._assignment_data[assignment.assigment_id] = assignment
+        insort(self._assignments_by_deadline, (assignment.deadline, assignment.assigment_id))
+        self._version += 1
 
+    @writing
     def remove_assignment(self, assignment_id):
         """
         Remove assignment object from asignment data
         :param assignment_id: an integer which indicates the assignment id
         """
         self.check_valid_assignment_id(assignment_id)
+        self._remove_from_deadline_index(self._assignment_data[assignment_id].deadline, assignment_id)
         del self._assignment_data[assignment_id]
+        self._version += 1
 
+    @writing
     def update_assignment_description(self, assignment_id, new_description):
         """
         Update the description of a assignment object
@@ -44,7 +64,9 @@ class AssignmentRepository():
         """
         self.check_valid_assignment_id(assignment_id)
         self._assignment_data[assignment_id].description = new_description
+        self._version += 1
 
+    @writing
     def update_assignment_deadline(self, assignment_id, new_deadline):
         """
         Update the deadline of a assignment object
@@ -52,8 +74,13 @@ class AssignmentRepository():
         :param new_deadline: a datetime object that must replace the old date of the assignment object
         """
         self.check_valid_assignment_id(assignment_id)
-        self._assignment_data[assignment_id].deadline = new_deadline
+        assignment = self._assignment_data[assignment_id]
+        self._remove_from_deadline_index(assignment.deadline, assignment_id)
+        assignment.deadline = new_deadline
+        insort(self._assignments_by_deadline, (new_deadline, assignment_id))
+        self._version += 1
 
+    @reading
     def check_valid_assignment_id(self, assignment_id):
         """
         Check if a assignment is present in the repository
@@ -67,14 +94,81 @@ class AssignmentRepository():
     def get_assignment_data(self):
         return self._assignment_data
 
+    def get_version(self):
+        """
+        Get the version of the repository
+        :return: a integer which changes every time the repository is modified
+        """
+        return self._version
+
+    @reading
+    def get_assignments_with_deadline_before(self, day):
+        """
+        Get the assignments whose deadline is before a day, found with a binary search in the deadline index
+        :param day: a date object
+        :return: a list of assignment ids, sorted ascending by deadline
+        """
+        # (day,) is smaller than every (day, assignment id), so the search stops at the first deadline >= day
+        end = bisect_left(self._assignments_by_deadline, (day,))
+        return [assignment_id for deadline, assignment_id in self._assignments_by_deadline[:end]]
+
+    def _remove_from_deadline_index(self, deadline, assignment_id):
+        del self._assignments_by_deadline[bisect_left(self._assignments_by_deadline, (deadline, assignment_id))]
+
+    def flush(self):
+        """
+        Write the modifications which were not saved yet to the storage of the repository
+        """
+        pass
+
+    def check_persistence_errors(self):
+        """
+        Report the errors which happened while the repository was saved in background
+        """
+        pass
+
+    def after_commit(self, function, rollback_function=None):
+        """
+        Run a function once the modifications done so far are persisted by the storage of the repository: when the
+        outermost batch ends, or right away outside of a batch
+        :param function: a function without parameters
+        :param rollback_function: a function without parameters, run instead of function if the storage rolls the
+                                  batch back, or None
+        """
+        function()
+
+    @contextmanager
+    def batch(self):
+        """
+        Group several modifications, so the repository can persist them together when the with block ends; the lock
+        is held for writing until then, so the other threads never see a half done batch
+        """
+        with self._lock.write(), self._persistence_batch():
+            yield
+
+    def _persistence_batch(self):
+        """
+        Get the context manager which groups the modifications in the storage of the repository
+        """
+        return nullcontext()
+
+    def get_lock(self):
+        """
+        Get the lock of the repository, for the services which read or modify several repositories together
+        :return: a ReadWriteLock object
+        """
+        return self._lock
+
 class AssignmentTextFileRepository(AssignmentRepository):
-    def __init__(self, file_name):
+    def __init__(self, file_name, writer=None):
         """
         Initialize the text-file based assignment repository
         :param file_name: a string which represent the name/location of the file where the data from repository is stored
+        :param writer: an AsyncFileWriter object which saves the file in background, or None
         """
         super().__init__()
         self._file_name = file_name
+        self._write_behind = WriteBehind(file_name, self._serialize_data, writer)
         self._load_file()
 
     def _load_file(self):
@@ -84,43 +178,61 @@ class AssignmentTextFileRepository(AssignmentRepository):
         file = open(self._file_name, "rt")
         for line in file.readlines():
             id, description, deadline = line.split(maxsplit = 2, sep="/")
-            self.add_assignment(Assignment(int(id), description, date.fromisoformat(deadline.rstrip())))
+            super().add_assignment(Assignment(int(id), description, date.fromisoformat(deadline.rstrip())))
         file.close()
 
-    def _save_file(self):
+    def _serialize_data(self):
         """
-        Write the new state of assignment_data to the file
+        Encode the new state of assignment_data for writing it to the file
+        :return: a bytes object
         """
-        file = open(self._file_name, "wt")
-        for assignment in self._assignment_data.values():
-            file.write(str(assignment.assigment_id) + "/" + assignment.description + "/" + str(assignment.deadline) + "\n")
-        file.close()
+        lines = [str(assignment.assigment_id) + "/" + assignment.description + "/" + str(assignment.deadline) + "\n"
+                 for assignment in self._assignment_data.values()]
+        return "".join(lines).encode()
+
+    def flush(self):
+        self._write_behind.flush()
 
+    def check_persistence_errors(self):
+        self._write_behind.check_errors()
+
+    def after_commit(self, function, rollback_function=None):
+        self._write_behind.after_commit(function)
+
+    def _persistence_batch(self):
+        return self._write_behind.batch()
+
+    @writing
     def add_assignment(self, assignment):
-        super().add_assignment(assignment)
-        self._save_file()
+        with self._write_behind.modification():
+            super().add_assignment(assignment)
 
+    @writing
     def remove_assignment(self, assignment_id):
-        super().remove_assignment(assignment_id)
-        self._save_file()
+        with self._write_behind.modification():
+            super().remove_assignment(assignment_id)
 
+    @writing
     def update_assignment_description(self, assignment_id, new_description):
-        super().update_assignment_description(assignment_id, new_description)
-        self._save_file()
+        with self._write_behind.modification():
+            super().update_assignment_description(assignment_id, new_description)
 
+    @writing
     def update_assignment_deadline(self, assignment_id, new_deadline):
-        super().update_assignment_deadline(assignment_id, new_deadline)
-        self._save_file()
+        with self._write_behind.modification():
+            super().update_assignment_deadline(assignment_id, new_deadline)
 
 
 class AssignmentBinaryFileRepository(AssignmentRepository):
-    def __init__(self, file_name):
+    def __init__(self, file_name, writer=None):
         """
         Initialize the binary-file based assignment repository
         :param file_name: a string which represent the name/location of the file where the data from repository is stored
+        :param writer: an AsyncFileWriter object which saves the file in background, or None
         """
         super().__init__()
         self._file_name = file_name
+        self._write_behind = WriteBehind(file_name, self._serialize_data, writer)
         self._load_file()
 
     def _load_file(self):
@@ -128,29 +240,173 @@ class AssignmentBinaryFileRepository(AssignmentRepository):
         Read assignments from the file and store them in assignment_data
         """
         file = open(self._file_name, "rb")
-        self._data = pickle.load(file)
+        content = file.read()
         file.close()
+        if len(content) != 0:
+            for assignment in decode_assignments(content):
+                super().add_assignment(assignment)
 
-    def _save_file(self):
+    def _serialize_data(self):
         """
-        Write the new state of assignment_data to the file
+        Encode the new state of assignment_data for writing it to the file
+        :return: a bytes object
         """
-        file = open(self._file_name, "wb")
-        pickle.dump(self._data, file)
-        file.close()
+        return encode_assignments(self._assignment_data)
+
+    def flush(self):
+        self._write_behind.flush()
+
+    def check_persistence_errors(self):
+        self._write_behind.check_errors()
 
+    def after_commit(self, function, rollback_function=None):
+        self._write_behind.after_commit(function)
+
+    def _persistence_batch(self):
+        return self._write_behind.batch()
+
+    @writing
+    def add_assignment(self, assignment):
+        with self._write_behind.modification():
+            super().add_assignment(assignment)
+
+    @writing
+    def remove_assignment(self, assignment_id):
+        with self._write_behind.modification():
+            super().remove_assignment(assignment_id)
+
+    @writing
+    def update_assignment_description(self, assignment_id, new_description):
+        with self._write_behind.modification():
+            super().update_assignment_description(assignment_id, new_description)
+
+    @writing
+    def update_assignment_deadline(self, assignment_id, new_deadline):
+        with self._write_behind.modification():
+            super().update_assignment_deadline(assignment_id, new_deadline)
+
+
+class AssignmentJournalRepository(AssignmentRepository):
+    def __init__(self, file_name):
+        """
+        Initialize the journal based assignment repository
+        :param file_name: a string which represent the name/location of the journal file of the repository
+        """
+        super().__init__()
+        self._journal = Journal(file_name)
+        self._load_file()
+
+    def _load_file(self):
+        """
+        Replay the records of the journal to rebuild assignment_data
+        """
+        for record in self._journal.read_records():
+            operation = record["operation"]
+            if operation == "add":
+                super().add_assignment(Assignment(record["assignment_id"], record["description"],
+                                                  date.fromisoformat(record["deadline"])))
+            elif operation == "remove":
+                super().remove_assignment(record["assignment_id"])
+            elif operation == "description":
+                super().update_assignment_description(record["assignment_id"], record["description"])
+            elif operation == "deadline":
+                super().update_assignment_deadline(record["assignment_id"], date.fromisoformat(record["deadline"]))
+            else:
+                raise JournalException("Unknown assignment journal record: " + str(record))
+
+    def _persistence_batch(self):
+        return self._journal.batch()
+
+    def after_commit(self, function, rollback_function=None):
+        self._journal.after_commit(function)
+
+    def _write_to_journal(self, record):
+        """
+        Append a record to the journal and compact the journal if it grew too large
+        :param record: a dictionary which describes the modification
+        """
+        self._journal.append(record)
+        if self._journal.needs_compaction(len(self._assignment_data)):
+            self._journal.compact_in_background(
+                [{"operation": "add", "assignment_id": assignment.assigment_id,
+                  "description": assignment.description, "deadline": str(assignment.deadline)}
+                 for assignment in self._assignment_data])
+
+    @writing
     def add_assignment(self, assignment):
         super().add_assignment(assignment)
-        self._save_file()
+        self._write_to_journal({"operation": "add", "assignment_id": assignment.assigment_id,
+                                "description": assignment.description, "deadline": str(assignment.deadline)})
 
+    @writing
     def remove_assignment(self, assignment_id):
         super().remove_assignment(assignment_id)
-        self._save_file()
+        self._write_to_journal({"operation": "remove", "assignment_id": assignment_id})
 
+    @writing
     def update_assignment_description(self, assignment_id, new_description):
         super().update_assignment_description(assignment_id, new_description)
-        self._save_file()
+        self._write_to_journal({"operation": "description", "assignment_id": assignment_id,
+                                "description": new_description})
 
+    @writing
     def update_assignment_deadline(self, assignment_id, new_deadline):
         super().update_assignment_deadline(assignment_id, new_deadline)
-        self._save_file()
+        self._write_to_journal({"operation": "deadline", "assignment_id": assignment_id,
+                                "deadline": str(new_deadline)})
+
+
+class AssignmentSqliteRepository(AssignmentRepository):
+    def __init__(self, database):
+        """
+        Initialize the sqlite based assignment repository
+        :param database: a SqliteDatabase object, shared with the other sqlite repositories
+        """
+        super().__init__()
+        self._database = database
+        # the repositories of a database share its lock, since its connection has a single transaction
+        self._lock = database.get_lock()
+        self._assignment_data = SqliteTable(
+            database, "assignments", ("assignment_id",), ("assignment_id", "description", "deadline"),
+            lambda row: Assignment(row[0], row[1], date.fromisoformat(row[2])))
+
+    @writing
+    def add_assignment(self, assignment):
+        if assignment.assigment_id in self._assignment_data:
+            raise AssignmentRepositoryException(
+                "Assignment with id: " + str(assignment.assigment_id) + " already in repository")
+        self._database.execute("INSERT INTO assignments (assignment_id, description, deadline) VALUES (?, ?, ?)",
+                               (assignment.assigment_id, assignment.description, str(assignment.deadline)))
+        self._version += 1
+
+    @writing
+    def remove_assignment(self, assignment_id):
+        self.check_valid_assignment_id(assignment_id)
+        self._database.execute("DELETE FROM assignments WHERE assignment_id = ?", (assignment_id,))
+        self._version += 1
+
+    @writing
+    def update_assignment_description(self, assignment_id, new_description):
+        self.check_valid_assignment_id(assignment_id)
+        self._database.execute("UPDATE assignments SET description = ? WHERE assignment_id = ?",
+                               (new_description, assignment_id))
+        self._version += 1
+
+    @writing
+    def update_assignment_deadline(self, assignment_id, new_deadline):
+        self.check_valid_assignment_id(assignment_id)
+        self._database.execute("UPDATE assignments SET deadline = ? WHERE assignment_id = ?",
+                               (str(new_deadline), assignment_id))
+        self._version += 1
+
+    @reading
+    def get_assignments_with_deadline_before(self, day):
+        # the deadlines are stored as ISO dates, which sort like the dates they represent
+        return [row[0] for row in self._database.query(
+            "SELECT assignment_id FROM assignments WHERE deadline < ? ORDER BY deadline, assignment_id", (str(day),))]
+
+    def _persistence_batch(self):
+        return self._database.transaction()
+
+    def after_commit(self, function, rollback_function=None):
+        self._database.after_commit(function, rollback_function)
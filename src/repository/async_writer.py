@@ -0,0 +1,74 @@
+import queue
+import threading
+
+from src.repository.write_behind import atomic_write_file
+
+
+class PersistenceException(Exception):
+    pass
+
+
+class AsyncFileWriter:
+    def __init__(self, max_queued_snapshots=8):
+        """
+        Initialize the background writer thread shared by the file repositories
+        :param max_queued_snapshots: a integer, when this many snapshots wait to be written, the repository which
+                                     saves the next one is blocked until the writer catches up
+        """
+        self._queue = queue.Queue(max_queued_snapshots)
+        # file name -> number of the newest snapshot queued for that file; older snapshots of the same file are
+        # skipped, since the newer one replaces them anyway
+        self._newest_snapshot = dict()
+        self._snapshot_counter = 0
+        self._errors = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._write_snapshots, daemon=True)
+        self._thread.start()
+
+    def write(self, file_name, content):
+        """
+        Queue a snapshot to be written to a file
+        :param file_name: a string which represent the name/location of the file
+        :param content: a bytes object with the new content of the file; it is never modified after it is queued
+        """
+        with self._lock:
+            self._snapshot_counter += 1
+            snapshot_number = self._snapshot_counter
+            self._newest_snapshot[file_name] = snapshot_number
+        self._queue.put((file_name, content, snapshot_number))
+
+    def wait_until_written(self):
+        """
+        Wait until every queued snapshot is on disk
+        :except PersistenceException, if the writer failed to write a snapshot
+        """
+        self._queue.join()
+        self.check_errors()
+
+    def check_errors(self):
+        """
+        Report the errors of the writer thread, which happened since the last check
+        :except PersistenceException, if the writer failed to write a snapshot
+        """
+        with self._lock:
+            errors = self._errors
+            self._errors = []
+        if len(errors) != 0:
+            raise PersistenceException("Could not save the data: " + "; ".join(errors))
+
+    def _write_snapshots(self):
+        """
+        Write the queued snapshots, one after the other, until the program ends
+        """
+        while True:
+            file_name, content, snapshot_number = self._queue.get()
+            try:
+                with self._lock:
+                    is_newest = self._newest_snapshot[file_name] == snapshot_number
+                if is_newest:
+                    atomic_write_file(file_name, content)
+            except OSError as error_message:
+                with self._lock:
+                    self._errors.append(file_name + ": " + str(error_message))
+            finally:
+                self._queue.task_done()
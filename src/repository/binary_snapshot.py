@@ -0,0 +1,215 @@
+import struct
+import sys
+import zlib
+from array import array
+from datetime import date
+
+from src.domain.assignment import Assignment
+from src.domain.grade import Grade
+from src.domain.student import Student
+
+# magic, format version, kind of records, number of records, payload length, crc32 of the payload
+HEADER = struct.Struct("<4sHHIII")
+MAGIC = b"SLAM"
+FORMAT_VERSION = 1
+
+STUDENT_RECORDS = 1
+ASSIGNMENT_RECORDS = 2
+GRADE_RECORDS = 3
+
+
+class BinarySnapshotException(Exception):
+    pass
+
+
+class _ColumnWriter:
+    def __init__(self):
+        self._parts = []
+
+    def add_numbers(self, type_code, values):
+        """
+        Add a column of fixed-width numbers
+        :param type_code: a string, the array module type code of the column
+        :param values: a list of integers
+        """
+        column = array(type_code, values)
+        if sys.byteorder == "big":
+            column.byteswap()
+        self._parts.append(column.tobytes())
+
+    def add_strings(self, values):
+        """
+        Add a column of strings, kept in a side table: the length of every string, then all the strings, encoded
+        together
+        :param values: a list of strings
+        """
+        self.add_numbers("I", [len(value) for value in values])
+        text = "".join(values).encode("utf-8")
+        self.add_numbers("I", [len(text)])
+        self._parts.append(text)
+
+    def to_bytes(self, kind, number_of_records):
+        payload = b"".join(self._parts)
+        return HEADER.pack(MAGIC, FORMAT_VERSION, kind, number_of_records, len(payload),
+                           zlib.crc32(payload)) + payload
+
+
+class _ColumnReader:
+    def __init__(self, content, kind):
+        """
+        Check the header of a snapshot and prepare the reading of its columns
+        :param content: a bytes object with the whole snapshot
+        :param kind: a integer, the kind of records expected in the snapshot
+        :except BinarySnapshotException, if the content is not a valid snapshot of the expected kind
+        """
+        if len(content) < HEADER.size:
+            raise BinarySnapshotException("The file is too short to be a snapshot")
+        magic, version, snapshot_kind, number_of_records, payload_length, checksum = HEADER.unpack_from(content)
+        if magic != MAGIC:
+            raise BinarySnapshotException("The file is not a snapshot")
+        if version != FORMAT_VERSION:
+            raise BinarySnapshotException("Unsupported snapshot version: " + str(version))
+        if snapshot_kind != kind:
+            raise BinarySnapshotException("The snapshot holds another kind of records")
+        self._payload = memoryview(content)[HEADER.size:]
+        if len(self._payload) != payload_length or zlib.crc32(self._payload) != checksum:
+            raise BinarySnapshotException("The snapshot is damaged")
+        self.number_of_records = number_of_records
+        self._position = 0
+
+    def _take(self, length):
+        if self._position + length > len(self._payload):
+            raise BinarySnapshotException("The snapshot is damaged")
+        part = self._payload[self._position:self._position + length]
+        self._position += length
+        return part
+
+    def read_numbers(self, type_code, count=None):
+        """
+        Read a column of fixed-width numbers with a single bulk copy
+        :param type_code: a string, the array module type code of the column
+        :param count: a integer, the number of values, by default one for every record
+        :return: an array object
+        """
+        column = array(type_code)
+        if count is None:
+            count = self.number_of_records
+        column.frombytes(self._take(count * column.itemsize))
+        if sys.byteorder == "big":
+            column.byteswap()
+        return column
+
+    def read_strings(self):
+        """
+        Read a column of strings: the text is decoded once and cut at the stored lengths
+        :return: a list of strings
+        """
+        lengths = self.read_numbers("I")
+        text_length = self.read_numbers("I", 1)[0]
+        try:
+            text = str(self._take(text_length), "utf-8")
+        except UnicodeDecodeError:
+            raise BinarySnapshotException("The snapshot is damaged")
+        if sum(lengths) != len(text):
+            raise BinarySnapshotException("The snapshot is damaged")
+        strings = []
+        position = 0
+        for length in lengths:
+            strings.append(text[position:position + length])
+            position += length
+        return strings
+
+    def check_end(self):
+        if self._position != len(self._payload):
+            raise BinarySnapshotException("The snapshot is damaged")
+
+
+def encode_students(students):
+    """
+    Encode students as a snapshot
+    :param students: an iterable of student objects
+    :return: a bytes object
+    """
+    students = list(students)
+    writer = _ColumnWriter()
+    writer.add_numbers("i", [student.student_id for student in students])
+    writer.add_numbers("h", [student.group for student in students])
+    writer.add_strings([student.name for student in students])
+    return writer.to_bytes(STUDENT_RECORDS, len(students))
+
+
+def decode_students(content):
+    """
+    Decode the students from a snapshot
+    :param content: a bytes object with the snapshot
+    :return: a list of student objects
+    :except BinarySnapshotException, if the content is not a valid student snapshot
+    """
+    reader = _ColumnReader(content, STUDENT_RECORDS)
+    student_ids = reader.read_numbers("i")
+    groups = reader.read_numbers("h")
+    names = reader.read_strings()
+    reader.check_end()
+    return list(map(Student, student_ids, names, groups))
+
+
+def encode_assignments(assignments):
+    """
+    Encode assignments as a snapshot
+    :param assignments: an iterable of assignment objects
+    :return: a bytes object
+    """
+    assignments = list(assignments)
+    writer = _ColumnWriter()
+    writer.add_numbers("i", [assignment.assigment_id for assignment in assignments])
+    writer.add_numbers("i", [assignment.deadline.toordinal() for assignment in assignments])
+    writer.add_strings([assignment.description for assignment in assignments])
+    return writer.to_bytes(ASSIGNMENT_RECORDS, len(assignments))
+
+
+def decode_assignments(content):
+    """
+    Decode the assignments from a snapshot
+    :param content: a bytes object with the snapshot
+    :return: a list of assignment objects
+    :except BinarySnapshotException, if the content is not a valid assignment snapshot
+    """
+    reader = _ColumnReader(content, ASSIGNMENT_RECORDS)
+    assignment_ids = reader.read_numbers("i")
+    deadlines = reader.read_numbers("i")
+    descriptions = reader.read_strings()
+    reader.check_end()
+    try:
+        return list(map(Assignment, assignment_ids, descriptions, map(date.fromordinal, deadlines)))
+    except (ValueError, OverflowError):
+        raise BinarySnapshotException("The snapshot holds an invalid deadline")
+
+
+def encode_grades(grades):
+    """
+    Encode grades as a snapshot; a missing grade value is stored as 0, and a whole float value as a integer
+    :param grades: an iterable of grade objects
+    :return: a bytes object
+    """
+    grades = list(grades)
+    writer = _ColumnWriter()
+    writer.add_numbers("i", [grade.assignment_id for grade in grades])
+    writer.add_numbers("i", [grade.student_id for grade in grades])
+    writer.add_numbers("b", [int(grade.grade_value or 0) for grade in grades])
+    return writer.to_bytes(GRADE_RECORDS, len(grades))
+
+
+def decode_grades(content):
+    """
+    Decode the grades from a snapshot
+    :param content: a bytes object with the snapshot
+    :return: a list of grade objects
+    :except BinarySnapshotException, if the content is not a valid grade snapshot
+    """
+    reader = _ColumnReader(content, GRADE_RECORDS)
+    assignment_ids = reader.read_numbers("i")
+    student_ids = reader.read_numbers("i")
+    grade_values = reader.read_numbers("b")
+    reader.check_end()
+    return [Grade(assignment_id, student_id, grade_value or None)
+            for assignment_id, student_id, grade_value in zip(assignment_ids, student_ids, grade_values)]
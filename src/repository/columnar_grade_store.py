@@ -0,0 +1,266 @@
+import mmap
+import os
+import struct
+
+from src.domain.grade import Grade
+
+# magic, number of rows, capacity of the columns, number of slots of the hash index
+HEADER = struct.Struct("<8sIII")
+MAGIC = b"SLAMCOL1"
+MINIMUM_CAPACITY = 1024
+EMPTY_SLOT = 0
+
+
+class ColumnarGradeStoreException(Exception):
+    pass
+
+
+class ColumnarGradeStore:
+    def __init__(self, file_name):
+        """
+        Open (or create) a memory-mapped grade file. The file holds three parallel columns (assignment id as int32,
+        student id as int32, grade value as int8 with 0 meaning ungraded) and an open-addressing hash index from
+        (assignment id, student id) to row, so opening even a very large file reads nothing but the header.
+        :param file_name: a string which represent the name/location of the grade file
+        """
+        self._file_name = file_name
+        if not os.path.exists(file_name) or os.path.getsize(file_name) == 0:
+            self._create_file(MINIMUM_CAPACITY)
+        self._file = open(file_name, "r+b")
+        try:
+            self._map_file()
+        except (ColumnarGradeStoreException, ValueError, struct.error):
+            self._file.close()
+            raise ColumnarGradeStoreException("The file is not a columnar grade file")
+
+    def _create_file(self, capacity):
+        file = open(self._file_name, "wb")
+        file.write(HEADER.pack(MAGIC, 0, capacity, 2 * capacity))
+        file.truncate(self._file_size(capacity, 2 * capacity))
+        file.close()
+
+    @staticmethod
+    def _file_size(capacity, table_size):
+        return HEADER.size + 4 * capacity + 4 * capacity + capacity + 4 * table_size
+
+    def _map_file(self):
+        """
+        Map the file in memory and build the column views over the mapped bytes
+        :except ColumnarGradeStoreException, if the file is not a columnar grade file
+        """
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, self._row_count, self._capacity, self._table_size = HEADER.unpack_from(self._map)
+        if magic != MAGIC or len(self._map) != self._file_size(self._capacity, self._table_size):
+            self._map.close()
+            raise ColumnarGradeStoreException("The file is not a columnar grade file")
+        self._assignment_offset = HEADER.size
+        self._student_offset = self._assignment_offset + 4 * self._capacity
+        self._grade_offset = self._student_offset + 4 * self._capacity
+        self._table_offset = self._grade_offset + self._capacity
+        view = memoryview(self._map)
+        self.assignment_ids = view[self._assignment_offset:self._student_offset].cast("i")
+        self.student_ids = view[self._student_offset:self._grade_offset].cast("i")
+        self.grade_values = view[self._grade_offset:self._table_offset].cast("b")
+        # slot -> row + 1, EMPTY_SLOT for an unused slot
+        self._table = view[self._table_offset:].cast("i")
+
+    def _release_views(self):
+        self.assignment_ids.release()
+        self.student_ids.release()
+        self.grade_values.release()
+        self._table.release()
+        self._map.close()
+
+    def __len__(self):
+        return self._row_count
+
+    def _first_slot(self, assignment_id, student_id):
+        return ((assignment_id * 1000003) ^ (student_id * 2654435761)) & (self._table_size - 1)
+
+    def _find_slot(self, assignment_id, student_id):
+        """
+        Find the hash index slot of a grade
+        :return: the slot number, or -1 if the grade is not in the store
+        """
+        mask = self._table_size - 1
+        slot = self._first_slot(assignment_id, student_id)
+        while True:
+            row = self._table[slot] - 1
+            if row < 0:
+                return -1
+            if self.assignment_ids[row] == assignment_id and self.student_ids[row] == student_id:
+                return slot
+            slot = (slot + 1) & mask
+
+    def find_row(self, assignment_id, student_id):
+        """
+        Find the row of a grade
+        :param assignment_id: a integer which represents the assignment id of the grade
+        :param student_id: a integer which represents the student id of the grade
+        :return: the row number, or -1 if the grade is not in the store
+        """
+        slot = self._find_slot(assignment_id, student_id)
+        return -1 if slot < 0 else self._table[slot] - 1
+
+    def _insert_slot(self, row):
+        mask = self._table_size - 1
+        slot = self._first_slot(self.assignment_ids[row], self.student_ids[row])
+        while self._table[slot] != EMPTY_SLOT:
+            slot = (slot + 1) & mask
+        self._table[slot] = row + 1
+
+    def append(self, assignment_id, student_id, grade_value):
+        """
+        Add a new grade at the end of the columns
+        :param grade_value: a whole number between 1 and 10, or 0 for an ungraded assignment; it is stored as a int8
+        """
+        if self._row_count == self._capacity:
+            self._resize(2 * self._capacity)
+        row = self._row_count
+        self.assignment_ids[row] = assignment_id
+        self.student_ids[row] = student_id
+        self.grade_values[row] = int(grade_value)
+        self._insert_slot(row)
+        self._set_row_count(row + 1)
+
+    def set_grade_value(self, row, grade_value):
+        self.grade_values[row] = int(grade_value)
+
+    def delete(self, assignment_id, student_id):
+        """
+        Delete a grade; the last row is moved in its place, so the columns stay without gaps
+        """
+        slot = self._find_slot(assignment_id, student_id)
+        if slot < 0:
+            return
+        row = self._table[slot] - 1
+        self._delete_slot(slot)
+        last_row = self._row_count - 1
+        if row != last_row:
+            self._table[self._find_slot(self.assignment_ids[last_row], self.student_ids[last_row])] = row + 1
+            self.assignment_ids[row] = self.assignment_ids[last_row]
+            self.student_ids[row] = self.student_ids[last_row]
+            self.grade_values[row] = self.grade_values[last_row]
+        self._set_row_count(last_row)
+
+    def _delete_slot(self, slot):
+        """
+        Empty a slot of the hash index and shift back the following slots of the probe sequence, so every grade
+        stays reachable without tombstones
+        """
+        mask = self._table_size - 1
+        self._table[slot] = EMPTY_SLOT
+        next_slot = (slot + 1) & mask
+        while self._table[next_slot] != EMPTY_SLOT:
+            row = self._table[next_slot] - 1
+            wanted_slot = self._first_slot(self.assignment_ids[row], self.student_ids[row])
+            # the entry may move to the empty slot only if the empty slot is between its wanted slot and its
+            # current slot, on the probe sequence
+            if (next_slot - wanted_slot) & mask >= (next_slot - slot) & mask:
+                self._table[slot] = row + 1
+                self._table[next_slot] = EMPTY_SLOT
+                slot = next_slot
+            next_slot = (next_slot + 1) & mask
+
+    def find_rows(self, column, value):
+        """
+        Find the rows where a column holds a value, searching the mapped bytes at C speed
+        :param column: a string, "assignment_id", "student_id" or "grade_value"
+        :param value: a integer to search for
+        :return: a list of row numbers, in ascending order
+        """
+        if column == "grade_value":
+            start, item_size, pattern = self._grade_offset, 1, struct.pack("=b", value)
+        elif column == "student_id":
+            start, item_size, pattern = self._student_offset, 4, struct.pack("=i", value)
+        else:
+            start, item_size, pattern = self._assignment_offset, 4, struct.pack("=i", value)
+        end = start + item_size * self._row_count
+        rows = []
+        position = self._map.find(pattern, start, end)
+        while position != -1:
+            if (position - start) % item_size == 0:
+                rows.append((position - start) // item_size)
+                position = self._map.find(pattern, position + item_size, end)
+            else:
+                position = self._map.find(pattern, position + 1, end)
+        return rows
+
+    def _set_row_count(self, row_count):
+        self._row_count = row_count
+        HEADER.pack_into(self._map, 0, MAGIC, row_count, self._capacity, self._table_size)
+
+    def _resize(self, capacity):
+        """
+        Grow the columns and the hash index; the rows are copied to their new positions and the index is rebuilt
+        """
+        row_count = self._row_count
+        assignment_ids = self.assignment_ids[:row_count].tobytes()
+        student_ids = self.student_ids[:row_count].tobytes()
+        grade_values = self.grade_values[:row_count].tobytes()
+        self._release_views()
+        self._file.truncate(self._file_size(capacity, 2 * capacity))
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, row_count, capacity, 2 * capacity))
+        self._file.flush()
+        self._map_file()
+        self._map[self._table_offset:] = bytes(4 * self._table_size)
+        self._map[self._assignment_offset:self._assignment_offset + len(assignment_ids)] = assignment_ids
+        self._map[self._student_offset:self._student_offset + len(student_ids)] = student_ids
+        self._map[self._grade_offset:self._grade_offset + len(grade_values)] = grade_values
+        for row in range(row_count):
+            self._insert_slot(row)
+
+    def flush(self):
+        """
+        Write the modified pages of the mapping to the disk
+        """
+        self._map.flush()
+
+    def close(self):
+        self.flush()
+        self._release_views()
+        self._file.close()
+
+
+class ColumnarGradeTable:
+    def __init__(self, store):
+        """
+        Initialize a view over a columnar grade store, which behaves like the Iterator container of the in-memory
+        repositories; the grade objects are built from the columns when they are requested
+        :param store: a ColumnarGradeStore object
+        """
+        self._store = store
+
+    def grade_at(self, row):
+        """
+        Build the grade object of a row
+        :param row: a integer which represents the row number
+        :return: a grade object
+        """
+        return Grade(self._store.assignment_ids[row], self._store.student_ids[row],
+                     self._store.grade_values[row] or None)
+
+    def __contains__(self, key):
+        return self._store.find_row(*key) >= 0
+
+    def __getitem__(self, key):
+        row = self._store.find_row(*key)
+        if row < 0:
+            raise KeyError(key)
+        return self.grade_at(row)
+
+    def __iter__(self):
+        return map(self.grade_at, range(len(self._store)))
+
+    def __len__(self):
+        return len(self._store)
+
+    def keys(self):
+        return list(zip(self._store.assignment_ids[:len(self._store)], self._store.student_ids[:len(self._store)]))
+
+    def values(self):
+        return list(self)
+
+    def items(self):
+        return [((grade.assignment_id, grade.student_id), grade) for grade in self]
@@ -0,0 +1,97 @@
+import math
+from bisect import bisect_left, insort
+
+from src.repository.sorted_buckets import SortedBuckets
+
+
+class GradeAggregates:
+    def __init__(self):
+        """
+        Initialize the running sums and counts of the graded grades, kept per student and per assignment, and the
+        ranking of the students by average grade, which is kept sorted as the grades change
+        """
+        # student id -> [sum of the grade values, number of graded grades, sorted sequence numbers of the graded
+        # grades, entry of the student in the ranking]
+        self._student_totals = dict()
+        # assignment id -> [sum of the grade values, number of graded grades]
+        self._assignment_totals = dict()
+        # sorted buckets of (-average grade, sequence number of the first graded grade, student id); students with
+        # the same average keep the order in which their first graded grade was added to the repository
+        self._ranking = SortedBuckets()
+
+    def add_grade_value(self, assignment_id, student_id, grade_value, sequence):
+        """
+        Count a graded grade in the aggregates
+        :param assignment_id: a integer which represents the assignment id of the grade
+        :param student_id: a integer which represents the student id of the grade
+        :param grade_value: a integer between 1 and 10
+        :param sequence: a integer which represents the position of the grade in the order the grades were added
+        """
+        assignment_totals = self._assignment_totals.setdefault(assignment_id, [0, 0])
+        assignment_totals[0] += grade_value
+        assignment_totals[1] += 1
+        student_totals = self._student_totals.get(student_id)
+        if student_totals is None:
+            student_totals = self._student_totals[student_id] = [0, 0, [], None]
+        else:
+            self._remove_from_ranking(student_totals[3])
+        student_totals[0] += grade_value
+        student_totals[1] += 1
+        insort(student_totals[2], sequence)
+        student_totals[3] = (-(student_totals[0] / student_totals[1]), student_totals[2][0], student_id)
+        self._ranking.add(student_totals[3])
+
+    def remove_grade_value(self, assignment_id, student_id, grade_value, sequence):
+        """
+        Stop counting a graded grade in the aggregates
+        :param assignment_id: a integer which represents the assignment id of the grade
+        :param student_id: a integer which represents the student id of the grade
+        :param grade_value: a integer between 1 and 10, the value which was counted for the grade
+        :param sequence: a integer, the sequence number which was counted for the grade
+        """
+        assignment_totals = self._assignment_totals[assignment_id]
+        assignment_totals[0] -= grade_value
+        assignment_totals[1] -= 1
+        if assignment_totals[1] == 0:
+            del self._assignment_totals[assignment_id]
+        student_totals = self._student_totals[student_id]
+        self._remove_from_ranking(student_totals[3])
+        student_totals[0] -= grade_value
+        student_totals[1] -= 1
+        sequences = student_totals[2]
+        del sequences[bisect_left(sequences, sequence)]
+        if student_totals[1] == 0:
+            del self._student_totals[student_id]
+            return
+        student_totals[3] = (-(student_totals[0] / student_totals[1]), sequences[0], student_id)
+        self._ranking.add(student_totals[3])
+
+    def _remove_from_ranking(self, entry):
+        self._ranking.remove(entry)
+
+    def get_average_grade_of_student(self, student_id):
+        """
+        :return: a float, the average of the graded grades of the student, or None if the student has no graded grade
+        """
+        student_totals = self._student_totals.get(student_id)
+        return None if student_totals is None else student_totals[0] / student_totals[1]
+
+    def get_average_grade_of_assignment(self, assignment_id):
+        """
+        :return: a float, the average of the graded grades of the assignment, or None if the assignment has no
+                 graded grade
+        """
+        assignment_totals = self._assignment_totals.get(assignment_id)
+        return None if assignment_totals is None else assignment_totals[0] / assignment_totals[1]
+
+    def get_ranking(self, limit=None, min_average=None):
+        """
+        Get the students sorted descending by average grade, without sorting them again
+        :param limit: a integer, the maximum number of students to return, or None for no limit
+        :param min_average: a number, only the students with at least this average are returned, or None
+        :return: a list of tuples (student_id, average_grade)
+        """
+        # the entries with -average <= -min_average are a prefix of the ranking
+        maximum_entry = None if min_average is None else (-min_average, math.inf)
+        entries = self._ranking.prefix(maximum_entry, None if limit is None else max(limit, 0))
+        return [(student_id, -negated_average) for negated_average, first_sequence, student_id in entries]
@@ -1,7 +1,17 @@
-import pickle
+import heapq
+from array import array
+from contextlib import contextmanager, nullcontext
 
 from src.domain.grade import Grade
-from src.repository.iter_sort_filter import Iterator
+from src.repository.grade_aggregates import GradeAggregates
+from src.repository.columnar_grade_store import ColumnarGradeStore, ColumnarGradeTable
+from src.repository.positional_index import PositionalIndex
+from src.repository.iter_sort_filter import Iterator, sort_a_list
+from src.repository.binary_snapshot import encode_grades, decode_grades
+from src.repository.journal import Journal, JournalException
+from src.repository.sqlite_database import SqliteTable
+from src.repository.write_behind import WriteBehind
+from src.repository.read_write_lock import ReadWriteLock, reading, writing
 
 
 class GradeRepositoryException(Exception):
@@ -14,7 +24,26 @@ class GradeRepository():
         Initialize the repository for grades
         """
         self._grade_data = Iterator()
+        # student id -> keys of the grades given to that student
+        self._grades_by_student = dict()
+        # assignment id -> keys of the grades given for that assignment
+        self._grades_by_assignment = dict()
+        # keys of the grades which don't have a grade value yet, in the order they became ungraded, with positional
+        # access
+        self._ungraded_grades = PositionalIndex()
+        # assignment id -> keys of the ungraded grades of that assignment
+        self._ungraded_grades_by_assignment = dict()
+        # grade key -> sequence number, the position of the grade in the order the grades were added
+        self._grade_sequences = dict()
+        self._next_grade_sequence = 0
+        self._grade_aggregates = GradeAggregates()
+        # changes on every modification, so the cached statistics know when they are out of date
+        self._version = 0
+        # held for reading by the queries and for writing by the modifications, so the reports run together and the
+        # modifications one at a time
+        self._lock = ReadWriteLock()
 
+    @writing
     def add_grade(self, grade_to_add):
         """
         Add a grade object to the grade data
@@ -28,7 +57,10 @@ class GradeRepository():
                                                                                                     "with id: "
                                            + str(grade_to_add.assignment_id))
         self._grade_data[grade_to_add.assignment_id, grade_to_add.student_id] = grade_to_add
+        self._add_to_indexes(grade_to_add)
+        self._version += 1
 
+    @writing
     def remove_a_grade(self, assignment_id, student_id):
         """
         Remove a grade from the grade data
@@ -36,21 +68,24 @@ class GradeRepository():
         :param student_id: a integer which represent the student id for the grade that will be deleted
         """
         if (assignment_id, student_id) in self._grade_data:
+            self._remove_from_indexes(assignment_id, student_id)
             del self._grade_data[assignment_id, student_id]
+            self._version += 1
 
+    @writing
     def remove_grades(self, entity_id, id_position):
         """
         Remove all grades for a assignment or a student
         :param entity_id: an integer, which can be the assigment id or the student id
         :param id_position: an integer, which can be 0 or 1 ( postiton of assignment_id or student_id in grade object)
         """
-        list_of_grades_to_remove = []
-        for grade in self._grade_data:
-            if grade.assignment_id == entity_id and id_position == 0 or grade.student_id == entity_id and id_position == 1:
-                list_of_grades_to_remove.append((grade.assignment_id, grade.student_id))
-        for grade in list_of_grades_to_remove:
-            del self._grade_data[grade]
+        index = self._grades_by_assignment if id_position == 0 else self._grades_by_student
+        for assignment_id, student_id in list(index.get(entity_id, ())):
+            self._remove_from_indexes(assignment_id, student_id)
+            del self._grade_data[assignment_id, student_id]
+        self._version += 1
 
+    @writing
     def grade_student_for_a_given_assignment(self, grade):
         """
         Grade student for a given assignment
@@ -66,23 +101,284 @@ class GradeRepository():
         #                                                                                              "assignment "
         #                                                                                              "with id: "
         #                                    + str(grade.assignment_id))
-        self._grade_data[grade.assignment_id, grade.student_id].grade_value = grade.grade_value
+        grade_key = (grade.assignment_id, grade.student_id)
+        stored_grade = self._grade_data[grade_key]
+        old_grade_value = stored_grade.grade_value
+        stored_grade.grade_value = grade.grade_value
+        sequence = self._grade_sequences[grade_key]
+        if old_grade_value is not None:
+            self._grade_aggregates.remove_grade_value(grade.assignment_id, grade.student_id, old_grade_value, sequence)
+        if grade.grade_value is None:
+            self._mark_ungraded(grade_key)
+        else:
+            self._unmark_ungraded(grade_key)
+            self._grade_aggregates.add_grade_value(grade.assignment_id, grade.student_id, grade.grade_value, sequence)
+        self._version += 1
 
+    @reading
     def get_grade_value(self, assignment_id, student_id):
         return self._grade_data[assignment_id, student_id].grade_value
 
     def get_grade_data(self):
         return self._grade_data
 
+    def get_version(self):
+        """
+        Get the version of the repository
+        :return: a integer which changes every time the repository is modified
+        """
+        return self._version
+
+    @reading
+    def get_grades_of_student(self, student_id):
+        """
+        Get the grades given to a student
+        :param student_id: a integer which represents the id of the student
+        :return: a list of grade objects
+        """
+        return [self._grade_data[grade_key] for grade_key in self._grades_by_student.get(student_id, ())]
+
+    @reading
+    def get_grades_of_assignment(self, assignment_id):
+        """
+        Get the grades given for an assignment
+        :param assignment_id: a integer which represents the id of the assignment
+        :return: a list of grade objects
+        """
+        return [self._grade_data[grade_key] for grade_key in self._grades_by_assignment.get(assignment_id, ())]
+
+    @reading
+    def get_ungraded_grades(self):
+        """
+        Get the grades which don't have a grade value yet
+        :return: a list of grade objects, which have the grade value None
+        """
+        return [self._grade_data[grade_key] for grade_key in self._ungraded_grades]
+
+    @reading
+    def get_ungraded_grade_at(self, position):
+        """
+        Get an ungraded grade by its position in get_ungraded_grades, without building the list
+        :param position: a integer, negative positions count from the end like for lists
+        :return: a grade object
+        :except IndexError, if there is no ungraded grade at the position
+        """
+        return self._grade_data[self._ungraded_grades[position]]
+
+    @reading
+    def get_graded_grades(self):
+        """
+        Get the grades which have a grade value
+        :return: a list of grade objects, which have the grade value different from None
+        """
+        return [grade for grade_key, grade in self._grade_data.items() if grade_key not in self._ungraded_grades]
+
+    @reading
+    def get_students_with_ungraded_grades_of_assignments(self, assignment_ids):
+        """
+        Get the students who have an ungraded grade for at least one of the given assignments; only the ungraded
+        grades of those assignments are visited
+        :param assignment_ids: an iterable of assignment ids
+        :return: a list of student ids, in the order of their first such grade in get_ungraded_grades
+        """
+        first_ungraded_orders = dict()
+        for assignment_id in assignment_ids:
+            for grade_key in self._ungraded_grades_by_assignment.get(assignment_id, ()):
+                student_id = grade_key[1]
+                order = self._ungraded_grades.order_of(grade_key)
+                if order < first_ungraded_orders.get(student_id, order + 1):
+                    first_ungraded_orders[student_id] = order
+        return sort_a_list(list(first_ungraded_orders), key=first_ungraded_orders.get)
+
+    @reading
+    def get_grades_of_assignment_sorted_descending(self, assignment_id, limit=None, min_grade=None):
+        """
+        Get the grades given for an assignment, sorted descending by grade value
+        :param assignment_id: a integer which represents the id of the assignment
+        :param limit: a non-negative integer, the maximum number of grades to return, or None for no limit
+        :param min_grade: a integer, only the grades with at least this value are returned (so no ungraded ones),
+                          or None
+        :return: a list of grade objects, the ungraded ones are at the end of the list
+        """
+        graded_students_list = []
+        ungraded_students_list = []
+        for grade in self.get_grades_of_assignment(assignment_id):
+            if grade.grade_value is None:
+                if min_grade is None:
+                    ungraded_students_list.append(grade)
+            elif min_grade is None or grade.grade_value >= min_grade:
+                graded_students_list.append(grade)
+        if limit is None:
+            graded_students_list = sort_a_list(graded_students_list, key=lambda grade: grade.grade_value, reverse=True)
+            return graded_students_list + ungraded_students_list
+        # nlargest keeps the grades of equal value in their order, like the stable sort, in O(n log limit)
+        graded_students_list = heapq.nlargest(limit, graded_students_list, key=lambda grade: grade.grade_value)
+        return (graded_students_list + ungraded_students_list)[:limit]
+
+    @reading
+    def get_students_sorted_descending_by_average_grade(self, limit=None, min_average=None):
+        """
+        Get the average grade of every student who has at least one graded assignment
+        :param limit: a non-negative integer, the maximum number of students to return, or None for no limit
+        :param min_average: a number, only the students with at least this average are returned, or None
+        :return: a list of tuples (student_id, average_grade), sorted descending by average grade; students with the
+                 same average keep the order in which their first graded grade was added
+        """
+        return self._grade_aggregates.get_ranking(limit, min_average)
+
+    @reading
+    def get_average_grade_of_student(self, student_id):
+        """
+        Get the average of the graded grades of a student
+        :param student_id: a integer which represents the id of the student
+        :return: a float, or None if the student has no graded grade
+        """
+        return self._grade_aggregates.get_average_grade_of_student(student_id)
+
+    @reading
+    def get_average_grade_of_assignment(self, assignment_id):
+        """
+        Get the average of the graded grades of an assignment
+        :param assignment_id: a integer which represents the id of the assignment
+        :return: a float, or None if the assignment has no graded grade
+        """
+        return self._grade_aggregates.get_average_grade_of_assignment(assignment_id)
+
+    @reading
+    def get_grade_columns(self):
+        """
+        Get every grade as three parallel columns, in the order of the grade data
+        :return: a tuple of arrays (assignment ids, student ids, grade values), where a grade value of 0 means that
+                 the grade is ungraded
+        """
+        grades = list(self._grade_data)
+        return (array("i", [grade.assignment_id for grade in grades]),
+                array("i", [grade.student_id for grade in grades]),
+                array("b", [grade.grade_value or 0 for grade in grades]))
+
+    @reading
+    def get_ungraded_grade_columns(self):
+        """
+        Get the ungraded grades as two parallel columns, in the order of get_ungraded_grades
+        :return: a tuple of arrays (assignment ids, student ids)
+        """
+        grades = self.get_ungraded_grades()
+        return array("i", [grade.assignment_id for grade in grades]), array("i", [grade.student_id for grade in grades])
+
+    def flush(self):
+        """
+        Write the modifications which were not saved yet to the storage of the repository
+        """
+        pass
+
+    def check_persistence_errors(self):
+        """
+        Report the errors which happened while the repository was saved in background
+        """
+        pass
+
+    def after_commit(self, function, rollback_function=None):
+        """
+        Run a function once the modifications done so far are persisted by the storage of the repository: when the
+        outermost batch ends, or right away outside of a batch
+        :param function: a function without parameters
+        :param rollback_function: a function without parameters, run instead of function if the storage rolls the
+                                  batch back, or None
+        """
+        function()
+
+    @contextmanager
+    def batch(self):
+        """
+        Group several modifications, so the repository can persist them together when the with block ends; the lock
+        is held for writing until then, so the other threads never see a half done batch
+        """
+        with self._lock.write(), self._persistence_batch():
+            yield
+
+    def _persistence_batch(self):
+        """
+        Get the context manager which groups the modifications in the storage of the repository
+        """
+        return nullcontext()
+
+    def get_lock(self):
+        """
+        Get the lock of the repository, for the services which read or modify several repositories together
+        :return: a ReadWriteLock object
+        """
+        return self._lock
+
+    def _add_to_indexes(self, grade):
+        """
+        Add the key of a grade to the student, assignment and ungraded indexes, and count its value in the aggregates
+        :param grade: a grade object which was added to the grade data
+        """
+        grade_key = (grade.assignment_id, grade.student_id)
+        self._grades_by_student.setdefault(grade.student_id, dict())[grade_key] = None
+        self._grades_by_assignment.setdefault(grade.assignment_id, dict())[grade_key] = None
+        self._grade_sequences[grade_key] = self._next_grade_sequence
+        self._next_grade_sequence += 1
+        if grade.grade_value is None:
+            self._mark_ungraded(grade_key)
+        else:
+            self._grade_aggregates.add_grade_value(grade.assignment_id, grade.student_id, grade.grade_value,
+                                                   self._grade_sequences[grade_key])
+
+    def _remove_from_indexes(self, assignment_id, student_id):
+        """
+        Remove the key of a grade from the student, assignment and ungraded indexes, and its value from the
+        aggregates; the grade must still be in the grade data
+        :param assignment_id: a integer which represent the assignment id of the grade
+        :param student_id: a integer which represent the student id of the grade
+        """
+        grade_key = (assignment_id, student_id)
+        sequence = self._grade_sequences.pop(grade_key)
+        grade_value = self._grade_data[grade_key].grade_value
+        if grade_value is not None:
+            self._grade_aggregates.remove_grade_value(assignment_id, student_id, grade_value, sequence)
+        grades_of_student = self._grades_by_student[student_id]
+        del grades_of_student[grade_key]
+        if len(grades_of_student) == 0:
+            del self._grades_by_student[student_id]
+        grades_of_assignment = self._grades_by_assignment[assignment_id]
+        del grades_of_assignment[grade_key]
+        if len(grades_of_assignment) == 0:
+            del self._grades_by_assignment[assignment_id]
+        self._unmark_ungraded(grade_key)
+
+    def _mark_ungraded(self, grade_key):
+        """
+        Add a grade to the ungraded indexes, after the grades which became ungraded before it; a grade which is
+        already ungraded keeps its place
+        :param grade_key: a tuple (assignment_id, student_id)
+        """
+        if grade_key not in self._ungraded_grades:
+            self._ungraded_grades.append(grade_key)
+            self._ungraded_grades_by_assignment.setdefault(grade_key[0], dict())[grade_key] = None
+
+    def _unmark_ungraded(self, grade_key):
+        """
+        Remove a grade from the ungraded indexes, if it is there
+        :param grade_key: a tuple (assignment_id, student_id)
+        """
+        if self._ungraded_grades.remove(grade_key):
+            ungraded_grades_of_assignment = self._ungraded_grades_by_assignment[grade_key[0]]
+            del ungraded_grades_of_assignment[grade_key]
+            if len(ungraded_grades_of_assignment) == 0:
+                del self._ungraded_grades_by_assignment[grade_key[0]]
+
 
 class GradeTextFileRepository(GradeRepository):
-    def __init__(self, file_name):
+    def __init__(self, file_name, writer=None):
         """
         Initialize the text-file based grade repository
         :param file_name: a string which represent the name/location of the file where the data from repository is stored
+        :param writer: an AsyncFileWriter object which saves the file in background, or None
         """
         super().__init__()
         self._file_name = file_name
+        self._write_behind = WriteBehind(file_name, self._serialize_data, writer)
         self._load_file()
 
     def _load_file(self):
@@ -96,44 +392,61 @@ class GradeTextFileRepository(GradeRepository):
             grade_to_add = Grade(int(assignment_id), int(student_id))
             if grade_value != "None":
                 grade_to_add.grade_value = int(grade_value)
-            self.add_grade(grade_to_add)
+            super().add_grade(grade_to_add)
         file.close()
 
-    def _save_file(self):
+    def _serialize_data(self):
         """
-        Write the new state of grade_data to the file
+        Encode the new state of grade_data for writing it to the file
+        :return: a bytes object
         """
-        file = open(self._file_name, "wt")
-        for graded_students in self._grade_data.values():
-            for grade in graded_students.values():
-                file.write(str(grade.assignment_id) + "/" + str(grade.student_id) + "/" + str(grade.grade_value) + "\n")
-        file.close()
+        lines = [str(grade.assignment_id) + "/" + str(grade.student_id) + "/" + str(grade.grade_value) + "\n"
+                 for grade in self._grade_data.values()]
+        return "".join(lines).encode()
+
+    def flush(self):
+        self._write_behind.flush()
 
+    def check_persistence_errors(self):
+        self._write_behind.check_errors()
+
+    def after_commit(self, function, rollback_function=None):
+        self._write_behind.after_commit(function)
+
+    def _persistence_batch(self):
+        return self._write_behind.batch()
+
+    @writing
     def add_grade(self, grade_to_add):
-        super().add_grade(grade_to_add)
-        self._save_file()
+        with self._write_behind.modification():
+            super().add_grade(grade_to_add)
 
+    @writing
     def remove_a_grade(self, assignment_id, student_id):
-        super().remove_a_grade(assignment_id,student_id)
-        self._save_file()
+        with self._write_behind.modification():
+            super().remove_a_grade(assignment_id,student_id)
 
+    @writing
     def remove_grades(self, entity_id, id_position):
-        super().remove_grades(entity_id,id_position)
-        self._save_file()
+        with self._write_behind.modification():
+            super().remove_grades(entity_id,id_position)
 
+    @writing
     def grade_student_for_a_given_assignment(self, grade):
-        super().grade_student_for_a_given_assignment(grade)
-        self._save_file()
+        with self._write_behind.modification():
+            super().grade_student_for_a_given_assignment(grade)
 
 
 class GradeBinaryFileRepository(GradeRepository):
-    def __init__(self, file_name):
+    def __init__(self, file_name, writer=None):
         """
         Initialize the binary-file based grade repository
         :param file_name: a string which represent the name/location of the file where the data from repository is stored
+        :param writer: an AsyncFileWriter object which saves the file in background, or None
         """
         super().__init__()
         self._file_name = file_name
+        self._write_behind = WriteBehind(file_name, self._serialize_data, writer)
         self._load_file()
 
     def _load_file(self):
@@ -141,29 +454,449 @@ class GradeBinaryFileRepository(GradeRepository):
         Read grades from the file and store them in grade_data
         """
         file = open(self._file_name, "rb")
-        self._grade_data = pickle.load(file)
+        content = file.read()
         file.close()
+        if len(content) != 0:
+            for grade in decode_grades(content):
+                super().add_grade(grade)
 
-    def _save_file(self):
+    def _serialize_data(self):
         """
-        Write the new state of grade_data to the file
+        Encode the new state of grade_data for writing it to the file
+        :return: a bytes object
         """
-        file = open(self._file_name, "wb")
-        pickle.dump(self._grade_data, file)
-        file.close()
+        return encode_grades(self._grade_data)
+
+    def flush(self):
+        self._write_behind.flush()
+
+    def check_persistence_errors(self):
+        self._write_behind.check_errors()
+
+    def after_commit(self, function, rollback_function=None):
+        self._write_behind.after_commit(function)
+
+    def _persistence_batch(self):
+        return self._write_behind.batch()
 
+    @writing
+    def add_grade(self, grade_to_add):
+        with self._write_behind.modification():
+            super().add_grade(grade_to_add)
+
+    @writing
+    def remove_a_grade(self, assignment_id, student_id):
+        with self._write_behind.modification():
+            super().remove_a_grade(assignment_id, student_id)
+
+    @writing
+    def remove_grades(self, entity_id, id_position):
+        with self._write_behind.modification():
+            super().remove_grades(entity_id, id_position)
+
+    @writing
+    def grade_student_for_a_given_assignment(self, grade):
+        with self._write_behind.modification():
+            super().grade_student_for_a_given_assignment(grade)
+
+
+class GradeJournalRepository(GradeRepository):
+    def __init__(self, file_name):
+        """
+        Initialize the journal based grade repository
+        :param file_name: a string which represent the name/location of the journal file of the repository
+        """
+        super().__init__()
+        self._journal = Journal(file_name)
+        self._load_file()
+
+    def _load_file(self):
+        """
+        Replay the records of the journal to rebuild grade_data
+        """
+        for record in self._journal.read_records():
+            operation = record["operation"]
+            if operation == "add":
+                super().add_grade(Grade(record["assignment_id"], record["student_id"], record["grade_value"]))
+            elif operation == "remove":
+                super().remove_a_grade(record["assignment_id"], record["student_id"])
+            elif operation == "remove_all":
+                super().remove_grades(record["entity_id"], record["id_position"])
+            elif operation == "grade":
+                super().grade_student_for_a_given_assignment(
+                    Grade(record["assignment_id"], record["student_id"], record["grade_value"]))
+            else:
+                raise JournalException("Unknown grade journal record: " + str(record))
+
+    def _persistence_batch(self):
+        return self._journal.batch()
+
+    def after_commit(self, function, rollback_function=None):
+        self._journal.after_commit(function)
+
+    def _write_to_journal(self, record):
+        """
+        Append a record to the journal and compact the journal if it grew too large
+        :param record: a dictionary which describes the modification
+        """
+        self._journal.append(record)
+        if self._journal.needs_compaction(len(self._grade_data)):
+            self._journal.compact_in_background(
+                [{"operation": "add", "assignment_id": grade.assignment_id, "student_id": grade.student_id,
+                  "grade_value": grade.grade_value} for grade in self._grade_data])
+
+    @writing
     def add_grade(self, grade_to_add):
         super().add_grade(grade_to_add)
-        self._save_file()
+        self._write_to_journal({"operation": "add", "assignment_id": grade_to_add.assignment_id,
+                                "student_id": grade_to_add.student_id, "grade_value": grade_to_add.grade_value})
 
+    @writing
     def remove_a_grade(self, assignment_id, student_id):
         super().remove_a_grade(assignment_id, student_id)
-        self._save_file()
+        self._write_to_journal({"operation": "remove", "assignment_id": assignment_id, "student_id": student_id})
 
+    @writing
     def remove_grades(self, entity_id, id_position):
         super().remove_grades(entity_id, id_position)
-        self._save_file()
+        self._write_to_journal({"operation": "remove_all", "entity_id": entity_id, "id_position": id_position})
 
+    @writing
     def grade_student_for_a_given_assignment(self, grade):
         super().grade_student_for_a_given_assignment(grade)
-        self._save_file()
\ No newline at end of file
+        self._write_to_journal({"operation": "grade", "assignment_id": grade.assignment_id,
+                                "student_id": grade.student_id, "grade_value": grade.grade_value})
+
+
+class GradeSqliteRepository(GradeRepository):
+    def __init__(self, database):
+        """
+        Initialize the sqlite based grade repository
+        :param database: a SqliteDatabase object, shared with the other sqlite repositories
+        """
+        super().__init__()
+        self._database = database
+        # the repositories of a database share its lock, since its connection has a single transaction
+        self._lock = database.get_lock()
+        self._grade_data = SqliteTable(database, "grades", ("assignment_id", "student_id"),
+                                       ("assignment_id", "student_id", "grade_value"), lambda row: Grade(*row))
+
+    def _select_grades(self, condition, parameters=()):
+        """
+        Select the grades which satisfy a condition, in the order they were added
+        :param condition: a string with the sql condition
+        :param parameters: a tuple with the values for the placeholders of the condition
+        :return: a list of grade objects
+        """
+        return [Grade(*row) for row in self._database.query(
+            "SELECT assignment_id, student_id, grade_value FROM grades WHERE " + condition + " ORDER BY rowid",
+            parameters)]
+
+    @writing
+    def add_grade(self, grade_to_add):
+        if (grade_to_add.assignment_id, grade_to_add.student_id) in self._grade_data:
+            raise GradeRepositoryException("The student with id: " + str(grade_to_add.student_id) + "already has "
+                                           "the assignment with id: " + str(grade_to_add.assignment_id))
+        self._database.execute("INSERT INTO grades (assignment_id, student_id, grade_value) VALUES (?, ?, ?)",
+                               (grade_to_add.assignment_id, grade_to_add.student_id, grade_to_add.grade_value))
+        self._version += 1
+
+    @writing
+    def remove_a_grade(self, assignment_id, student_id):
+        self._database.execute("DELETE FROM grades WHERE assignment_id = ? AND student_id = ?",
+                               (assignment_id, student_id))
+        self._version += 1
+
+    @writing
+    def remove_grades(self, entity_id, id_position):
+        if id_position == 0:
+            self._database.execute("DELETE FROM grades WHERE assignment_id = ?", (entity_id,))
+        else:
+            self._database.execute("DELETE FROM grades WHERE student_id = ?", (entity_id,))
+        self._version += 1
+
+    @writing
+    def grade_student_for_a_given_assignment(self, grade):
+        grade_value = Grade.check_valid_grade(grade.grade_value)
+        if self._database.execute("UPDATE grades SET grade_value = ? WHERE assignment_id = ? AND student_id = ?",
+                                  (grade_value, grade.assignment_id, grade.student_id)) == 0:
+            raise KeyError((grade.assignment_id, grade.student_id))
+        # a failed call leaves the version alone, so the cached statistics stay valid
+        self._version += 1
+
+    @reading
+    def get_grades_of_student(self, student_id):
+        return self._select_grades("student_id = ?", (student_id,))
+
+    @reading
+    def get_grades_of_assignment(self, assignment_id):
+        return self._select_grades("assignment_id = ?", (assignment_id,))
+
+    @reading
+    def get_ungraded_grades(self):
+        return self._select_grades("grade_value IS NULL")
+
+    @reading
+    def get_ungraded_grade_at(self, position):
+        if position < 0:
+            position += self._database.query("SELECT COUNT(*) FROM grades WHERE grade_value IS NULL").fetchone()[0]
+        row = None
+        if position >= 0:
+            row = self._database.query("SELECT assignment_id, student_id, grade_value FROM grades "
+                                       "WHERE grade_value IS NULL ORDER BY rowid LIMIT 1 OFFSET ?",
+                                       (position,)).fetchone()
+        if row is None:
+            raise IndexError("Position out of range")
+        return Grade(*row)
+
+    @reading
+    def get_graded_grades(self):
+        return self._select_grades("grade_value IS NOT NULL")
+
+    @reading
+    def get_students_with_ungraded_grades_of_assignments(self, assignment_ids):
+        assignment_ids = list(assignment_ids)
+        if len(assignment_ids) == 0:
+            return []
+        return [row[0] for row in self._database.query(
+            "SELECT student_id FROM grades WHERE grade_value IS NULL AND assignment_id IN (" +
+            ", ".join("?" * len(assignment_ids)) + ") GROUP BY student_id ORDER BY MIN(rowid)", assignment_ids)]
+
+    @reading
+    def get_grades_of_assignment_sorted_descending(self, assignment_id, limit=None, min_grade=None):
+        statement = "SELECT assignment_id, student_id, grade_value FROM grades WHERE assignment_id = ?"
+        parameters = (assignment_id,)
+        if min_grade is not None:
+            statement += " AND grade_value >= ?"
+            parameters += (min_grade,)
+        statement += " ORDER BY grade_value IS NULL, grade_value DESC, rowid"
+        if limit is not None:
+            statement += " LIMIT ?"
+            parameters += (limit,)
+        return [Grade(*row) for row in self._database.query(statement, parameters)]
+
+    @reading
+    def get_students_sorted_descending_by_average_grade(self, limit=None, min_average=None):
+        # ties keep the order in which the students received their first graded assignment, like the in-memory
+        # repository does
+        statement = "SELECT student_id, AVG(grade_value) FROM grades WHERE grade_value IS NOT NULL GROUP BY student_id"
+        parameters = ()
+        if min_average is not None:
+            statement += " HAVING AVG(grade_value) >= ?"
+            parameters += (min_average,)
+        statement += " ORDER BY AVG(grade_value) DESC, MIN(rowid)"
+        if limit is not None:
+            statement += " LIMIT ?"
+            parameters += (limit,)
+        return [(row[0], row[1]) for row in self._database.query(statement, parameters)]
+
+    @reading
+    def get_average_grade_of_student(self, student_id):
+        return self._database.query("SELECT AVG(grade_value) FROM grades WHERE student_id = ?",
+                                    (student_id,)).fetchone()[0]
+
+    @reading
+    def get_average_grade_of_assignment(self, assignment_id):
+        return self._database.query("SELECT AVG(grade_value) FROM grades WHERE assignment_id = ?",
+                                    (assignment_id,)).fetchone()[0]
+
+    @reading
+    def get_grade_columns(self):
+        rows = self._database.query(
+            "SELECT assignment_id, student_id, IFNULL(grade_value, 0) FROM grades ORDER BY rowid").fetchall()
+        return (array("i", [row[0] for row in rows]), array("i", [row[1] for row in rows]),
+                array("b", [row[2] for row in rows]))
+
+    @reading
+    def get_ungraded_grade_columns(self):
+        rows = self._database.query(
+            "SELECT assignment_id, student_id FROM grades WHERE grade_value IS NULL ORDER BY rowid").fetchall()
+        return array("i", [row[0] for row in rows]), array("i", [row[1] for row in rows])
+
+    def _persistence_batch(self):
+        return self._database.transaction()
+
+    def after_commit(self, function, rollback_function=None):
+        self._database.after_commit(function, rollback_function)
+
+
+class GradeColumnarRepository(GradeRepository):
+    def __init__(self, file_name):
+        """
+        Initialize the grade repository backed by a memory-mapped columnar file. The grades are not kept as
+        objects: they are built from the columns when a service asks for them.
+        :param file_name: a string which represent the name/location of the columnar grade file
+        """
+        super().__init__()
+        self._store = ColumnarGradeStore(file_name)
+        self._grade_data = ColumnarGradeTable(self._store)
+        # the ungraded grades are kept by key, not by row, since removing a grade moves the last row into its place;
+        # after a restart they start in the order of the rows
+        for row in self._store.find_rows("grade_value", 0):
+            self._ungraded_grades.append((self._store.assignment_ids[row], self._store.student_ids[row]))
+        self._batch_depth = 0
+        # functions which wait for the end of the batch, see after_commit
+        self._after_commit_functions = []
+
+    def _grades_at(self, rows):
+        return [self._grade_data.grade_at(row) for row in rows]
+
+    @writing
+    def add_grade(self, grade_to_add):
+        if (grade_to_add.assignment_id, grade_to_add.student_id) in self._grade_data:
+            raise GradeRepositoryException("The student with id: " + str(grade_to_add.student_id) + "already has "
+                                           "the assignment with id: " + str(grade_to_add.assignment_id))
+        self._store.append(grade_to_add.assignment_id, grade_to_add.student_id, grade_to_add.grade_value or 0)
+        if grade_to_add.grade_value is None:
+            self._ungraded_grades.append((grade_to_add.assignment_id, grade_to_add.student_id))
+        self._version += 1
+
+    @writing
+    def remove_a_grade(self, assignment_id, student_id):
+        self._store.delete(assignment_id, student_id)
+        self._ungraded_grades.remove((assignment_id, student_id))
+        self._version += 1
+
+    @writing
+    def remove_grades(self, entity_id, id_position):
+        column = "assignment_id" if id_position == 0 else "student_id"
+        # removing moves the last row into the hole, so the keys are collected before anything is removed
+        for assignment_id, student_id in [(self._store.assignment_ids[row], self._store.student_ids[row])
+                                          for row in self._store.find_rows(column, entity_id)]:
+            self._store.delete(assignment_id, student_id)
+            self._ungraded_grades.remove((assignment_id, student_id))
+        self._version += 1
+
+    @writing
+    def grade_student_for_a_given_assignment(self, grade):
+        row = self._store.find_row(grade.assignment_id, grade.student_id)
+        if row < 0:
+            raise KeyError((grade.assignment_id, grade.student_id))
+        grade_value = Grade.check_valid_grade(grade.grade_value)
+        self._store.set_grade_value(row, grade_value or 0)
+        grade_key = (grade.assignment_id, grade.student_id)
+        if grade_value is None:
+            # like the in-memory repository, a grade which is already ungraded keeps its place
+            if grade_key not in self._ungraded_grades:
+                self._ungraded_grades.append(grade_key)
+        else:
+            self._ungraded_grades.remove(grade_key)
+        self._version += 1
+
+    @reading
+    def get_grades_of_student(self, student_id):
+        return self._grades_at(self._store.find_rows("student_id", student_id))
+
+    @reading
+    def get_grades_of_assignment(self, assignment_id):
+        return self._grades_at(self._store.find_rows("assignment_id", assignment_id))
+
+    @reading
+    def get_ungraded_grades(self):
+        return self._grades_at(self._ungraded_rows())
+
+    def _ungraded_rows(self):
+        return [self._store.find_row(assignment_id, student_id) for assignment_id, student_id in self._ungraded_grades]
+
+    @reading
+    def get_ungraded_grade_at(self, position):
+        # the key at the position is found in the Fenwick index and its row in the hash index, both in O(log n)
+        assignment_id, student_id = self._ungraded_grades[position]
+        return self._grade_data.grade_at(self._store.find_row(assignment_id, student_id))
+
+    @reading
+    def get_graded_grades(self):
+        grade_values = self._store.grade_values
+        return self._grades_at([row for row in range(len(self._store)) if grade_values[row] != 0])
+
+    @reading
+    def get_students_with_ungraded_grades_of_assignments(self, assignment_ids):
+        first_ungraded_orders = dict()
+        for assignment_id in assignment_ids:
+            for row in self._store.find_rows("assignment_id", assignment_id):
+                student_id = self._store.student_ids[row]
+                if self._store.grade_values[row] == 0:
+                    order = self._ungraded_grades.order_of((assignment_id, student_id))
+                    if order < first_ungraded_orders.get(student_id, order + 1):
+                        first_ungraded_orders[student_id] = order
+        return sort_a_list(list(first_ungraded_orders), key=first_ungraded_orders.get)
+
+    @reading
+    def get_students_sorted_descending_by_average_grade(self, limit=None, min_average=None):
+        # the sums and counts are computed straight from the columns, without building grade objects
+        sums = {}
+        counts = {}
+        for student_id, grade_value in zip(self._store.student_ids[:len(self._store)],
+                                           self._store.grade_values[:len(self._store)]):
+            if grade_value != 0:
+                if student_id in sums:
+                    sums[student_id] += grade_value
+                    counts[student_id] += 1
+                else:
+                    sums[student_id] = grade_value
+                    counts[student_id] = 1
+        students_list = [(student_id, sums[student_id] / counts[student_id]) for student_id in sums]
+        if min_average is not None:
+            students_list = [entity for entity in students_list if entity[1] >= min_average]
+        if limit is not None:
+            return heapq.nlargest(limit, students_list, key=lambda entity: entity[1])
+        return sort_a_list(students_list, key=lambda entity: entity[1], reverse=True)
+
+    @reading
+    def get_average_grade_of_student(self, student_id):
+        return self._average_of_rows(self._store.find_rows("student_id", student_id))
+
+    @reading
+    def get_average_grade_of_assignment(self, assignment_id):
+        return self._average_of_rows(self._store.find_rows("assignment_id", assignment_id))
+
+    def _average_of_rows(self, rows):
+        grade_values = [self._store.grade_values[row] for row in rows if self._store.grade_values[row] != 0]
+        return sum(grade_values) / len(grade_values) if len(grade_values) != 0 else None
+
+    @reading
+    def get_grade_columns(self):
+        # the mapped columns are copied, so the arrays stay valid when the store grows or is closed
+        return tuple(self._copy_column(type_code, column) for type_code, column in
+                     (("i", self._store.assignment_ids), ("i", self._store.student_ids),
+                      ("b", self._store.grade_values)))
+
+    @reading
+    def get_ungraded_grade_columns(self):
+        return (array("i", [assignment_id for assignment_id, student_id in self._ungraded_grades]),
+                array("i", [student_id for assignment_id, student_id in self._ungraded_grades]))
+
+    def _copy_column(self, type_code, column):
+        copied_column = array(type_code)
+        copied_column.frombytes(column[:len(self._store)].tobytes())
+        return copied_column
+
+    def flush(self):
+        self._store.flush()
+
+    @contextmanager
+    def _persistence_batch(self):
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and len(self._after_commit_functions) != 0:
+                after_commit_functions, self._after_commit_functions = self._after_commit_functions, []
+                # the modified pages are written once for the whole batch
+                self._store.flush()
+                for function in after_commit_functions:
+                    function()
+
+    def after_commit(self, function, rollback_function=None):
+        if self._batch_depth > 0:
+            self._after_commit_functions.append(function)
+            return
+        self._store.flush()
+        function()
+
+    def close(self):
+        """
+        Write the modified pages to the disk and unmap the grade file
+        """
+        self._store.close()
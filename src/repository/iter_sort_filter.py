@@ -1,9 +1,12 @@
+from functools import cmp_to_key
+
+
 class Iterator:
     def __init__(self):
         self._data = dict()
 
     def __contains__(self, key):
-        return True if key in self._data else False
+        return key in self._data
 
     def __setitem__(self, key, value):
         self._data[key] = value
@@ -15,48 +18,81 @@ class Iterator:
         del self._data[key]
 
     def __iter__(self):
-        self._position = 0
-        return self
-
-    def __next__(self):
-        if self._position == len(self._data):
-            raise StopIteration
-        self._position += 1
-        return self._data[list(self._data.keys())[self._position-1]]
+        """
+        Start a new pass over the entities of the container
+        :return: a new cursor object, so nested or concurrent loops don't share the same position
+        """
+        return IteratorCursor(self._data)
 
     def __len__(self):
         return len(self._data)
 
-    # def __repr__(self):
-    #     representation = ""
-    #     for entity in self._data.values():
-    #         representation = representation + str(entity) + "\n"
-    #     return representation
-    #
-    # def copy(self):
-    #     return self._data.copy()
-    #
-    # def get_keys(self):
-    #     return list(self._data.keys())
+    def keys(self):
+        return self._data.keys()
 
+    def values(self):
+        return self._data.values()
 
-def gnome_sort(list_to_sort, compare):
+    def items(self):
+        return self._data.items()
+
+
+class IteratorCursor:
+    def __init__(self, data):
+        """
+        Initialize the cursor used for one pass over an Iterator container
+        :param data: the dictionary that stores the entities of the container
+        """
+        self._data = data
+        self._keys = iter(data)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """
+        Move to the next key and return the entity stored under it, in O(1)
+        :except StopIteration, if there are no more entities
+        """
+        return self._data[next(self._keys)]
+
+
+def sort_a_list(list_to_sort, compare=None, key=None, reverse=False):
     """
-    Function to sort a list using gnome sort algorithm
+    Function to sort a list in O(n log n); the sort is stable, so equal entities keep their relative order
     :param list_to_sort: a list object
-    :param compare: a function used for comparing 2 objects from the list
+    :param compare: a function compare(entity, previous_entity) which returns True if entity can stay after
+                    previous_entity in the sorted list
+    :param key: a function which extracts the value to sort by from an entity, used instead of compare
+    :param reverse: True, if the list must be sorted descending by key
     :return: the sorted list
     """
-    index_for_list = 0
-    number_of_entities = len(list_to_sort)
-    while index_for_list < number_of_entities:
-        if index_for_list == 0 or compare(list_to_sort[index_for_list], list_to_sort[index_for_list-1]):
-            index_for_list = index_for_list + 1
-        else:
-            list_to_sort[index_for_list], list_to_sort[index_for_list - 1] = list_to_sort[index_for_list - 1], list_to_sort[index_for_list]
-            index_for_list = index_for_list - 1
+    if key is not None:
+        list_to_sort.sort(key=key, reverse=reverse)
+    elif compare is not None:
+        list_to_sort.sort(key=cmp_to_key(_comparison_from_compare(compare)), reverse=reverse)
+    else:
+        list_to_sort.sort(reverse=reverse)
     return list_to_sort
 
+
+def _comparison_from_compare(compare):
+    """
+    Turn a compare(entity, previous_entity) function into a three-way comparison function
+    :param compare: a function which returns True if entity can stay after previous_entity
+    :return: a function which returns a negative number, zero or a positive number
+    """
+    def comparison(first_entity, second_entity):
+        first_before_second = compare(second_entity, first_entity)
+        second_before_first = compare(first_entity, second_entity)
+        if first_before_second and not second_before_first:
+            return -1
+        if second_before_first and not first_before_second:
+            return 1
+        return 0
+    return comparison
+
+
 def filter_a_list(list_to_filter, accept):
     """
     Function to filter a list by a specified criteria
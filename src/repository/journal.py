@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+
+class JournalException(Exception):
+    pass
+
+
+class Journal:
+    def __init__(self, file_name, compaction_ratio=2, minimum_records_before_compaction=1000):
+        """
+        Initialize the append-only journal of a repository
+        :param file_name: a string which represent the name/location of the journal file
+        :param compaction_ratio: a integer, the journal is compacted when it holds more than compaction_ratio records
+                                 for every live entity
+        :param minimum_records_before_compaction: a integer, the journal is compacted only once it holds at least
+                                                  this many records, so small journals are never compacted
+        """
+        self._file_name = file_name
+        self._compaction_ratio = compaction_ratio
+        self._minimum_records_before_compaction = minimum_records_before_compaction
+        self._number_of_records = 0
+        self._lock = threading.Lock()
+        self._compaction_thread = None
+        # records appended while a compaction is running, they are copied at the end of the compacted journal
+        self._records_during_compaction = None
+        self._file = None
+        # while a batch is open the appended records are written without waiting for the disk
+        self._batch_depth = 0
+        # functions which wait for the end of the batch, see after_commit
+        self._after_commit_functions = []
+
+    def read_records(self):
+        """
+        Read the records from the journal, in the order they were appended. A record which was not written completely
+        (the program stopped in the middle of a write) is cut from the end of the journal.
+        :return: a list of dictionaries, one for every record
+        """
+        records = []
+        valid_length = 0
+        if os.path.exists(self._file_name):
+            file = open(self._file_name, "rb")
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                valid_length += len(line)
+            file.close()
+            if valid_length != os.path.getsize(self._file_name):
+                os.truncate(self._file_name, valid_length)
+        self._number_of_records = len(records)
+        self._file = open(self._file_name, "ab")
+        return records
+
+    def append(self, record):
+        """
+        Append a record at the end of the journal and wait until it reaches the disk; inside a batch, the record
+        reaches the disk when the batch ends
+        :param record: a dictionary which describes one modification of the repository
+        """
+        line = self._encode_record(record)
+        with self._lock:
+            self._file.write(line)
+            if self._batch_depth == 0:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._number_of_records += 1
+            if self._records_during_compaction is not None:
+                self._records_during_compaction.append(line)
+
+    @contextmanager
+    def batch(self):
+        """
+        Group the records appended in the with block, so they reach the disk together, with a single fsync, when the
+        outermost block ends
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                after_commit_functions = []
+                if self._batch_depth == 0:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    after_commit_functions, self._after_commit_functions = self._after_commit_functions, []
+            for function in after_commit_functions:
+                function()
+
+    def after_commit(self, function):
+        """
+        Run a function once the records appended so far are on disk: when the outermost batch ends, or right away
+        outside of a batch, where every record is already on disk
+        :param function: a function without parameters
+        """
+        with self._lock:
+            if self._batch_depth > 0:
+                self._after_commit_functions.append(function)
+                return
+        function()
+
+    def needs_compaction(self, number_of_live_entities):
+        """
+        Check if the journal grew large enough, compared to the live data, to be compacted
+        :param number_of_live_entities: a integer which represents the number of entities in the repository
+        :return: True, if the journal should be compacted, False otherwise
+        """
+        if self._records_during_compaction is not None:
+            return False
+        return self._number_of_records >= self._minimum_records_before_compaction and \
+            self._number_of_records > self._compaction_ratio * number_of_live_entities
+
+    def compact_in_background(self, snapshot_records):
+        """
+        Replace the journal with the given snapshot, on a background thread
+        :param snapshot_records: a list of records which rebuild the current state of the repository
+        """
+        lines = [self._encode_record(record) for record in snapshot_records]
+        with self._lock:
+            self._records_during_compaction = []
+        self._compaction_thread = threading.Thread(target=self._compact, args=(lines,))
+        self._compaction_thread.start()
+
+    def wait_for_compaction(self):
+        """
+        Wait until the background compaction (if there is one) is finished
+        """
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+            self._compaction_thread = None
+
+    def close(self):
+        """
+        Finish the background compaction and close the journal file
+        """
+        self.wait_for_compaction()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _compact(self, lines):
+        """
+        Write the snapshot to a temporary file and swap it with the journal. The old journal stays untouched until
+        the new one is complete on disk, so a crash during compaction loses nothing.
+        :param lines: a list of encoded records which rebuild the state of the repository
+        """
+        temporary_file_name = self._file_name + ".compact"
+        temporary_file = open(temporary_file_name, "wb")
+        try:
+            temporary_file.writelines(lines)
+            with self._lock:
+                temporary_file.writelines(self._records_during_compaction)
+                temporary_file.flush()
+                os.fsync(temporary_file.fileno())
+                temporary_file.close()
+                self._file.close()
+                os.replace(temporary_file_name, self._file_name)
+                self._file = open(self._file_name, "ab")
+                self._number_of_records = len(lines) + len(self._records_during_compaction)
+        finally:
+            if not temporary_file.closed:
+                temporary_file.close()
+                os.remove(temporary_file_name)
+            with self._lock:
+                self._records_during_compaction = None
+
+    @staticmethod
+    def _encode_record(record):
+        return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
@@ -0,0 +1,101 @@
+MINIMUM_CAPACITY = 16
+
+
+class PositionalIndex:
+    def __init__(self):
+        """
+        Initialize an ordered set of keys, where new keys go at the end. Every key gets a slot; a Fenwick tree counts
+        the used slots, so a key can be removed and the key at a position can be found in O(log n) time
+        """
+        # slot -> key, or None for a slot whose key was removed
+        self._keys = []
+        self._slot_of_key = dict()
+        # 1-based Fenwick tree over the slots, a used slot counts as 1
+        self._tree = [0] * (MINIMUM_CAPACITY + 1)
+
+    def __len__(self):
+        return len(self._slot_of_key)
+
+    def __contains__(self, key):
+        return key in self._slot_of_key
+
+    def __iter__(self):
+        return (key for key in self._keys if key is not None)
+
+    def append(self, key):
+        """
+        Add a key after all the other keys
+        :param key: a hashable object, which is not in the index yet
+        """
+        if len(self._keys) == len(self._tree) - 1:
+            self._rebuild()
+        slot = len(self._keys)
+        self._keys.append(key)
+        self._slot_of_key[key] = slot
+        self._update(slot, 1)
+
+    def remove(self, key):
+        """
+        Remove a key, if it is in the index
+        :param key: a hashable object
+        :return: True, if the key was in the index, False otherwise
+        """
+        slot = self._slot_of_key.pop(key, None)
+        if slot is None:
+            return False
+        self._keys[slot] = None
+        self._update(slot, -1)
+        return True
+
+    def order_of(self, key):
+        """
+        Get a number which orders the keys like their positions; unlike the position, it doesn't change when other
+        keys are removed, only when a new key is appended
+        :param key: a hashable object, which is in the index
+        """
+        return self._slot_of_key[key]
+
+    def __getitem__(self, position):
+        """
+        Get the key at a position
+        :param position: a integer, negative positions count from the end like for lists
+        :except IndexError, if there is no key at the position
+        """
+        if position < 0:
+            position += len(self._slot_of_key)
+        if not 0 <= position < len(self._slot_of_key):
+            raise IndexError("Position out of range")
+        # descend the Fenwick tree, looking for the smallest slot with position + 1 used slots up to it
+        slot = 0
+        remaining = position + 1
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step > 0:
+            next_slot = slot + step
+            if next_slot < len(self._tree) and self._tree[next_slot] < remaining:
+                slot = next_slot
+                remaining -= self._tree[next_slot]
+            step >>= 1
+        return self._keys[slot]
+
+    def _update(self, slot, change):
+        tree_position = slot + 1
+        while tree_position < len(self._tree):
+            self._tree[tree_position] += change
+            tree_position += tree_position & -tree_position
+
+    def _rebuild(self):
+        """
+        Drop the slots of the removed keys and make room for new keys: the capacity is doubled only if more than half
+        of the slots are used; the tree is built in O(n)
+        """
+        self._keys = [key for key in self._keys if key is not None]
+        capacity = max(MINIMUM_CAPACITY, 2 * len(self._tree) - 2 if 2 * len(self._keys) > len(self._tree) - 1
+                       else len(self._tree) - 1)
+        self._slot_of_key = {key: slot for slot, key in enumerate(self._keys)}
+        self._tree = [0] * (capacity + 1)
+        for tree_position in range(1, capacity + 1):
+            if tree_position <= len(self._keys):
+                self._tree[tree_position] += 1
+            parent = tree_position + (tree_position & -tree_position)
+            if parent <= capacity:
+                self._tree[parent] += self._tree[tree_position]
@@ -0,0 +1,135 @@
+import functools
+import itertools
+import threading
+from contextlib import contextmanager, ExitStack
+
+# every lock gets the next number, the locks are always taken in the order of their numbers
+_lock_numbers = itertools.count()
+
+
+class ReadWriteLock:
+    def __init__(self):
+        """
+        Initialize a lock which is held by many readers at the same time, or by a single writer. A thread can take the
+        lock again while it holds it: the writer can read and write, a reader can read. A writer which waits stops
+        the new readers, so a steady stream of reports doesn't keep the writers waiting forever
+        """
+        self._condition = threading.Condition(threading.Lock())
+        # thread id -> how many times the thread took the lock for reading
+        self._readers = dict()
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self.number = next(_lock_numbers)
+
+    def acquire_read(self):
+        thread_id = threading.get_ident()
+        with self._condition:
+            if self._writer != thread_id and thread_id not in self._readers:
+                while self._writer is not None or self._waiting_writers > 0:
+                    self._condition.wait()
+            self._readers[thread_id] = self._readers.get(thread_id, 0) + 1
+
+    def release_read(self):
+        thread_id = threading.get_ident()
+        with self._condition:
+            if self._readers[thread_id] == 1:
+                del self._readers[thread_id]
+                if len(self._readers) == 0:
+                    self._condition.notify_all()
+            else:
+                self._readers[thread_id] -= 1
+
+    def acquire_write(self):
+        """
+        Take the lock for writing, waiting until the other readers and writers release it
+        :except RuntimeError, if the thread holds the lock only for reading, since it would wait for itself
+        """
+        thread_id = threading.get_ident()
+        with self._condition:
+            if self._writer == thread_id:
+                self._write_depth += 1
+                return
+            if thread_id in self._readers:
+                raise RuntimeError("A thread which holds the lock for reading can't take it for writing")
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or len(self._readers) != 0:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = thread_id
+            self._write_depth = 1
+
+    def release_write(self):
+        with self._condition:
+            self._write_depth -= 1
+            if self._write_depth == 0:
+                self._writer = None
+                self._condition.notify_all()
+
+    @contextmanager
+    def read(self):
+        """
+        Hold the lock for reading inside the with block
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        """
+        Hold the lock for writing inside the with block
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+@contextmanager
+def lock_in_order(read_locks=(), write_locks=()):
+    """
+    Hold several locks inside the with block. The locks are taken in the order of their numbers, so two threads which
+    need some of the same locks never wait for each other in a circle
+    :param read_locks: an iterable of ReadWriteLock objects taken for reading
+    :param write_locks: an iterable of ReadWriteLock objects taken for writing, a lock in both lists is only written
+    """
+    # lock -> function which takes it for the with block
+    lock_functions = dict()
+    for lock in read_locks:
+        lock_functions[lock] = lock.read
+    for lock in write_locks:
+        lock_functions[lock] = lock.write
+    with ExitStack() as held_locks:
+        for lock in sorted(lock_functions, key=lambda lock: lock.number):
+            held_locks.enter_context(lock_functions[lock]())
+        yield
+
+
+def reading(method):
+    """
+    Decorate a repository method which only reads the repository, so it runs while the lock of the repository is
+    held for reading
+    """
+    @functools.wraps(method)
+    def locked_method(self, *arguments, **keyword_arguments):
+        with self._lock.read():
+            return method(self, *arguments, **keyword_arguments)
+    return locked_method
+
+
+def writing(method):
+    """
+    Decorate a repository method which modifies the repository, so it runs while the lock of the repository is held
+    for writing
+    """
+    @functools.wraps(method)
+    def locked_method(self, *arguments, **keyword_arguments):
+        with self._lock.write():
+            return method(self, *arguments, **keyword_arguments)
+    return locked_method
@@ -0,0 +1,87 @@
+from bisect import bisect_left, bisect_right, insort
+
+BUCKET_SIZE = 256
+
+
+class SortedBuckets:
+    def __init__(self, bucket_size=BUCKET_SIZE):
+        """
+        Initialize a sorted list of items, split into buckets of at most 2 * bucket_size items. The largest item of
+        every bucket is kept in a separate list, so an item is added or removed with a binary search over the buckets
+        and an insert/delete in a single bucket, in O(log n + bucket_size) time instead of the O(n) of a flat list
+        :param bucket_size: a positive integer, the usual number of items in a bucket
+        """
+        self._bucket_size = bucket_size
+        # sorted lists of items, every item of a bucket is smaller than the items of the next bucket
+        self._buckets = []
+        # the largest item of every bucket
+        self._maximums = []
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+    def add(self, item):
+        """
+        Add an item in its sorted position
+        :param item: a comparable object
+        """
+        self._length += 1
+        if len(self._buckets) == 0:
+            self._buckets.append([item])
+            self._maximums.append(item)
+            return
+        bucket_index = bisect_left(self._maximums, item)
+        if bucket_index == len(self._buckets):
+            # the item is larger than every other item
+            bucket_index -= 1
+            self._buckets[bucket_index].append(item)
+            self._maximums[bucket_index] = item
+        else:
+            insort(self._buckets[bucket_index], item)
+        bucket = self._buckets[bucket_index]
+        if len(bucket) > 2 * self._bucket_size:
+            self._buckets[bucket_index:bucket_index + 1] = [bucket[:self._bucket_size], bucket[self._bucket_size:]]
+            self._maximums[bucket_index:bucket_index + 1] = [bucket[self._bucket_size - 1], bucket[-1]]
+
+    def remove(self, item):
+        """
+        Remove an item
+        :param item: a comparable object, which is in the list
+        :except ValueError, if the item is not in the list
+        """
+        bucket_index = bisect_left(self._maximums, item)
+        if bucket_index == len(self._buckets):
+            raise ValueError("Item not in the list")
+        bucket = self._buckets[bucket_index]
+        item_index = bisect_left(bucket, item)
+        if item_index == len(bucket) or bucket[item_index] != item:
+            raise ValueError("Item not in the list")
+        del bucket[item_index]
+        self._length -= 1
+        if len(bucket) == 0:
+            del self._buckets[bucket_index]
+            del self._maximums[bucket_index]
+        else:
+            self._maximums[bucket_index] = bucket[-1]
+
+    def prefix(self, maximum_item=None, limit=None):
+        """
+        Get the smallest items, in sorted order
+        :param maximum_item: the items larger than this one are left out, or None for no bound
+        :param limit: a non-negative integer, the maximum number of items returned, or None for no limit
+        :return: a list of items, found in O(log n + number of returned items) time
+        """
+        items = []
+        for bucket_index, bucket in enumerate(self._buckets):
+            if maximum_item is not None and self._maximums[bucket_index] > maximum_item:
+                items.extend(bucket[:bisect_right(bucket, maximum_item)])
+                break
+            items.extend(bucket)
+            if limit is not None and len(items) >= limit:
+                break
+        return items if limit is None else items[:limit]
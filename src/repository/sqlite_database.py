@@ -0,0 +1,160 @@
+import sqlite3
+from contextlib import contextmanager
+
+from src.repository.read_write_lock import ReadWriteLock
+
+CREATE_TABLES = [
+    "CREATE TABLE IF NOT EXISTS students (student_id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+    "student_group INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS students_by_group ON students (student_group)",
+    "CREATE TABLE IF NOT EXISTS assignments (assignment_id INTEGER PRIMARY KEY, description TEXT NOT NULL, "
+    "deadline TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS assignments_by_deadline ON assignments (deadline)",
+    "CREATE TABLE IF NOT EXISTS grades (assignment_id INTEGER NOT NULL, student_id INTEGER NOT NULL, "
+    "grade_value INTEGER, UNIQUE (assignment_id, student_id))",
+    "CREATE INDEX IF NOT EXISTS grades_by_student ON grades (student_id)",
+    "CREATE INDEX IF NOT EXISTS ungraded_grades ON grades (assignment_id) WHERE grade_value IS NULL",
+]
+
+
+class SqliteDatabase:
+    def __init__(self, file_name):
+        """
+        Open (or create) the sqlite database shared by the sqlite repositories
+        :param file_name: a string which represent the name/location of the database file
+        """
+        # the sqlite3 module keeps the compiled form of the last cached_statements queries, so the repositories
+        # reuse prepared statements as long as they always send the same sql text with different parameters
+        self._connection = sqlite3.connect(file_name, isolation_level=None, check_same_thread=False,
+                                           cached_statements=256)
+        self._transaction_depth = 0
+        # (function, rollback function) pairs which wait for the end of the transaction, see after_commit
+        self._after_commit_functions = []
+        self._lock = ReadWriteLock()
+        for statement in CREATE_TABLES:
+            self._connection.execute(statement)
+
+    def get_lock(self):
+        """
+        Get the lock shared by the repositories of the database
+        :return: a ReadWriteLock object
+        """
+        return self._lock
+
+    def query(self, statement, parameters=()):
+        """
+        Run a select statement
+        :param statement: a string which represents the sql statement
+        :param parameters: a tuple with the values for the placeholders of the statement
+        :return: a cursor over the selected rows
+        """
+        return self._connection.execute(statement, parameters)
+
+    def execute(self, statement, parameters=()):
+        """
+        Run a statement which modifies the database; outside of a transaction it is committed right away
+        :param statement: a string which represents the sql statement
+        :param parameters: a tuple with the values for the placeholders of the statement
+        :return: the number of modified rows
+        """
+        with self.transaction():
+            return self._connection.execute(statement, parameters).rowcount
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group the statements executed inside the with block into one transaction. Nested transactions join the
+        outer one, so the data is committed once, when the outermost block ends, or rolled back if it fails.
+        """
+        if self._transaction_depth == 0:
+            self._connection.execute("BEGIN")
+        self._transaction_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._connection.execute("ROLLBACK")
+                after_commit_functions, self._after_commit_functions = self._after_commit_functions, []
+                for function, rollback_function in after_commit_functions:
+                    if rollback_function is not None:
+                        rollback_function()
+            raise
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0:
+            self._connection.execute("COMMIT")
+            after_commit_functions, self._after_commit_functions = self._after_commit_functions, []
+            for function, rollback_function in after_commit_functions:
+                function()
+
+    def after_commit(self, function, rollback_function=None):
+        """
+        Run a function once the statements executed so far are committed: when the outermost transaction ends, or
+        right away outside of a transaction, where every statement is already committed
+        :param function: a function without parameters
+        :param rollback_function: a function without parameters, run instead of function if the transaction is
+                                  rolled back, or None
+        """
+        if self._transaction_depth > 0:
+            self._after_commit_functions.append((function, rollback_function))
+        else:
+            function()
+
+    def close(self):
+        self._connection.close()
+
+
+class SqliteTable:
+    def __init__(self, database, table_name, key_columns, columns, row_to_entity):
+        """
+        Initialize a read-only view over a table, which behaves like the Iterator container of the in-memory
+        repositories
+        :param database: a SqliteDatabase object
+        :param table_name: a string which represents the name of the table
+        :param key_columns: a tuple with the names of the columns which identify an entity
+        :param columns: a tuple with the names of the columns needed for building an entity, starting with the
+                        key columns
+        :param row_to_entity: a function which builds an entity from a row
+        """
+        self._database = database
+        self._row_to_entity = row_to_entity
+        self._key_length = len(key_columns)
+        key_condition = " AND ".join(column + " = ?" for column in key_columns)
+        selected_columns = ", ".join(columns)
+        self._select_one = "SELECT " + selected_columns + " FROM " + table_name + " WHERE " + key_condition
+        self._select_all = "SELECT " + selected_columns + " FROM " + table_name + " ORDER BY rowid"
+        self._select_keys = "SELECT " + ", ".join(key_columns) + " FROM " + table_name + " ORDER BY rowid"
+        self._count = "SELECT COUNT(*) FROM " + table_name
+
+    def _key_parameters(self, key):
+        return tuple(key) if self._key_length > 1 else (key,)
+
+    def __contains__(self, key):
+        return self._database.query(self._select_one, self._key_parameters(key)).fetchone() is not None
+
+    def __getitem__(self, key):
+        row = self._database.query(self._select_one, self._key_parameters(key)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return self._row_to_entity(row)
+
+    def __iter__(self):
+        return map(self._row_to_entity, self._database.query(self._select_all))
+
+    def __len__(self):
+        return self._database.query(self._count).fetchone()[0]
+
+    def keys(self):
+        if self._key_length > 1:
+            return [tuple(row) for row in self._database.query(self._select_keys)]
+        return [row[0] for row in self._database.query(self._select_keys)]
+
+    def values(self):
+        return list(self)
+
+    def items(self):
+        # the key columns are always the first selected columns
+        if self._key_length > 1:
+            return [(tuple(row[:self._key_length]), self._row_to_entity(row))
+                    for row in self._database.query(self._select_all)]
+        return [(row[0], self._row_to_entity(row)) for row in self._database.query(self._select_all)]
@@ -1,7 +1,12 @@
-import pickle
+from contextlib import contextmanager, nullcontext
 
 from src.domain.student import Student
 from src.repository.iter_sort_filter import Iterator
+from src.repository.binary_snapshot import encode_students, decode_students
+from src.repository.journal import Journal, JournalException
+from src.repository.sqlite_database import SqliteTable
+from src.repository.write_behind import WriteBehind
+from src.repository.read_write_lock import ReadWriteLock, reading, writing
 
 
 class StudentRepositoryException(Exception):
@@ -14,7 +19,15 @@ class StudentRepository():
         Initialize the student repository
         """
         self._student_data = Iterator()
+        # group number -> ids of the students in that group
+        self._students_by_group = dict()
+        # changes on every modification, so the cached statistics know when they are out of date
+        self._version = 0
+        # held for reading by the queries and for writing by the modifications, so the reports run together and the
+        # modifications one at a time
+        self._lock = ReadWriteLock()
 
+    @writing
     def add_student(self, student):
         """
         Add student object to student data
@@ -23,15 +36,21 @@ class StudentRepository():
         if student.student_id in self._student_data:
             raise StudentRepositoryException("Student with id: " + str(student.student_id) + " already in repository")
         self._student_data[student.student_id] = student
+        self._add_to_group_index(student.student_id, student.group)
+        self._version += 1
 
+    @writing
     def remove_student(self, student_id):
         """
         Remove student object from student data
         :param student_id: a integer which indicates the student to remove
         """
         self.check_valid_student_id(student_id)
+        self._remove_from_group_index(student_id, self._student_data[student_id].group)
         del self._student_data[student_id]
+        self._version += 1
 
+    @writing
     def update_student_name(self, student_id, new_name):
         """
         Update the name for a student object in repository
@@ -40,7 +59,9 @@ class StudentRepository():
         """
         self.check_valid_student_id(student_id)
         self._student_data[student_id].name = new_name
+        self._version += 1
 
+    @writing
     def update_student_group(self, student_id, new_group):
         """
         Update the group for a student in repository
@@ -48,8 +69,14 @@ class StudentRepository():
         :param new_group: a integer which represent the new student group number
         """
         self.check_valid_student_id(student_id)
-        self._student_data[student_id].group = new_group
+        student = self._student_data[student_id]
+        old_group = student.group
+        student.group = new_group
+        self._remove_from_group_index(student_id, old_group)
+        self._add_to_group_index(student_id, new_group)
+        self._version += 1
 
+    @reading
     def check_valid_student_id(self, student_id):
         """
         Check if a student is present in the student repository
@@ -62,15 +89,96 @@ class StudentRepository():
     def get_student_data(self):
         return self._student_data
 
+    def get_version(self):
+        """
+        Get the version of the repository
+        :return: a integer which changes every time the repository is modified
+        """
+        return self._version
+
+    def flush(self):
+        """
+        Write the modifications which were not saved yet to the storage of the repository
+        """
+        pass
+
+    def check_persistence_errors(self):
+        """
+        Report the errors which happened while the repository was saved in background
+        """
+        pass
+
+    def after_commit(self, function, rollback_function=None):
+        """
+        Run a function once the modifications done so far are persisted by the storage of the repository: when the
+        outermost batch ends, or right away outside of a batch
+        :param function: a function without parameters
+        :param rollback_function: a function without parameters, run instead of function if the storage rolls the
+                                  batch back, or None
+        """
+        function()
+
+    @contextmanager
+    def batch(self):
+        """
+        Group several modifications, so the repository can persist them together when the with block ends; the lock
+        is held for writing until then, so the other threads never see a half done batch
+        """
+        with self._lock.write(), self._persistence_batch():
+            yield
+
+    def _persistence_batch(self):
+        """
+        Get the context manager which groups the modifications in the storage of the repository
+        """
+        return nullcontext()
+
+    def get_lock(self):
+        """
+        Get the lock of the repository, for the services which read or modify several repositories together
+        :return: a ReadWriteLock object
+        """
+        return self._lock
+
+    @reading
+    def get_students_in_group(self, group):
+        """
+        Get the students which belong to a group
+        :param group: a integer which represents the group number
+        :return: a list of student objects
+        """
+        return [self._student_data[student_id] for student_id in self._students_by_group.get(group, ())]
+
+    def _add_to_group_index(self, student_id, group):
+        """
+        Add a student to the group index
+        :param student_id: a integer which represents the id of the student
+        :param group: a integer which represents the group of the student
+        """
+        self._students_by_group.setdefault(group, dict())[student_id] = None
+
+    def _remove_from_group_index(self, student_id, group):
+        """
+        Remove a student from the group index
+        :param student_id: a integer which represents the id of the student
+        :param group: a integer which represents the group the student was in
+        """
+        students_in_group = self._students_by_group[group]
+        del students_in_group[student_id]
+        if len(students_in_group) == 0:
+            del self._students_by_group[group]
+
 
 class StudentFileTextRepository(StudentRepository):
-    def __init__(self, file_name):
+    def __init__(self, file_name, writer=None):
         """
         Initialize the text-file based student repository
         :param file_name: a string which represent the name/location of the file where the data from repository is stored
+        :param writer: an AsyncFileWriter object which saves the file in background, or None
         """
         super().__init__()
         self._file_name = file_name
+        self._write_behind = WriteBehind(file_name, self._serialize_data, writer)
         self._load_file()
 
     def _load_file(self):
@@ -80,43 +188,61 @@ class StudentFileTextRepository(StudentRepository):
         file = open(self._file_name, "rt")
         for line in file.readlines():
             student_id, name, group = line.split(maxsplit = 2, sep="/")
-            self.add_student(Student(int(student_id), name, int(group.rstrip())))
+            super().add_student(Student(int(student_id), name, int(group.rstrip())))
         file.close()
 
-    def _save_file(self):
+    def _serialize_data(self):
         """
-        Write the new state of students_data to the file
+        Encode the new state of students_data for writing it to the file
+        :return: a bytes object
         """
-        file = open(self._file_name, "wt")
-        for student in self._students_data.values():
-            file.write((str(student.student_id)) + "/" + student.name + "/" + str(student.group) + "\n")
-        file.close()
+        lines = [str(student.student_id) + "/" + student.name + "/" + str(student.group) + "\n"
+                 for student in self._student_data.values()]
+        return "".join(lines).encode()
+
+    def flush(self):
+        self._write_behind.flush()
+
+    def check_persistence_errors(self):
+        self._write_behind.check_errors()
+
+    def after_commit(self, function, rollback_function=None):
+        self._write_behind.after_commit(function)
 
+    def _persistence_batch(self):
+        return self._write_behind.batch()
+
+    @writing
     def add_student(self, student):
-        super().add_student(student)
-        self._save_file()
+        with self._write_behind.modification():
+            super().add_student(student)
 
+    @writing
     def remove_student(self, student_id):
-        super().remove_student(student_id)
-        self._save_file()
+        with self._write_behind.modification():
+            super().remove_student(student_id)
 
+    @writing
     def update_student_name(self, student_id, new_name):
-        super().update_student_name(student_id, new_name)
-        self._save_file()
+        with self._write_behind.modification():
+            super().update_student_name(student_id, new_name)
 
+    @writing
     def update_student_group(self, student_id, new_group):
-        super().update_student_group(student_id, new_group)
-        self._save_file()
+        with self._write_behind.modification():
+            super().update_student_group(student_id, new_group)
 
 
 class StudentBinaryFileRepository(StudentRepository):
-    def __init__(self, file_name):
+    def __init__(self, file_name, writer=None):
         """
         Initialize the binary-file based students repository
         :param file_name: a string which represent the name/location of the file where the data from repository is stored
+        :param writer: an AsyncFileWriter object which saves the file in background, or None
         """
         super().__init__()
         self._file_name = file_name
+        self._write_behind = WriteBehind(file_name, self._serialize_data, writer)
         self._load_file()
 
     def _load_file(self):
@@ -124,29 +250,168 @@ class StudentBinaryFileRepository(StudentRepository):
         Read students from the file and store them in students_data
         """
         file = open(self._file_name, "rb")
-        self._students_data = pickle.load(file)
+        content = file.read()
         file.close()
+        if len(content) != 0:
+            for student in decode_students(content):
+                super().add_student(student)
 
-    def _save_file(self):
+    def _serialize_data(self):
         """
-        Write the new state of students_data to the file
+        Encode the new state of students_data for writing it to the file
+        :return: a bytes object
         """
-        file = open(self._file_name, "wb")
-        pickle.dump(self._students_data, file)
-        file.close()
+        return encode_students(self._student_data)
+
+    def flush(self):
+        self._write_behind.flush()
+
+    def check_persistence_errors(self):
+        self._write_behind.check_errors()
+
+    def after_commit(self, function, rollback_function=None):
+        self._write_behind.after_commit(function)
+
+    def _persistence_batch(self):
+        return self._write_behind.batch()
 
+    @writing
+    def add_student(self, student):
+        with self._write_behind.modification():
+            super().add_student(student)
+
+    @writing
+    def remove_student(self, student_id):
+        with self._write_behind.modification():
+            super().remove_student(student_id)
+
+    @writing
+    def update_student_name(self, student_id, new_name):
+        with self._write_behind.modification():
+            super().update_student_name(student_id, new_name)
+
+    @writing
+    def update_student_group(self, student_id, new_group):
+        with self._write_behind.modification():
+            super().update_student_group(student_id, new_group)
+
+
+class StudentJournalRepository(StudentRepository):
+    def __init__(self, file_name):
+        """
+        Initialize the journal based student repository
+        :param file_name: a string which represent the name/location of the journal file of the repository
+        """
+        super().__init__()
+        self._journal = Journal(file_name)
+        self._load_file()
+
+    def _load_file(self):
+        """
+        Replay the records of the journal to rebuild students_data
+        """
+        for record in self._journal.read_records():
+            operation = record["operation"]
+            if operation == "add":
+                super().add_student(Student(record["student_id"], record["name"], record["group"]))
+            elif operation == "remove":
+                super().remove_student(record["student_id"])
+            elif operation == "name":
+                super().update_student_name(record["student_id"], record["name"])
+            elif operation == "group":
+                super().update_student_group(record["student_id"], record["group"])
+            else:
+                raise JournalException("Unknown student journal record: " + str(record))
+
+    def _persistence_batch(self):
+        return self._journal.batch()
+
+    def after_commit(self, function, rollback_function=None):
+        self._journal.after_commit(function)
+
+    def _write_to_journal(self, record):
+        """
+        Append a record to the journal and compact the journal if it grew too large
+        :param record: a dictionary which describes the modification
+        """
+        self._journal.append(record)
+        if self._journal.needs_compaction(len(self._student_data)):
+            self._journal.compact_in_background(
+                [{"operation": "add", "student_id": student.student_id, "name": student.name, "group": student.group}
+                 for student in self._student_data])
+
+    @writing
     def add_student(self, student):
         super().add_student(student)
-        self._save_file()
+        self._write_to_journal({"operation": "add", "student_id": student.student_id, "name": student.name,
+                                "group": student.group})
 
+    @writing
     def remove_student(self, student_id):
         super().remove_student(student_id)
-        self._save_file()
+        self._write_to_journal({"operation": "remove", "student_id": student_id})
 
+    @writing
     def update_student_name(self, student_id, new_name):
         super().update_student_name(student_id, new_name)
-        self._save_file()
+        self._write_to_journal({"operation": "name", "student_id": student_id, "name": new_name})
 
+    @writing
     def update_student_group(self, student_id, new_group):
         super().update_student_group(student_id, new_group)
-        self._save_file()
\ No newline at end of file
+        self._write_to_journal({"operation": "group", "student_id": student_id, "group": new_group})
+
+
+class StudentSqliteRepository(StudentRepository):
+    def __init__(self, database):
+        """
+        Initialize the sqlite based student repository
+        :param database: a SqliteDatabase object, shared with the other sqlite repositories
+        """
+        super().__init__()
+        self._database = database
+        # the repositories of a database share its lock, since its connection has a single transaction
+        self._lock = database.get_lock()
+        self._student_data = SqliteTable(database, "students", ("student_id",), ("student_id", "name", "student_group"),
+                                         lambda row: Student(*row))
+
+    @writing
+    def add_student(self, student):
+        if student.student_id in self._student_data:
+            raise StudentRepositoryException("Student with id: " + str(student.student_id) + " already in repository")
+        self._database.execute("INSERT INTO students (student_id, name, student_group) VALUES (?, ?, ?)",
+                               (student.student_id, student.name, student.group))
+        self._version += 1
+
+    @writing
+    def remove_student(self, student_id):
+        self.check_valid_student_id(student_id)
+        self._database.execute("DELETE FROM students WHERE student_id = ?", (student_id,))
+        self._version += 1
+
+    @writing
+    def update_student_name(self, student_id, new_name):
+        self.check_valid_student_id(student_id)
+        # the setter validates the new name before it reaches the database
+        self._student_data[student_id].name = new_name
+        self._database.execute("UPDATE students SET name = ? WHERE student_id = ?", (new_name, student_id))
+        self._version += 1
+
+    @writing
+    def update_student_group(self, student_id, new_group):
+        self.check_valid_student_id(student_id)
+        self._student_data[student_id].group = new_group
+        self._database.execute("UPDATE students SET student_group = ? WHERE student_id = ?", (new_group, student_id))
+        self._version += 1
+
+    @reading
+    def get_students_in_group(self, group):
+        return [Student(*row) for row in self._database.query(
+            "SELECT student_id, name, student_group FROM students WHERE student_group = ? ORDER BY student_id",
+            (group,))]
+
+    def _persistence_batch(self):
+        return self._database.transaction()
+
+    def after_commit(self, function, rollback_function=None):
+        self._database.after_commit(function, rollback_function)
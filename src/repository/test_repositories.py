@@ -0,0 +1,940 @@
+import os
+import random
+import tempfile
+import threading
+import unittest
+from array import array
+from datetime import date
+
+from src.domain.assignment import Assignment
+from src.domain.grade import Grade
+from src.domain.student import Student
+from src.repository.assigment_repository import AssignmentRepository, AssignmentJournalRepository, AssignmentSqliteRepository, \
+    AssignmentBinaryFileRepository
+from src.repository.grade_repository import GradeRepository, GradeJournalRepository, GradeSqliteRepository, \
+    GradeTextFileRepository, GradeColumnarRepository, GradeRepositoryException, GradeBinaryFileRepository
+from src.repository.columnar_grade_store import ColumnarGradeStore, ColumnarGradeStoreException
+from src.repository.binary_snapshot import encode_grades, decode_grades, encode_assignments, \
+    decode_assignments, BinarySnapshotException
+from src.repository.async_writer import AsyncFileWriter, PersistenceException
+from src.repository.journal import Journal
+from src.repository import journal as journal_module
+from src.repository.positional_index import PositionalIndex
+from src.repository.sorted_buckets import SortedBuckets
+from src.repository.sqlite_database import SqliteDatabase
+from src.repository.read_write_lock import ReadWriteLock
+from src.repository.student_repository import StudentRepository, StudentJournalRepository, StudentSqliteRepository, \
+    StudentFileTextRepository
+
+from src.repository.iter_sort_filter import Iterator, sort_a_list
+from src.repository.undo_redo_repository import UndoRedoRepository, UndoRedoFileRepository, \
+    UndoRedoRepositoryException
+from src.domain.undo_redo import Call, Operation, UndoRecord, ADD_STUDENTS
+
+
+class iterator_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._container = Iterator()
+        for key in range(5):
+            self._container[key] = key * 10
+
+    def tearDown(self) -> None:
+        pass
+
+    def test_iter__full_pass__return_all_entities_in_insertion_order(self):
+        self.assertEqual(list(self._container), [0, 10, 20, 30, 40])
+
+    def test_iter__nested_loops__every_loop_has_its_own_cursor(self):
+        pairs = [(first, second) for first in self._container for second in self._container]
+        self.assertEqual(len(pairs), 25)
+
+    def test_iter__two_passes__second_pass_starts_from_the_beginning(self):
+        cursor = iter(self._container)
+        next(cursor)
+        self.assertEqual(list(self._container), [0, 10, 20, 30, 40])
+        self.assertEqual(next(cursor), 10)
+
+    def test_keys_values_items__valid_call__return_the_views(self):
+        self.assertEqual(list(self._container.keys()), [0, 1, 2, 3, 4])
+        self.assertEqual(list(self._container.values()), [0, 10, 20, 30, 40])
+        self.assertEqual(list(self._container.items())[1], (1, 10))
+
+
+class sort_tests(unittest.TestCase):
+    def test_sort_a_list__strict_compare__return_the_list_sorted_and_stable(self):
+        entities = [(1, 'a'), (3, 'b'), (1, 'c'), (2, 'd'), (3, 'e')]
+        self.assertEqual(sort_a_list(entities, lambda entity, previous_entity: previous_entity[0] > entity[0]),
+                         [(3, 'b'), (3, 'e'), (2, 'd'), (1, 'a'), (1, 'c')])
+
+    def test_sort_a_list__non_strict_compare__return_the_list_sorted_and_stable(self):
+        entities = [(1, 'a'), (3, 'b'), (1, 'c'), (2, 'd')]
+        self.assertEqual(sort_a_list(entities, lambda entity, previous_entity: previous_entity[0] <= entity[0]),
+                         [(1, 'a'), (1, 'c'), (2, 'd'), (3, 'b')])
+
+    def test_sort_a_list__key_and_reverse__return_the_list_sorted_descending_and_stable(self):
+        entities = [(1, 'a'), (3, 'b'), (1, 'c'), (3, 'd')]
+        self.assertEqual(sort_a_list(entities, key=lambda entity: entity[0], reverse=True),
+                         [(3, 'b'), (3, 'd'), (1, 'a'), (1, 'c')])
+
+
+class grade_repository_index_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._grade_repository = GradeRepository()
+        self._grade_repository.add_grade(Grade(1, 3000))
+        self._grade_repository.add_grade(Grade(1, 3001, 7))
+        self._grade_repository.add_grade(Grade(2, 3000, 9))
+        self._grade_repository.add_grade(Grade(2, 3002))
+
+    def tearDown(self) -> None:
+        pass
+
+    def test_get_grades_of_student__valid_student__return_only_the_grades_of_the_student(self):
+        self.assertEqual(self._grade_repository.get_grades_of_student(3000), [Grade(1, 3000), Grade(2, 3000, 9)])
+
+    def test_get_grade_columns__valid_call__return_the_columns_in_the_order_of_the_grade_data(self):
+        assignment_ids, student_ids, grade_values = self._grade_repository.get_grade_columns()
+        self.assertEqual((list(assignment_ids), list(student_ids), list(grade_values)),
+                         ([1, 1, 2, 2], [3000, 3001, 3000, 3002], [0, 7, 9, 0]))
+
+    def test_get_grades_of_assignment__valid_assignment__return_only_the_grades_of_the_assignment(self):
+        self.assertEqual(self._grade_repository.get_grades_of_assignment(2), [Grade(2, 3000, 9), Grade(2, 3002)])
+
+    def test_get_ungraded_grades__after_grading__return_the_remaining_ungraded_grades(self):
+        self._grade_repository.grade_student_for_a_given_assignment(Grade(1, 3000, 5))
+        self.assertEqual(self._grade_repository.get_ungraded_grades(), [Grade(2, 3002)])
+        self.assertEqual(len(self._grade_repository.get_graded_grades()), 3)
+
+    def test_remove_grades__student_id__remove_the_grades_from_every_index(self):
+        self._grade_repository.remove_grades(3000, 1)
+        self.assertEqual(len(self._grade_repository.get_grade_data()), 2)
+        self.assertEqual(self._grade_repository.get_grades_of_student(3000), [])
+        self.assertEqual(self._grade_repository.get_grades_of_assignment(1), [Grade(1, 3001, 7)])
+        self.assertEqual(self._grade_repository.get_ungraded_grades(), [Grade(2, 3002)])
+
+    def test_remove_a_grade__ungraded_grade__remove_the_grade_from_every_index(self):
+        self._grade_repository.remove_a_grade(2, 3002)
+        self.assertEqual(self._grade_repository.get_grades_of_assignment(2), [Grade(2, 3000, 9)])
+        self.assertEqual(self._grade_repository.get_ungraded_grades(), [Grade(1, 3000)])
+
+    def test_get_students_with_ungraded_grades_of_assignments__regraded_grade__order_by_the_first_ungraded_grade(self):
+        self._grade_repository.add_grade(Grade(3, 3001))
+        self._grade_repository.grade_student_for_a_given_assignment(Grade(1, 3001, None))
+        self.assertEqual(self._grade_repository.get_students_with_ungraded_grades_of_assignments([1, 2]),
+                         [3000, 3002, 3001])
+        self.assertEqual(self._grade_repository.get_students_with_ungraded_grades_of_assignments([3, 1, 5]),
+                         [3000, 3001])
+        self.assertEqual(self._grade_repository.get_students_with_ungraded_grades_of_assignments([]), [])
+
+    def test_get_ungraded_grade_at__valid_position__return_the_grade_at_that_position_of_the_ungraded_grades(self):
+        self._grade_repository.add_grade(Grade(3, 3001))
+        self._grade_repository.grade_student_for_a_given_assignment(Grade(2, 3002, 4))
+        self.assertEqual(self._grade_repository.get_ungraded_grade_at(1), Grade(3, 3001))
+        self.assertEqual(self._grade_repository.get_ungraded_grade_at(-2), Grade(1, 3000))
+        with self.assertRaises(IndexError):
+            self._grade_repository.get_ungraded_grade_at(2)
+
+
+class positional_index_tests(unittest.TestCase):
+    def test_getitem__random_appends_and_removals__same_as_a_list(self):
+        random_generator = random.Random(7)
+        positional_index = PositionalIndex()
+        keys = []
+        for key in range(5000):
+            if random_generator.random() < 0.6 or len(keys) == 0:
+                positional_index.append(key)
+                keys.append(key)
+            else:
+                removed_key = keys.pop(random_generator.randrange(len(keys)))
+                self.assertTrue(positional_index.remove(removed_key))
+            position = random_generator.randrange(-len(keys), len(keys))
+            self.assertEqual(positional_index[position], keys[position])
+        self.assertEqual(list(positional_index), keys)
+        self.assertFalse(positional_index.remove(-1))
+        with self.assertRaises(IndexError):
+            positional_index[len(keys)]
+
+
+class assignment_repository_deadline_index_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._assignment_repository = AssignmentRepository()
+        self._assignment_repository.add_assignment(Assignment(1, 'first', date(2021, 10, 10)))
+        self._assignment_repository.add_assignment(Assignment(2, 'second', date(2021, 9, 1)))
+        self._assignment_repository.add_assignment(Assignment(3, 'third', date(2022, 1, 1)))
+        self._assignment_repository.add_assignment(Assignment(4, 'fourth', date(2021, 9, 1)))
+
+    def tearDown(self) -> None:
+        pass
+
+    def test_get_assignments_with_deadline_before__valid_day__return_the_overdue_assignments_by_deadline(self):
+        self.assertEqual(self._assignment_repository.get_assignments_with_deadline_before(date(2021, 10, 10)), [2, 4])
+        self.assertEqual(self._assignment_repository.get_assignments_with_deadline_before(date(2021, 9, 1)), [])
+
+    def test_update_assignment_deadline__valid_deadline__move_the_assignment_in_the_deadline_index(self):
+        self._assignment_repository.update_assignment_deadline(3, date(2020, 1, 1))
+        self._assignment_repository.remove_assignment(4)
+        self.assertEqual(self._assignment_repository.get_assignments_with_deadline_before(date(2021, 12, 31)),
+                         [3, 2, 1])
+
+
+class grade_aggregates_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._grade_repository = GradeRepository()
+        self._grade_repository.add_grade(Grade(1, 3000, 8))
+        self._grade_repository.add_grade(Grade(1, 3001, 6))
+        self._grade_repository.add_grade(Grade(2, 3001))
+        self._grade_repository.add_grade(Grade(2, 3000, 9))
+
+    def tearDown(self) -> None:
+        pass
+
+    def test_get_average_grade_of_student__graded_grades__return_their_average(self):
+        self.assertEqual(self._grade_repository.get_average_grade_of_student(3000), 8.5)
+        self.assertIsNone(self._grade_repository.get_average_grade_of_student(3002))
+
+    def test_grade_student_for_a_given_assignment__valid_grade__update_the_averages(self):
+        self._grade_repository.grade_student_for_a_given_assignment(Grade(2, 3001, 10))
+        self.assertEqual(self._grade_repository.get_average_grade_of_assignment(2), 9.5)
+        self.assertEqual(self._grade_repository.get_students_sorted_descending_by_average_grade(),
+                         [(3000, 8.5), (3001, 8.0)])
+
+    def test_remove_grades__student_id__remove_the_student_from_the_ranking(self):
+        self._grade_repository.remove_grades(3000, 1)
+        self.assertEqual(self._grade_repository.get_students_sorted_descending_by_average_grade(), [(3001, 6.0)])
+        self.assertEqual(self._grade_repository.get_average_grade_of_assignment(1), 6.0)
+        self.assertIsNone(self._grade_repository.get_average_grade_of_assignment(2))
+
+    def test_get_students_sorted_descending_by_average_grade__random_modifications__same_as_a_full_recount(self):
+        random_generator = random.Random(12)
+        for counter in range(3000):
+            assignment_id, student_id = random_generator.randint(1, 8), random_generator.randint(3000, 3015)
+            grade_value = random_generator.choice([None, 1, 5, 5, 10])
+            action = random_generator.randint(0, 9)
+            if (assignment_id, student_id) not in self._grade_repository.get_grade_data():
+                self._grade_repository.add_grade(Grade(assignment_id, student_id, grade_value))
+            elif action < 6:
+                self._grade_repository.grade_student_for_a_given_assignment(Grade(assignment_id, student_id,
+                                                                                  grade_value))
+            elif action < 9:
+                self._grade_repository.remove_a_grade(assignment_id, student_id)
+            else:
+                self._grade_repository.remove_grades(assignment_id, 0)
+        sums = dict()
+        counts = dict()
+        for grade in self._grade_repository.get_graded_grades():
+            sums[grade.student_id] = sums.get(grade.student_id, 0) + grade.grade_value
+            counts[grade.student_id] = counts.get(grade.student_id, 0) + 1
+        expected_ranking = sorted([(student_id, sums[student_id] / counts[student_id]) for student_id in sums],
+                                  key=lambda entity: entity[1], reverse=True)
+        self.assertEqual(self._grade_repository.get_students_sorted_descending_by_average_grade(), expected_ranking)
+
+
+class sorted_buckets_tests(unittest.TestCase):
+    def test_add_remove__random_operations__same_as_a_sorted_list(self):
+        random_generator = random.Random(11)
+        sorted_buckets = SortedBuckets(bucket_size=8)
+        items = []
+        for _ in range(3000):
+            if random_generator.random() < 0.6 or len(items) == 0:
+                item = random_generator.randrange(500)
+                sorted_buckets.add(item)
+                items.append(item)
+                items.sort()
+            else:
+                sorted_buckets.remove(items.pop(random_generator.randrange(len(items))))
+            self.assertEqual(len(sorted_buckets), len(items))
+        self.assertEqual(list(sorted_buckets), items)
+        with self.assertRaises(ValueError):
+            sorted_buckets.remove(500)
+
+    def test_prefix__maximum_item_and_limit__smallest_items(self):
+        sorted_buckets = SortedBuckets(bucket_size=2)
+        for item in [9, 3, 7, 1, 5, 3, 8]:
+            sorted_buckets.add(item)
+        self.assertEqual(sorted_buckets.prefix(), [1, 3, 3, 5, 7, 8, 9])
+        self.assertEqual(sorted_buckets.prefix(maximum_item=5), [1, 3, 3, 5])
+        self.assertEqual(sorted_buckets.prefix(limit=2), [1, 3])
+        self.assertEqual(sorted_buckets.prefix(maximum_item=7, limit=10), [1, 3, 3, 5, 7])
+        self.assertEqual(sorted_buckets.prefix(maximum_item=0), [])
+        self.assertEqual(sorted_buckets.prefix(limit=0), [])
+
+
+class student_repository_group_index_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._student_repository = StudentRepository()
+        self._student_repository.add_student(Student(3000, 'Pop', 912))
+        self._student_repository.add_student(Student(3001, 'Rus', 913))
+        self._student_repository.add_student(Student(3002, 'Micu', 912))
+
+    def tearDown(self) -> None:
+        pass
+
+    def test_get_students_in_group__valid_group__return_only_the_students_of_the_group(self):
+        self.assertEqual(self._student_repository.get_students_in_group(912),
+                         [Student(3000, 'Pop', 912), Student(3002, 'Micu', 912)])
+
+    def test_get_students_in_group__empty_group__return_empty_list(self):
+        self.assertEqual(self._student_repository.get_students_in_group(917), [])
+
+    def test_update_student_group__valid_group__move_the_student_between_groups(self):
+        self._student_repository.update_student_group(3000, 913)
+        self.assertEqual(self._student_repository.get_students_in_group(912), [Student(3002, 'Micu', 912)])
+        self.assertEqual(self._student_repository.get_students_in_group(913),
+                         [Student(3001, 'Rus', 913), Student(3000, 'Pop', 913)])
+
+    def test_update_student_group__invalid_group__keep_the_group_index_unchanged(self):
+        with self.assertRaises(ValueError):
+            self._student_repository.update_student_group(3000, 999)
+        self.assertEqual(len(self._student_repository.get_students_in_group(912)), 2)
+
+    def test_remove_student__valid_student__remove_the_student_from_the_group_index(self):
+        self._student_repository.remove_student(3002)
+        self.assertEqual(self._student_repository.get_students_in_group(912), [Student(3000, 'Pop', 912)])
+
+
+class journal_repository_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self._students_file = os.path.join(self._directory.name, "students.journal")
+        self._assignments_file = os.path.join(self._directory.name, "assignments.journal")
+        self._grades_file = os.path.join(self._directory.name, "grades.journal")
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_batch__several_records__single_fsync_and_replayed_after_restart(self):
+        fsync_calls = []
+        fsync = os.fsync
+        journal_module.os.fsync = lambda file_descriptor: fsync_calls.append(file_descriptor) or fsync(file_descriptor)
+        try:
+            student_repository = StudentJournalRepository(self._students_file)
+            with student_repository.batch():
+                for student_id in range(3):
+                    student_repository.add_student(Student(student_id, 'Pop', 912))
+                with student_repository.batch():
+                    student_repository.remove_student(0)
+        finally:
+            journal_module.os.fsync = fsync
+        self.assertEqual(len(fsync_calls), 1)
+        student_repository = StudentJournalRepository(self._students_file)
+        self.assertEqual(sorted(student.student_id for student in student_repository.get_student_data()), [1, 2])
+
+    def test_load_file__student_modifications__replay_them_after_restart(self):
+        student_repository = StudentJournalRepository(self._students_file)
+        student_repository.add_student(Student(3000, 'Pop', 912))
+        student_repository.add_student(Student(3001, 'Rus', 913))
+        student_repository.update_student_name(3000, 'Micu')
+        student_repository.update_student_group(3000, 915)
+        student_repository.remove_student(3001)
+        reloaded_repository = StudentJournalRepository(self._students_file)
+        self.assertEqual(list(reloaded_repository.get_student_data()), [Student(3000, 'Micu', 915)])
+        self.assertEqual(reloaded_repository.get_students_in_group(915), [Student(3000, 'Micu', 915)])
+
+    def test_load_file__assignment_modifications__replay_them_after_restart(self):
+        assignment_repository = AssignmentJournalRepository(self._assignments_file)
+        assignment_repository.add_assignment(Assignment(1, 'something', date(2021, 10, 10)))
+        assignment_repository.update_assignment_deadline(1, date(2021, 11, 11))
+        assignment_repository.update_assignment_description(1, 'something else')
+        reloaded_repository = AssignmentJournalRepository(self._assignments_file)
+        self.assertEqual(reloaded_repository.get_assignment_data()[1],
+                         Assignment(1, 'something else', date(2021, 11, 11)))
+
+    def test_load_file__grade_modifications__replay_them_after_restart(self):
+        grade_repository = GradeJournalRepository(self._grades_file)
+        grade_repository.add_grade(Grade(1, 3000))
+        grade_repository.add_grade(Grade(1, 3001))
+        grade_repository.add_grade(Grade(2, 3001))
+        grade_repository.grade_student_for_a_given_assignment(Grade(1, 3000, 9))
+        grade_repository.remove_grades(3001, 1)
+        reloaded_repository = GradeJournalRepository(self._grades_file)
+        self.assertEqual(list(reloaded_repository.get_grade_data()), [Grade(1, 3000, 9)])
+
+    def test_load_file__incomplete_last_record__ignore_the_incomplete_record(self):
+        student_repository = StudentJournalRepository(self._students_file)
+        student_repository.add_student(Student(3000, 'Pop', 912))
+        journal_file = open(self._students_file, "ab")
+        journal_file.write(b'{"operation":"add","student_id":30')
+        journal_file.close()
+        reloaded_repository = StudentJournalRepository(self._students_file)
+        reloaded_repository.add_student(Student(3001, 'Rus', 913))
+        self.assertEqual(len(StudentJournalRepository(self._students_file).get_student_data()), 2)
+
+    def test_compact_in_background__journal_larger_than_live_data__keep_only_the_live_data(self):
+        journal = Journal(self._students_file, minimum_records_before_compaction=2)
+        journal.read_records()
+        for name in ['Pop', 'Rus', 'Micu', 'Hagi', 'Albu']:
+            journal.append({"operation": "name", "student_id": 3000, "name": name})
+        self.assertTrue(journal.needs_compaction(1))
+        journal.compact_in_background([{"operation": "add", "student_id": 3000, "name": "Albu", "group": 912}])
+        journal.wait_for_compaction()
+        journal.append({"operation": "group", "student_id": 3000, "group": 913})
+        self.assertEqual(len(Journal(self._students_file).read_records()), 2)
+
+    def test_needs_compaction__minimum_records_reached__compact(self):
+        journal = Journal(self._students_file, minimum_records_before_compaction=4)
+        journal.read_records()
+        for name in ['Pop', 'Rus', 'Micu']:
+            journal.append({"operation": "name", "student_id": 3000, "name": name})
+        self.assertFalse(journal.needs_compaction(1))
+        journal.append({"operation": "name", "student_id": 3000, "name": "Hagi"})
+        self.assertTrue(journal.needs_compaction(1))
+        self.assertFalse(journal.needs_compaction(2))
+        journal.close()
+
+
+class sqlite_repository_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._database = SqliteDatabase(":memory:")
+        self._student_repository = StudentSqliteRepository(self._database)
+        self._assignment_repository = AssignmentSqliteRepository(self._database)
+        self._grade_repository = GradeSqliteRepository(self._database)
+        self._student_repository.add_student(Student(3000, 'Pop', 912))
+        self._student_repository.add_student(Student(3001, 'Rus', 912))
+        self._assignment_repository.add_assignment(Assignment(1, 'something', date(2021, 10, 10)))
+        self._grade_repository.add_grade(Grade(1, 3000))
+        self._grade_repository.add_grade(Grade(1, 3001, 6))
+        self._grade_repository.add_grade(Grade(2, 3000, 9))
+
+    def tearDown(self) -> None:
+        self._database.close()
+
+    def test_grade_student_for_a_given_assignment__missing_grade__keep_the_version(self):
+        version = self._grade_repository.get_version()
+        with self.assertRaises(KeyError):
+            self._grade_repository.grade_student_for_a_given_assignment(Grade(2, 3001, 5))
+        self.assertEqual(self._grade_repository.get_version(), version)
+        self._grade_repository.grade_student_for_a_given_assignment(Grade(1, 3000, 5))
+        self.assertEqual(self._grade_repository.get_version(), version + 1)
+
+    def test_get_student_data__valid_call__behave_like_the_in_memory_container(self):
+        student_data = self._student_repository.get_student_data()
+        self.assertEqual(len(student_data), 2)
+        self.assertTrue(3001 in student_data)
+        self.assertEqual(student_data[3000], Student(3000, 'Pop', 912))
+        with self.assertRaises(KeyError):
+            student_data[4000]
+
+    def test_update_student_group__valid_group__update_the_group_index(self):
+        self._student_repository.update_student_group(3000, 915)
+        self.assertEqual(self._student_repository.get_students_in_group(915), [Student(3000, 'Pop', 915)])
+        with self.assertRaises(ValueError):
+            self._student_repository.update_student_group(3000, 999)
+
+    def test_update_assignment_deadline__valid_assignment__update_the_deadline(self):
+        self._assignment_repository.update_assignment_deadline(1, date(2021, 12, 1))
+        self.assertEqual(self._assignment_repository.get_assignment_data()[1].deadline, date(2021, 12, 1))
+
+    def test_get_grades_of_assignment_sorted_descending__valid_assignment__return_the_sorted_grades(self):
+        self._grade_repository.add_grade(Grade(1, 3002, 8))
+        self.assertEqual(self._grade_repository.get_grades_of_assignment_sorted_descending(1),
+                         [Grade(1, 3002, 8), Grade(1, 3001, 6), Grade(1, 3000)])
+
+    def test_get_students_sorted_descending_by_average_grade__valid_call__return_the_averages(self):
+        self._grade_repository.grade_student_for_a_given_assignment(Grade(1, 3000, 6))
+        self.assertEqual(self._grade_repository.get_students_sorted_descending_by_average_grade(),
+                         [(3000, 7.5), (3001, 6.0)])
+
+    def test_remove_grades__student_id__remove_only_the_grades_of_the_student(self):
+        self._grade_repository.remove_grades(3000, 1)
+        self.assertEqual(list(self._grade_repository.get_grade_data()), [Grade(1, 3001, 6)])
+
+    def test_get_students_sorted_descending_by_average_grade__limit_and_min_average__filter_in_the_query(self):
+        self.assertEqual(self._grade_repository.get_students_sorted_descending_by_average_grade(limit=1), [(3000, 9.0)])
+        self.assertEqual(self._grade_repository.get_students_sorted_descending_by_average_grade(min_average=7),
+                         [(3000, 9.0)])
+
+    def test_get_grades_of_assignment_sorted_descending__limit_and_min_grade__filter_in_the_query(self):
+        self.assertEqual(self._grade_repository.get_grades_of_assignment_sorted_descending(1, limit=1),
+                         [Grade(1, 3001, 6)])
+        self.assertEqual(self._grade_repository.get_grades_of_assignment_sorted_descending(1, min_grade=7), [])
+
+    def test_get_assignments_with_deadline_before__valid_day__return_the_overdue_assignments(self):
+        self._assignment_repository.add_assignment(Assignment(2, 'other', date(2021, 1, 10)))
+        self.assertEqual(self._assignment_repository.get_assignments_with_deadline_before(date(2021, 10, 11)), [2, 1])
+        self.assertEqual(self._grade_repository.get_students_with_ungraded_grades_of_assignments([2, 1]), [3000])
+
+    def test_get_ungraded_grade_at__valid_position__return_the_ungraded_grade(self):
+        self._grade_repository.add_grade(Grade(2, 3001))
+        self.assertEqual(self._grade_repository.get_ungraded_grade_at(-1), Grade(2, 3001))
+        with self.assertRaises(IndexError):
+            self._grade_repository.get_ungraded_grade_at(-3)
+
+    def test_get_average_grade_of_student__valid_student__return_the_average_of_the_graded_grades(self):
+        self.assertEqual(self._grade_repository.get_average_grade_of_student(3000), 9.0)
+        self.assertIsNone(self._grade_repository.get_average_grade_of_assignment(3))
+
+    def test_get_grade_columns__valid_call__return_the_columns_in_rowid_order(self):
+        assignment_ids, student_ids, grade_values = self._grade_repository.get_grade_columns()
+        self.assertEqual((list(assignment_ids), list(student_ids), list(grade_values)),
+                         ([1, 1, 2], [3000, 3001, 3000], [0, 6, 9]))
+
+    def test_batch__exception_inside_the_batch__roll_back_every_modification(self):
+        with self.assertRaises(ValueError):
+            with self._grade_repository.batch():
+                self._grade_repository.remove_grades(1, 0)
+                self._student_repository.remove_student(3001)
+                raise ValueError("interrupted")
+        self.assertEqual(len(self._grade_repository.get_grade_data()), 3)
+        self.assertEqual(len(self._student_repository.get_student_data()), 2)
+
+    def test_after_commit__inside_a_batch__run_at_the_commit_or_at_the_rollback(self):
+        done = []
+        with self._student_repository.batch():
+            self._student_repository.remove_student(3001)
+            self._student_repository.after_commit(lambda: done.append("commit"), lambda: done.append("rollback"))
+            self.assertEqual(done, [])
+        with self.assertRaises(ValueError):
+            with self._grade_repository.batch():
+                self._grade_repository.after_commit(lambda: done.append("commit"), lambda: done.append("rollback"))
+                raise ValueError("interrupted")
+        self._assignment_repository.after_commit(lambda: done.append("no batch"))
+        self.assertEqual(done, ["commit", "rollback", "no batch"])
+
+
+class write_behind_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self._students_file = os.path.join(self._directory.name, "students.txt")
+        self._grades_file = os.path.join(self._directory.name, "grades.txt")
+        for file_name in [self._students_file, self._grades_file]:
+            open(file_name, "wt").close()
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def read_file(self, file_name):
+        file = open(file_name, "rt")
+        content = file.read()
+        file.close()
+        return content
+
+    def test_flush__pending_modification__write_it_to_the_file(self):
+        student_repository = StudentFileTextRepository(self._students_file)
+        student_repository.add_student(Student(3000, 'Pop', 912))
+        self.assertEqual(self.read_file(self._students_file), "")
+        student_repository.flush()
+        self.assertEqual(self.read_file(self._students_file), "3000/Pop/912\n")
+        self.assertEqual(len(StudentFileTextRepository(self._students_file).get_student_data()), 1)
+
+    def test_batch__several_modifications__save_the_file_once(self):
+        grade_repository = GradeTextFileRepository(self._grades_file)
+        saved_states = []
+        grade_repository._write_behind._serialize_function = lambda: saved_states.append(
+            len(grade_repository.get_grade_data())) or b""
+        with grade_repository.batch():
+            for student_id in range(3000, 3010):
+                grade_repository.add_grade(Grade(1, student_id))
+            grade_repository.remove_grades(3000, 1)
+        self.assertEqual(saved_states, [9])
+
+
+class async_writer_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self._students_file = os.path.join(self._directory.name, "students.txt")
+        open(self._students_file, "wt").close()
+        self._writer = AsyncFileWriter(max_queued_snapshots=2)
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_flush__background_writer__file_written_when_flush_returns(self):
+        student_repository = StudentFileTextRepository(self._students_file, self._writer)
+        with student_repository.batch():
+            student_repository.add_student(Student(3000, 'Pop', 912))
+            student_repository.add_student(Student(3001, 'Rus', 913))
+        student_repository.flush()
+        self.assertEqual(len(StudentFileTextRepository(self._students_file).get_student_data()), 2)
+
+    def test_check_errors__write_failed__raise_persistence_exception_once(self):
+        self._writer.write(os.path.join(self._directory.name, "missing", "students.txt"), b"")
+        with self.assertRaises(PersistenceException):
+            self._writer.wait_until_written()
+        self._writer.check_errors()
+
+
+class binary_snapshot_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self._assignments_file = os.path.join(self._directory.name, "assignments.bin")
+        open(self._assignments_file, "wb").close()
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_decode_grades__encoded_grades__return_the_same_grades(self):
+        grades = [Grade(1, 3000), Grade(1, 3001, 10), Grade(2, 3000, 1)]
+        self.assertEqual(decode_grades(encode_grades(grades)), grades)
+
+    def test_load_file__whole_float_grade__reload_the_integer_grade(self):
+        grades_file = os.path.join(self._directory.name, "grades.bin")
+        open(grades_file, "wb").close()
+        grade_repository = GradeBinaryFileRepository(grades_file)
+        grade_repository.add_grade(Grade(1, 3000, 7.0))
+        grade_repository.flush()
+        grade_repository.check_persistence_errors()
+        self.assertEqual(list(GradeBinaryFileRepository(grades_file).get_grade_data()), [Grade(1, 3000, 7)])
+
+    def test_decode_assignments__encoded_assignments__return_the_same_assignments(self):
+        assignments = [Assignment(1, 'Învață ceva', date(2021, 10, 10)), Assignment(2, '', date(2022, 1, 1))]
+        self.assertEqual(decode_assignments(encode_assignments(assignments)), assignments)
+
+    def test_decode_grades__damaged_snapshot__raise_snapshot_exception(self):
+        content = bytearray(encode_grades([Grade(1, 3000, 7)]))
+        content[-1] ^= 0xFF
+        with self.assertRaises(BinarySnapshotException):
+            decode_grades(bytes(content))
+
+    def test_decode_grades__other_kind_of_snapshot__raise_snapshot_exception(self):
+        with self.assertRaises(BinarySnapshotException):
+            decode_grades(encode_assignments([Assignment(1, 'something', date(2021, 10, 10))]))
+
+    def test_load_file__saved_assignments__reload_them_after_restart(self):
+        assignment_repository = AssignmentBinaryFileRepository(self._assignments_file)
+        assignment_repository.add_assignment(Assignment(1, 'something', date(2021, 10, 10)))
+        assignment_repository.flush()
+        self.assertEqual(list(AssignmentBinaryFileRepository(self._assignments_file).get_assignment_data()),
+                         [Assignment(1, 'something', date(2021, 10, 10))])
+
+
+class columnar_grade_repository_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self._grades_file = os.path.join(self._directory.name, "grades.col")
+        self._grade_repository = GradeColumnarRepository(self._grades_file)
+        self._grade_repository.add_grade(Grade(1, 3000))
+        self._grade_repository.add_grade(Grade(1, 3001, 6))
+        self._grade_repository.add_grade(Grade(2, 3000, 9))
+
+    def tearDown(self) -> None:
+        self._grade_repository.close()
+        self._directory.cleanup()
+
+    def test_add_grade__existing_grade__raise_grade_repository_exception(self):
+        with self.assertRaises(GradeRepositoryException):
+            self._grade_repository.add_grade(Grade(1, 3000, 5))
+
+    def test_get_grade_data__valid_call__behave_like_the_in_memory_container(self):
+        grade_data = self._grade_repository.get_grade_data()
+        self.assertEqual(len(grade_data), 3)
+        self.assertIn((1, 3001), grade_data)
+        self.assertNotIn((2, 3001), grade_data)
+        self.assertEqual(grade_data[1, 3001], Grade(1, 3001, 6))
+        self.assertEqual(list(grade_data), [Grade(1, 3000), Grade(1, 3001, 6), Grade(2, 3000, 9)])
+
+    def test_grade_student_for_a_given_assignment__ungraded_grade__move_it_to_the_graded_grades(self):
+        self._grade_repository.grade_student_for_a_given_assignment(Grade(1, 3000, 10))
+        self.assertEqual(self._grade_repository.get_ungraded_grades(), [])
+        self.assertEqual(self._grade_repository.get_grade_value(1, 3000), 10)
+
+    def test_get_ungraded_grade_at__removals_and_regrades__keep_the_order_of_the_in_memory_repository(self):
+        in_memory_repository = GradeRepository()
+        for grade in self._grade_repository.get_grade_data():
+            in_memory_repository.add_grade(Grade(grade.assignment_id, grade.student_id, grade.grade_value))
+        for repository in (self._grade_repository, in_memory_repository):
+            for student_id in range(3002, 3008):
+                repository.add_grade(Grade(3, student_id))
+            # removing a grade moves the last row of the columnar store into its place
+            repository.remove_a_grade(3, 3003)
+            repository.grade_student_for_a_given_assignment(Grade(3, 3005, 7))
+            repository.grade_student_for_a_given_assignment(Grade(2, 3000, None))
+            repository.grade_student_for_a_given_assignment(Grade(3, 3005, None))
+        ungraded_grades = in_memory_repository.get_ungraded_grades()
+        self.assertEqual(self._grade_repository.get_ungraded_grades(), ungraded_grades)
+        self.assertEqual([self._grade_repository.get_ungraded_grade_at(position)
+                          for position in range(len(ungraded_grades))], ungraded_grades)
+        self.assertEqual(self._grade_repository.get_students_with_ungraded_grades_of_assignments([2, 3]),
+                         in_memory_repository.get_students_with_ungraded_grades_of_assignments([2, 3]))
+
+    def test_remove_grades__student_id__remove_only_the_grades_of_the_student(self):
+        self._grade_repository.remove_grades(3000, 1)
+        self.assertEqual(list(self._grade_repository.get_grade_data()), [Grade(1, 3001, 6)])
+        self.assertEqual(self._grade_repository.get_grades_of_assignment(2), [])
+
+    def test_get_students_sorted_descending_by_average_grade__valid_call__return_the_averages(self):
+        self._grade_repository.add_grade(Grade(3, 3001, 10))
+        self.assertEqual(self._grade_repository.get_students_sorted_descending_by_average_grade(),
+                         [(3000, 9.0), (3001, 8.0)])
+
+    def test_get_average_grade_of_assignment__valid_assignment__return_the_average_of_the_graded_grades(self):
+        self.assertEqual(self._grade_repository.get_average_grade_of_assignment(1), 6.0)
+        self.assertIsNone(self._grade_repository.get_average_grade_of_student(3002))
+
+    def test_get_grade_columns__valid_call__return_copies_of_the_columns(self):
+        assignment_ids, student_ids, grade_values = self._grade_repository.get_grade_columns()
+        self._grade_repository.remove_a_grade(1, 3000)
+        self.assertEqual((list(assignment_ids), list(student_ids), list(grade_values)),
+                         ([1, 1, 2], [3000, 3001, 3000], [0, 6, 9]))
+
+    def test_get_ungraded_grade_columns__valid_call__return_the_ungraded_grades(self):
+        assignment_ids, student_ids = self._grade_repository.get_ungraded_grade_columns()
+        self.assertEqual((list(assignment_ids), list(student_ids)), ([1], [3000]))
+
+    def test_get_students_sorted_descending_by_average_grade__limit_and_min_average__return_the_best_students(self):
+        self._grade_repository.add_grade(Grade(3, 3002, 9))
+        self.assertEqual(self._grade_repository.get_students_sorted_descending_by_average_grade(limit=1),
+                         [(3000, 9.0)])
+        self.assertEqual(self._grade_repository.get_students_sorted_descending_by_average_grade(min_average=7),
+                         [(3000, 9.0), (3002, 9.0)])
+
+    def test_get_students_with_ungraded_grades_of_assignments__valid_assignments__return_the_students(self):
+        self._grade_repository.add_grade(Grade(2, 3001))
+        self.assertEqual(self._grade_repository.get_students_with_ungraded_grades_of_assignments([2, 1]),
+                         [3000, 3001])
+
+    def test_load_file__saved_grades__reopen_them_after_restart(self):
+        self._grade_repository.remove_a_grade(1, 3000)
+        self._grade_repository.close()
+        self._grade_repository = GradeColumnarRepository(self._grades_file)
+        self.assertEqual(list(self._grade_repository.get_grade_data()), [Grade(2, 3000, 9), Grade(1, 3001, 6)])
+        self.assertEqual(self._grade_repository.get_grades_of_student(3000), [Grade(2, 3000, 9)])
+
+    def test_append__more_grades_than_the_capacity__keep_every_grade_reachable(self):
+        store = ColumnarGradeStore(os.path.join(self._directory.name, "large.col"))
+        for student_id in range(3000):
+            store.append(student_id % 7, student_id, student_id % 11)
+        for student_id in range(0, 3000, 2):
+            store.delete(student_id % 7, student_id)
+        self.assertEqual(len(store), 1500)
+        self.assertTrue(all(store.find_row(student_id % 7, student_id) >= 0 for student_id in range(1, 3000, 2)))
+        self.assertEqual(store.find_row(0, 0), -1)
+        store.close()
+
+    def test_append_and_set_grade_value__whole_float_values__store_integers(self):
+        store = ColumnarGradeStore(os.path.join(self._directory.name, "floats.col"))
+        store.append(1, 3000, 7.0)
+        store.append(1, 3001, 0)
+        store.set_grade_value(store.find_row(1, 3001), 8.0)
+        self.assertEqual(list(store.grade_values[:len(store)]), [7, 8])
+        store.close()
+
+    def test_init__file_of_another_format__raise_columnar_grade_store_exception(self):
+        other_file = os.path.join(self._directory.name, "other.col")
+        with open(other_file, "wb") as file:
+            file.write(b"not a columnar grade file")
+        with self.assertRaises(ColumnarGradeStoreException):
+            ColumnarGradeStore(other_file)
+
+
+class undo_redo_repository_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._done = []
+
+    def _operation(self, name, payload=""):
+        return Operation(Call(self._done.append, "undo " + name), Call(self._done.append, "redo " + name + payload))
+
+    def test_add_operation__after_undo__discard_redo_tail(self):
+        repository = UndoRedoRepository()
+        for name in "abc":
+            repository.add_new_operation_to_modifications_history(self._operation(name))
+        repository.update_index_in_modification_history(-2)
+        repository.add_new_operation_to_modifications_history(self._operation("d"))
+        self.assertEqual(len(repository.get_modifications_history()), 2)
+        self.assertEqual(repository.get_index_in_modification_history(), 1)
+        self.assertEqual(repository.get_history_metrics()["discarded_redo_operations"], 2)
+
+    def test_stepping_back__failing_undo__keep_the_position(self):
+        repository = UndoRedoRepository()
+        repository.add_new_operation_to_modifications_history(self._operation("a"))
+        with self.assertRaises(RuntimeError):
+            with repository.stepping_back_in_modification_history() as operation:
+                raise RuntimeError("undo failed")
+        self.assertEqual(repository.get_index_in_modification_history(), 0)
+        with repository.stepping_back_in_modification_history() as operation:
+            operation.undo()
+        self.assertEqual(repository.get_index_in_modification_history(), -1)
+        with repository.stepping_back_in_modification_history() as operation:
+            self.assertIsNone(operation)
+
+    def test_add_operation__over_max_operations__evict_oldest(self):
+        repository = UndoRedoRepository(max_operations=2)
+        for name in "abc":
+            repository.add_new_operation_to_modifications_history(self._operation(name))
+        self.assertEqual(len(repository.get_modifications_history()), 2)
+        self.assertEqual(repository.get_index_in_modification_history(), 1)
+        repository.get_modifications_history()[0].undo()
+        self.assertEqual(self._done, ["undo b"])
+        self.assertEqual(repository.get_history_metrics()["evicted_operations"], 1)
+
+    def test_add_operation__over_max_bytes__evict_oldest_but_keep_newest(self):
+        repository = UndoRedoRepository(max_operations=None, max_bytes=100000)
+        repository.add_new_operation_to_modifications_history(self._operation("a", "x" * 40000))
+        repository.add_new_operation_to_modifications_history(self._operation("b", "x" * 40000))
+        self.assertEqual(len(repository.get_modifications_history()), 2)
+        repository.add_new_operation_to_modifications_history(self._operation("c", "x" * 40000))
+        self.assertEqual(len(repository.get_modifications_history()), 2)
+        repository.add_new_operation_to_modifications_history(self._operation("d", "x" * 200000))
+        self.assertEqual(len(repository.get_modifications_history()), 1)
+        metrics = repository.get_history_metrics()
+        self.assertGreater(metrics["estimated_bytes"], 200000)
+        self.assertEqual((metrics["undoable_operations"], metrics["redoable_operations"]), (1, 0))
+
+
+class RecordingInterpreter:
+    """
+    Applies the undo records by writing down what it was asked to do, instead of modifying repositories
+    """
+    def __init__(self):
+        self.done = []
+
+    def undo(self, record):
+        self.done.append(("undo", record.keys))
+
+    def redo(self, record):
+        self.done.append(("redo", record.keys))
+
+
+class undo_redo_file_repository_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self._file_name = os.path.join(self._directory.name, "undo.journal")
+        self._interpreter = RecordingInterpreter()
+        self._undo_redo_repository = self._open_repository()
+
+    def tearDown(self) -> None:
+        if self._undo_redo_repository is not None:
+            self._undo_redo_repository.close()
+        self._directory.cleanup()
+
+    def _open_repository(self, window_size=64):
+        return UndoRedoFileRepository(self._file_name, self._interpreter, window_size)
+
+    def _add_record(self, key):
+        self._undo_redo_repository.add_new_operation_to_modifications_history(
+            UndoRecord(self._interpreter, ADD_STUDENTS, array("q", [key]), after=(["Pop"], array("i", [911]))))
+
+    def test_add_operation__after_undo__discard_redo_tail_from_the_file(self):
+        for key in range(3):
+            self._add_record(key)
+        self._undo_redo_repository.persist()
+        self._undo_redo_repository.update_index_in_modification_history(-2)
+        self._add_record(5)
+        self._undo_redo_repository.persist()
+        data_file_bytes = self._undo_redo_repository.get_history_metrics()["data_file_bytes"]
+        self._undo_redo_repository.close()
+        self._undo_redo_repository = self._open_repository()
+        self.assertEqual(len(self._undo_redo_repository.get_modifications_history()), 2)
+        self.assertEqual(os.path.getsize(self._file_name), data_file_bytes)
+        self.assertEqual(list(self._undo_redo_repository[1].keys), [5])
+        self.assertEqual(self._undo_redo_repository[1].after, (("Pop",), array("i", [911])))
+
+    def test_persist__several_new_records__write_them_only_when_persisted(self):
+        self._add_record(1)
+        self._add_record(2)
+        self.assertTrue(self._undo_redo_repository.has_unpersisted_modifications())
+        self.assertEqual(os.path.getsize(self._file_name), 0)
+        self.assertEqual(list(self._undo_redo_repository[1].keys), [2])
+        self._undo_redo_repository.persist()
+        self.assertFalse(self._undo_redo_repository.has_unpersisted_modifications())
+        self._undo_redo_repository.close()
+        self._undo_redo_repository = self._open_repository()
+        self.assertEqual([list(self._undo_redo_repository[position].keys) for position in range(2)], [[1], [2]])
+
+    def test_revert_to_persisted__new_records_and_undo__go_back_to_the_history_in_the_files(self):
+        for key in range(3):
+            self._add_record(key)
+        self._undo_redo_repository.persist()
+        self._undo_redo_repository.update_index_in_modification_history(-2)
+        self._add_record(5)
+        self._undo_redo_repository.revert_to_persisted()
+        self.assertFalse(self._undo_redo_repository.has_unpersisted_modifications())
+        self.assertEqual(self._undo_redo_repository.get_index_in_modification_history(), 2)
+        self.assertEqual([list(self._undo_redo_repository[position].keys) for position in range(3)],
+                         [[0], [1], [2]])
+
+    def test_window__long_history__keep_only_a_few_records_in_memory(self):
+        self._undo_redo_repository.close()
+        self._undo_redo_repository = self._open_repository(window_size=2)
+        for key in range(40):
+            self._add_record(key)
+        self._undo_redo_repository.persist()
+        self.assertEqual(self._undo_redo_repository.get_history_metrics()["records_in_memory"], 2)
+        for key in reversed(range(40)):
+            with self._undo_redo_repository.stepping_back_in_modification_history() as operation:
+                operation.undo()
+        self.assertEqual(self._undo_redo_repository.get_history_metrics()["records_in_memory"], 2)
+        self.assertEqual([list(keys) for action, keys in self._interpreter.done if action == "undo"],
+                         [[key] for key in reversed(range(40))])
+
+    def test_stepping_back__after_reopening__keep_the_position_of_the_last_successful_undo(self):
+        for key in range(3):
+            self._add_record(key)
+        with self.assertRaises(RuntimeError):
+            with self._undo_redo_repository.stepping_back_in_modification_history():
+                raise RuntimeError("undo failed")
+        with self._undo_redo_repository.stepping_back_in_modification_history():
+            pass
+        self._undo_redo_repository.persist()
+        self._undo_redo_repository.close()
+        self._undo_redo_repository = self._open_repository()
+        self.assertEqual(self._undo_redo_repository.get_index_in_modification_history(), 1)
+
+    def test_add_operation__not_a_undo_record__raise_exception(self):
+        with self.assertRaises(UndoRedoRepositoryException):
+            self._undo_redo_repository.add_new_operation_to_modifications_history(
+                Operation(Call(print), Call(print)))
+
+    def test_open__not_an_undo_index__raise_exception(self):
+        self._undo_redo_repository.close()
+        with open(self._file_name + ".index", "wb") as index_file:
+            index_file.write(b"something else entirely")
+        self._undo_redo_repository = None
+        with self.assertRaises(UndoRedoRepositoryException):
+            self._open_repository()
+
+
+class concurrency_tests(unittest.TestCase):
+    def _run_threads(self, target, number_of_threads):
+        threads = [threading.Thread(target=target, args=(thread_index,)) for thread_index in range(number_of_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+            self.assertFalse(thread.is_alive())
+
+    def test_read__several_threads__hold_lock_together(self):
+        lock = ReadWriteLock()
+        # every reader waits at the barrier while it holds the lock, so it's passed only if they read together
+        readers_inside = threading.Barrier(4, timeout=5)
+
+        def read(thread_index):
+            with lock.read():
+                readers_inside.wait()
+
+        self._run_threads(read, 4)
+        self.assertFalse(readers_inside.broken)
+
+    def test_write__lock_held_for_reading__wait_until_released(self):
+        lock = ReadWriteLock()
+        events = []
+        reader_inside = threading.Event()
+        release_reader = threading.Event()
+
+        def read():
+            with lock.read():
+                reader_inside.set()
+                release_reader.wait(timeout=5)
+                events.append("read")
+
+        def write():
+            with lock.write():
+                events.append("write")
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        reader_inside.wait(timeout=5)
+        writer = threading.Thread(target=write)
+        writer.start()
+        writer.join(timeout=0.1)
+        self.assertTrue(writer.is_alive())
+        release_reader.set()
+        reader.join(timeout=5)
+        writer.join(timeout=5)
+        self.assertEqual(events, ["read", "write"])
+
+    def test_write__thread_holds_lock_for_reading__raise_runtime_error(self):
+        lock = ReadWriteLock()
+        with lock.write(), lock.read(), lock.write():
+            pass
+        with lock.read():
+            with self.assertRaises(RuntimeError):
+                lock.acquire_write()
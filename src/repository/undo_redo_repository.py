@@ -1,25 +1,86 @@
+import base64
+import json
+import os
+import struct
+import threading
+from array import array
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+
+from src.domain.undo_redo import UndoRecord, ComplexOperation
+
+DEFAULT_MAX_OPERATIONS = 1000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# magic, number of records, position in the history
+INDEX_HEADER = struct.Struct("<8sQq")
+INDEX_MAGIC = b"SLAMUND1"
+# offset of the record in the data file, length of the record
+INDEX_ENTRY = struct.Struct("<QQ")
+DEFAULT_WINDOW_SIZE = 64
+
+
+class UndoRedoRepositoryException(Exception):
+    pass
+
+
 class UndoRedoRepository:
-    def __init__(self):
+    def __init__(self, max_operations=DEFAULT_MAX_OPERATIONS, max_bytes=DEFAULT_MAX_BYTES):
         """
-        Initialize the repository of undo/redo operations
+        Initialize the repository of undo/redo operations; when the history grows over one of its limits, the oldest
+        operations are forgotten, so they can't be undone anymore
+        :param max_operations: a positive integer, the maximum number of operations kept, or None for no limit
+        :param max_bytes: a positive integer, the maximum estimated memory used by the operations kept and by the
+                          objects they keep alive, or None for no limit
         """
         # the list of operations
-        self._modifications_history = []
+        self._modifications_history = deque()
+        # the estimated size of every operation in the list, in bytes
+        self._operation_sizes = deque()
+        self._history_bytes = 0
         # where we are in the list of operations
         self._index_in_modification_history = -1
+        self._max_operations = max_operations
+        self._max_bytes = max_bytes
+        self._evicted_operations = 0
+        self._discarded_redo_operations = 0
+        # held while the history or the position in it change, so several threads can record, undo and redo
+        self._lock = threading.RLock()
 
     def add_new_operation_to_modifications_history(self, operation):
         """
-        Add a new operation to the modifications history
+        Add a new operation to the modifications history; the operations which were undone can't be redone anymore,
+        so they are discarded
         :param operation: a operation or complex operation object to add
         """
-        self._index_in_modification_history += 1
-        self._modifications_history.insert(self._index_in_modification_history, operation)
+        with self._lock:
+            while len(self._modifications_history) > self._index_in_modification_history + 1:
+                self._modifications_history.pop()
+                self._history_bytes -= self._operation_sizes.pop()
+                self._discarded_redo_operations += 1
+            operation_size = operation.estimated_size()
+            self._modifications_history.append(operation)
+            self._operation_sizes.append(operation_size)
+            self._history_bytes += operation_size
+            self._index_in_modification_history += 1
+            self._evict_oldest_operations()
+
+    def _evict_oldest_operations(self):
+        """
+        Forget the oldest operations while the history is over one of its limits; the newest operation is always kept
+        """
+        while len(self._modifications_history) > 1 and (
+                self._max_operations is not None and len(self._modifications_history) > self._max_operations or
+                self._max_bytes is not None and self._history_bytes > self._max_bytes):
+            self._modifications_history.popleft()
+            self._history_bytes -= self._operation_sizes.popleft()
+            self._index_in_modification_history -= 1
+            self._evicted_operations += 1
 
     def get_modifications_history(self):
         """
         Return the list of operations
-        :return a list of operation/complex operation objects
+        :return a deque of operation/complex operation objects
         """
         return self._modifications_history
 
@@ -35,5 +96,320 @@ class UndoRedoRepository:
         Update the index in modification history by incrementing or decrementing it
         :param new_index_value_to_add: a integer which represent the value by which we will decrement/increment the index
         """
-        self._index_in_modification_history += new_index_value_to_add
+        with self._lock:
+            self._index_in_modification_history += new_index_value_to_add
+
+    @contextmanager
+    def stepping_back_in_modification_history(self):
+        """
+        Get the operation at the current position for the with block, which undoes it; the position moves before the
+        operation only if the block succeeds, so a failed undo can be tried again. The history is held during the
+        block, so two threads which undo at the same time never get the same operation
+        :return: the operation to undo, or None if there is no operation to undo
+        """
+        with self._lock:
+            if self._index_in_modification_history < 0:
+                yield None
+                return
+            yield self.get_modifications_history()[self._index_in_modification_history]
+            self.update_index_in_modification_history(-1)
+
+    @contextmanager
+    def stepping_forward_in_modification_history(self):
+        """
+        Get the operation after the current position for the with block, which redoes it; the position moves to the
+        operation only if the block succeeds
+        :return: the operation to redo, or None if there is no operation to redo
+        """
+        with self._lock:
+            if self._index_in_modification_history + 1 >= len(self.get_modifications_history()):
+                yield None
+                return
+            yield self.get_modifications_history()[self._index_in_modification_history + 1]
+            self.update_index_in_modification_history(1)
+
+    def has_unpersisted_modifications(self):
+        """
+        Check if the history was modified since it was last persisted
+        :return: False, the in-memory history is never persisted
+        """
+        return False
+
+    def persist(self):
+        """
+        Write the modifications of the history to its storage; the in-memory history has no storage
+        """
+        pass
+
+    def revert_to_persisted(self):
+        """
+        Forget the modifications of the history since it was last persisted; the in-memory history keeps them, it is
+        lost with the program anyway
+        """
+        pass
+
+    def get_history_metrics(self):
+        """
+        Get the numbers which describe the size of the modifications history, used for tuning its limits
+        :return: a dictionary with the number of operations kept, how many of them can be undone and redone, their
+                 estimated size in bytes, the limits, and how many operations were evicted or discarded so far
+        """
+        with self._lock:
+            return {
+                "operations": len(self._modifications_history),
+                "undoable_operations": self._index_in_modification_history + 1,
+                "redoable_operations": len(self._modifications_history) - self._index_in_modification_history - 1,
+                "estimated_bytes": self._history_bytes,
+                "max_operations": self._max_operations,
+                "max_bytes": self._max_bytes,
+                "evicted_operations": self._evicted_operations,
+                "discarded_redo_operations": self._discarded_redo_operations,
+            }
+
+
+class UndoRedoFileRepository(UndoRedoRepository):
+    def __init__(self, file_name, interpreter, window_size=DEFAULT_WINDOW_SIZE):
+        """
+        Initialize the file based repository of undo/redo operations, so the history survives a restart. The records
+        are appended to a data file, one JSON line per record, and a second file (file_name + ".index") holds a
+        fixed-width entry with the offset of every record, so any record is read with two seeks. Opening the
+        repository reads only the header of the index; the records are read when they are undone or redone, and only
+        the window_size most recently used ones are kept in memory, however long the history is.
+        The new records and the moves of the position are kept in memory until persist is called, which writes all of
+        them with one fsync per file; the undo redo service calls it once the repositories committed the
+        modifications, so the files never describe modifications which are not on disk yet
+        :param file_name: a string which represent the name/location of the data file
+        :param interpreter: a UndoRecordInterpreter object which knows all the repositories, it applies the records
+                            read from the file
+        :param window_size: a positive integer, the number of records kept in memory
+        :except UndoRedoRepositoryException, if the index file is not an undo index
+        """
+        super().__init__(max_operations=None, max_bytes=None)
+        self._interpreter = interpreter
+        self._window_size = window_size
+        # position in the history -> undo record, the least recently used first
+        self._window = OrderedDict()
+        # position in the history -> (undo record, encoded record), for the records which are not in the files yet
+        self._unwritten_records = dict()
+        self._data_file = open(file_name, "r+b" if os.path.exists(file_name) else "w+b")
+        index_file_name = file_name + ".index"
+        self._index_file = open(index_file_name, "r+b" if os.path.exists(index_file_name) else "w+b")
+        header = self._index_file.read(INDEX_HEADER.size)
+        if len(header) == 0:
+            self._record_count = 0
+            self._write_header(0, -1)
+        else:
+            try:
+                magic, self._record_count, self._index_in_modification_history = INDEX_HEADER.unpack(header)
+            except struct.error:
+                magic = None
+            if magic != INDEX_MAGIC:
+                self.close()
+                raise UndoRedoRepositoryException("The file is not an undo index: " + index_file_name)
+            self._persisted_header = (self._record_count, self._index_in_modification_history)
+        # the records before this position are in the files, at the same position as in the history
+        self._written_record_count = self._record_count
+
+    def _write_header(self, record_count, index_in_modification_history):
+        self._index_file.seek(0)
+        self._index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, record_count, index_in_modification_history))
+        self._index_file.flush()
+        os.fsync(self._index_file.fileno())
+        self._persisted_header = (record_count, index_in_modification_history)
+
+    def _read_index_entry(self, position):
+        self._index_file.seek(INDEX_HEADER.size + position * INDEX_ENTRY.size)
+        return INDEX_ENTRY.unpack(self._index_file.read(INDEX_ENTRY.size))
+
+    def add_new_operation_to_modifications_history(self, operation):
+        """
+        Append a new undo record to the history; the records which were undone can't be redone anymore, so they are
+        discarded. The record reaches the files when the history is persisted
+        :param operation: a UndoRecord object, or a ComplexOperation object made of undo records
+        :except UndoRedoRepositoryException, for any other operation, which can't be written to the file
+        """
+        line = json.dumps(self._encode_operation(operation)).encode() + b"\n"
+        with self._lock:
+            position = self._index_in_modification_history + 1
+            if position < self._record_count:
+                self._discarded_redo_operations += self._record_count - position
+                for discarded_position in range(position, self._record_count):
+                    self._window.pop(discarded_position, None)
+                    self._unwritten_records.pop(discarded_position, None)
+                self._written_record_count = min(self._written_record_count, position)
+            self._unwritten_records[position] = (operation, line)
+            self._record_count = position + 1
+            self._index_in_modification_history = position
+
+    def has_unpersisted_modifications(self):
+        """
+        Check if the history was modified since it was last persisted
+        :return: True, if there are records or a position which are not in the files yet, False otherwise
+        """
+        with self._lock:
+            return len(self._unwritten_records) != 0 or \
+                self._persisted_header != (self._record_count, self._index_in_modification_history)
+
+    def persist(self):
+        """
+        Write the new records and the position in the history to the files, with one fsync per file
+        """
+        with self._lock:
+            if not self.has_unpersisted_modifications():
+                return
+            if self._persisted_header[0] > self._written_record_count:
+                # the discarded records are dropped from the header before their bytes are overwritten, so a stop in
+                # the middle of the write never leaves the header pointing at missing records
+                self._write_header(self._written_record_count,
+                                   min(self._persisted_header[1], self._written_record_count - 1))
+            if len(self._unwritten_records) != 0:
+                offset = 0
+                if self._written_record_count > 0:
+                    previous_offset, previous_length = self._read_index_entry(self._written_record_count - 1)
+                    offset = previous_offset + previous_length
+                index_entries = []
+                lines = []
+                line_offset = offset
+                for position in range(self._written_record_count, self._record_count):
+                    record, line = self._unwritten_records[position]
+                    index_entries.append(INDEX_ENTRY.pack(line_offset, len(line)))
+                    lines.append(line)
+                    line_offset += len(line)
+                # the data after the new records belongs to discarded records, or to records which were written while
+                # the program stopped, before their index entries
+                self._data_file.seek(offset)
+                self._data_file.write(b"".join(lines))
+                self._data_file.truncate()
+                self._data_file.flush()
+                os.fsync(self._data_file.fileno())
+                self._index_file.seek(INDEX_HEADER.size + self._written_record_count * INDEX_ENTRY.size)
+                self._index_file.write(b"".join(index_entries))
+                self._index_file.truncate()
+                for position, (record, line) in sorted(self._unwritten_records.items()):
+                    self._keep_in_window(position, record)
+                self._unwritten_records.clear()
+                self._written_record_count = self._record_count
+            self._write_header(self._record_count, self._index_in_modification_history)
+
+    def revert_to_persisted(self):
+        """
+        Forget the records and the moves of the position which were not persisted, e.g. when the repositories rolled
+        back the modifications they describe; the history becomes the one in the files again
+        """
+        with self._lock:
+            self._record_count, self._index_in_modification_history = self._persisted_header
+            self._written_record_count = self._record_count
+            self._unwritten_records.clear()
+            self._window.clear()
+
+    @staticmethod
+    def _encode_operation(operation):
+        """
+        Encode a undo record, or a complex operation made of undo records (e.g. a transaction), for JSON
+        :except UndoRedoRepositoryException, for any other operation, which can't be written to the file
+        """
+        if isinstance(operation, UndoRecord):
+            return {"op_code": operation.op_code, "keys": _encode_value(operation.keys),
+                    "before": _encode_value(operation.before), "after": _encode_value(operation.after)}
+        if isinstance(operation, ComplexOperation) and all(isinstance(inner_operation, UndoRecord)
+                                                           for inner_operation in operation.operations):
+            return {"operations": [UndoRedoFileRepository._encode_operation(inner_operation)
+                                   for inner_operation in operation.operations]}
+        raise UndoRedoRepositoryException("Only undo records can be kept in the undo file")
+
+    def _decode_operation(self, fields):
+        if "operations" in fields:
+            return ComplexOperation([self._decode_operation(inner_fields) for inner_fields in fields["operations"]])
+        return UndoRecord(self._interpreter, fields["op_code"], _decode_value(fields["keys"]),
+                          _decode_value(fields["before"]), _decode_value(fields["after"]))
+
+    def _keep_in_window(self, position, record):
+        self._window[position] = record
+        self._window.move_to_end(position)
+        while len(self._window) > self._window_size:
+            self._window.popitem(last=False)
+
+    def __len__(self):
+        return self._record_count
+
+    def __getitem__(self, position):
+        """
+        Get a record of the history, from the window or from the file
+        :param position: a integer, negative positions count from the end like for lists
+        :except IndexError, if there is no record at the position
+        """
+        with self._lock:
+            if position < 0:
+                position += self._record_count
+            if not 0 <= position < self._record_count:
+                raise IndexError("Position out of range")
+            if position in self._unwritten_records:
+                return self._unwritten_records[position][0]
+            record = self._window.get(position)
+            if record is None:
+                offset, length = self._read_index_entry(position)
+                self._data_file.seek(offset)
+                record = self._decode_operation(json.loads(self._data_file.read(length)))
+            self._keep_in_window(position, record)
+            return record
+
+    def get_modifications_history(self):
+        """
+        Return the history, which can be used like a read-only list of operations
+        :return: the repository itself
+        """
+        return self
+
+    def get_history_metrics(self):
+        """
+        Get the numbers which describe the size of the modifications history
+        :return: a dictionary like for the in-memory repository, where the estimated bytes are the ones of the records
+                 kept in memory, and with the sizes of the two files
+        """
+        with self._lock:
+            self._data_file.seek(0, os.SEEK_END)
+            records_in_memory = list(self._window.values()) + [record for record, line in
+                                                                self._unwritten_records.values()]
+            return {
+                "operations": self._record_count,
+                "undoable_operations": self._index_in_modification_history + 1,
+                "redoable_operations": self._record_count - self._index_in_modification_history - 1,
+                "estimated_bytes": sum(record.estimated_size() for record in records_in_memory),
+                "max_operations": None,
+                "max_bytes": None,
+                "evicted_operations": 0,
+                "discarded_redo_operations": self._discarded_redo_operations,
+                "records_in_memory": len(records_in_memory),
+                "data_file_bytes": self._data_file.tell(),
+                "index_file_bytes": INDEX_HEADER.size + self._record_count * INDEX_ENTRY.size,
+            }
+
+    def close(self):
+        with self._lock:
+            self._data_file.close()
+            self._index_file.close()
+
+
+def _encode_value(value):
+    """
+    Encode a value of a undo record for JSON; the arrays are kept as base64 text of their bytes
+    :param value: None, a number, a string, an array or a tuple/list of such values
+    """
+    if isinstance(value, array):
+        return {"array": value.typecode, "bytes": base64.b64encode(value.tobytes()).decode("ascii")}
+    if isinstance(value, (tuple, list)):
+        return [_encode_value(item) for item in value]
+    return value
+
 
+def _decode_value(value):
+    """
+    Decode a value encoded by _encode_value; the lists become tuples
+    """
+    if isinstance(value, dict):
+        decoded_array = array(value["array"])
+        decoded_array.frombytes(base64.b64decode(value["bytes"]))
+        return decoded_array
+    if isinstance(value, list):
+        return tuple(_decode_value(item) for item in value)
+    return value
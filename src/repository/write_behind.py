@@ -0,0 +1,131 @@
+import os
+import threading
+from contextlib import contextmanager
+
+
+def atomic_write_file(file_name, content):
+    """
+    Replace the content of a file, so that a crash leaves either the old or the new content on disk, never a mix
+    :param file_name: a string which represent the name/location of the file
+    :param content: a bytes object which will be the new content of the file
+    """
+    temporary_file_name = file_name + ".tmp"
+    file = open(temporary_file_name, "wb")
+    try:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    finally:
+        file.close()
+    os.replace(temporary_file_name, file_name)
+
+
+class WriteBehind:
+    def __init__(self, file_name, serialize_function, writer=None, max_pending_modifications=100,
+                 flush_interval=1.0):
+        """
+        Initialize the write-behind layer of a file repository, which coalesces the saves of several modifications
+        :param file_name: a string which represent the name/location of the file of the repository
+        :param serialize_function: a function which returns the whole repository as a bytes object
+        :param writer: an AsyncFileWriter object which writes the file in background, or None for writing it on
+                       the calling thread
+        :param max_pending_modifications: a integer, the repository is saved after this many unsaved modifications
+        :param flush_interval: a float, the number of seconds after which an unsaved modification is saved
+        """
+        self._file_name = file_name
+        self._serialize_function = serialize_function
+        self._writer = writer
+        self._max_pending_modifications = max_pending_modifications
+        self._flush_interval = flush_interval
+        self._pending_modifications = 0
+        self._batch_depth = 0
+        # functions which wait for the end of the batch, see after_commit
+        self._after_commit_functions = []
+        self._timer = None
+        # taken while the repository data is modified and while it is serialized, so the timer never saves a
+        # half-modified repository
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def modification(self):
+        """
+        Modify the repository inside the with block and mark it as having unsaved modifications
+        """
+        with self._lock:
+            yield
+            self._pending_modifications += 1
+            if self._batch_depth == 0:
+                if self._pending_modifications >= self._max_pending_modifications:
+                    self._save()
+                elif self._timer is None:
+                    self._timer = threading.Timer(self._flush_interval, self._save)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    @contextmanager
+    def batch(self):
+        """
+        Group the modifications of the with block; the repository is saved once, when the outermost block ends
+        """
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._save()
+                    after_commit_functions, self._after_commit_functions = self._after_commit_functions, []
+                    if len(after_commit_functions) != 0:
+                        # the functions expect the file on disk, not only handed to the background writer
+                        if self._writer is not None:
+                            self._writer.wait_until_written()
+                        for function in after_commit_functions:
+                            function()
+
+    def after_commit(self, function):
+        """
+        Run a function once the modifications done so far are on disk: when the outermost batch ends, or right away
+        (after saving the repository) outside of a batch
+        :param function: a function without parameters
+        """
+        with self._lock:
+            if self._batch_depth > 0:
+                self._after_commit_functions.append(function)
+                return
+            self.flush()
+        function()
+
+    def flush(self):
+        """
+        Save the repository now, if it has unsaved modifications, and wait until the file is written
+        """
+        self._save()
+        if self._writer is not None:
+            self._writer.wait_until_written()
+
+    def check_errors(self):
+        """
+        Report the errors of the background writer, if there is one
+        """
+        if self._writer is not None:
+            self._writer.check_errors()
+
+    def has_pending_modifications(self):
+        return self._pending_modifications > 0
+
+    def _save(self):
+        """
+        Write the repository to its file (or hand it to the background writer), if it has unsaved modifications
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._pending_modifications > 0:
+                content = self._serialize_function()
+                if self._writer is None:
+                    atomic_write_file(self._file_name, content)
+                else:
+                    self._writer.write(self._file_name, content)
+                self._pending_modifications = 0
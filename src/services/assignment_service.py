@@ -3,6 +3,10 @@ import random
 import datetime
 from src.domain.undo_redo import *
 from src.services.grade_service import GradeService
+from src.repository.assigment_repository import AssignmentRepositoryException
+from src.services.bulk_import import CHUNK_SIZE, import_records, read_text
+from src.services.undo_record_interpreter import UndoRecordInterpreter
+from array import array
 
 ASSIGNMENT_DESCRIPTION = [
     'Implement something cool', 'Create your own site', 'Create your own game', 'Yeah, do something',
@@ -22,6 +26,7 @@ class AssignmentService():
         """
         self._assignment_repository = assignment_repository
         self._undo_redo_service = undo_redo_service
+        self._undo_record_interpreter = UndoRecordInterpreter(assignment_repository=assignment_repository)
 
     def generate_assignments(self):
         """
@@ -50,10 +55,46 @@ class AssignmentService():
         :param description: string, which represents the description of the assignment
         :param deadline: datetime object, which represents the date of the deadline
         """
-        self._assignment_repository.add_assignment(Assignment(assignment_id, description, deadline))
-        undo_call = Call(self._assignment_repository.remove_assignment, assignment_id)
-        redo_call = Call(self._assignment_repository.add_assignment, Assignment(assignment_id, description, deadline))
-        self._undo_redo_service.record_operation(Operation(undo_call, redo_call))
+        with self._assignment_repository.get_lock().write():
+            self._assignment_repository.add_assignment(Assignment(assignment_id, description, deadline))
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter, ADD_ASSIGNMENTS,
+                                                                (assignment_id,),
+                                                                after=((description,), (deadline.toordinal(),))))
+
+    def import_assignments(self, stream, chunk_size=CHUNK_SIZE):
+        """
+        Add the assignments of a CSV file (header: assignment_id,description,deadline) or of a NDJSON file, the
+        deadlines being written as YYYY-MM-DD; the file is read a chunk at a time and the repository is saved once, at
+        the end. The valid lines are imported even if other lines fail, and the whole import is undone as a single
+        operation
+        :param stream: a text file object, or any iterable of lines
+        :param chunk_size: a integer, the number of lines which are validated together
+        :return: a ImportReport object with the number of imported assignments and the errors of the other lines
+        """
+        # the imported assignments are kept for undo and redo as columns, not as assignment objects
+        imported_ids = array("q")
+        imported_descriptions = []
+        imported_deadlines = array("i")
+
+        def parse_assignment(values):
+            assignment_id, description, deadline = values
+            return Assignment(int(assignment_id), read_text("description", description),
+                              datetime.date.fromisoformat(read_text("deadline", deadline)))
+
+        def add_assignment(assignment):
+            self._assignment_repository.add_assignment(assignment)
+            imported_ids.append(assignment.assigment_id)
+            imported_descriptions.append(assignment.description)
+            imported_deadlines.append(assignment.deadline.toordinal())
+
+        with self._assignment_repository.batch():
+            report = import_records(stream, ("assignment_id", "description", "deadline"), parse_assignment,
+                                    add_assignment, AssignmentRepositoryException, chunk_size)
+        if report.imported != 0:
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter, ADD_ASSIGNMENTS,
+                                                                imported_ids,
+                                                                after=(imported_descriptions, imported_deadlines)))
+        return report
 
     def remove_assignment(self, assignment_id):
         """
@@ -68,12 +109,13 @@ class AssignmentService():
         :param assignment_id: a integer which indicate the id of the assignment which we want to  update
         :param new_description: a string which will replace the actual description of the assignment
         """
-        self._assignment_repository.check_valid_assignment_id(assignment_id)
-        actual_description = self._assignment_repository.get_assignment_data()[assignment_id].description
-        undo_call = Call(self._assignment_repository.update_assignment_description, assignment_id, actual_description)
-        redo_call = Call(self._assignment_repository.update_assignment_description, assignment_id, new_description)
-        self._undo_redo_service.record_operation(Operation(undo_call, redo_call))
-        self._assignment_repository.update_assignment_description(assignment_id, new_description)
+        with self._assignment_repository.get_lock().write():
+            self._assignment_repository.check_valid_assignment_id(assignment_id)
+            actual_description = self._assignment_repository.get_assignment_data()[assignment_id].description
+            self._assignment_repository.update_assignment_description(assignment_id, new_description)
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter,
+                                                                UPDATE_ASSIGNMENT_DESCRIPTION, assignment_id,
+                                                                actual_description, new_description))
 
     def update_assignment_deadline(self, assignment_id, new_deadline):
         """
@@ -81,12 +123,13 @@ class AssignmentService():
         :param assignment_id: a integer which indicate the id of the assignment which we want to  update
         :param new_deadline: a datetime object which will replace the actual deadline of the assignment
         """
-        self._assignment_repository.check_valid_assignment_id(assignment_id)
-        actual_deadline = self._assignment_repository.get_assignment_data()[assignment_id].deadline
-        undo_call = Call(self._assignment_repository.update_assignment_deadline, assignment_id, actual_deadline)
-        redo_call = Call(self._assignment_repository.update_assignment_deadline, assignment_id, new_deadline)
-        self._undo_redo_service.record_operation(Operation(undo_call, redo_call))
-        self._assignment_repository.update_assignment_deadline(assignment_id, new_deadline)
+        with self._assignment_repository.get_lock().write():
+            self._assignment_repository.check_valid_assignment_id(assignment_id)
+            actual_deadline = self._assignment_repository.get_assignment_data()[assignment_id].deadline
+            self._assignment_repository.update_assignment_deadline(assignment_id, new_deadline)
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter,
+                                                                UPDATE_ASSIGNMENT_DEADLINE, assignment_id,
+                                                                actual_deadline.toordinal(), new_deadline.toordinal()))
 
     def check_valid_assignment(self, assignment_id):
         """
@@ -96,4 +139,31 @@ class AssignmentService():
         self._assignment_repository.check_valid_assignment_id(assignment_id)
 
     def get_assignments(self):
-        return self._assignment_repository.get_assignment_data()
\ No newline at end of file
+        return self._assignment_repository.get_assignment_data()
+
+    def list_assignments(self):
+        """
+        Get a copy of the assignments, taken while the repository is locked for reading, which can be iterated while
+        other threads modify the repository
+        :return: a list of assignment objects
+        """
+        with self._assignment_repository.get_lock().read():
+            return list(self._assignment_repository.get_assignment_data())
+
+    def flush(self):
+        """
+        Write the pending modifications of the repository to its storage
+        """
+        self._assignment_repository.flush()
+
+    def batch(self):
+        """
+        Group the modifications done inside a with block, so the repository persists them together when it ends
+        """
+        return self._assignment_repository.batch()
+
+    def check_persistence_errors(self):
+        """
+        Report the errors which happened while the repository was saved in background
+        """
+        self._assignment_repository.check_persistence_errors()
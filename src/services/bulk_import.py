@@ -0,0 +1,149 @@
+import csv
+import itertools
+import json
+
+# number of records which are validated together before they are inserted
+CHUNK_SIZE = 1000
+# the errors after this many are only counted, so a file full of bad lines doesn't fill the memory
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportReport:
+    def __init__(self, max_errors=MAX_REPORTED_ERRORS):
+        """
+        Initialize the report of a bulk import
+        :param max_errors: a integer, the maximum number of errors which are kept with their message
+        """
+        self.imported = 0
+        self.failed = 0
+        # list of (line number, error message)
+        self.errors = []
+        self._max_errors = max_errors
+
+    def add_error(self, line_number, message):
+        """
+        Record a line which could not be imported
+        :param line_number: a integer, the number of the line in the imported file, starting from 1
+        :param message: a string which describes the error
+        """
+        self.failed += 1
+        if len(self.errors) < self._max_errors:
+            self.errors.append((line_number, message))
+
+    def __str__(self):
+        lines = ["Imported: " + str(self.imported) + ", failed: " + str(self.failed)]
+        lines.extend("Line " + str(line_number) + ": " + message for line_number, message in self.errors)
+        if self.failed > len(self.errors):
+            lines.append("... and " + str(self.failed - len(self.errors)) + " more errors")
+        return "\n".join(lines)
+
+
+def read_chunks(stream, fields, report, chunk_size=CHUNK_SIZE):
+    """
+    Read the records of a CSV file with a header line, or of a NDJSON file (one JSON object per line), a chunk at a
+    time; the format is chosen by the first line which is not empty
+    :param stream: a text file object, or any iterable of lines
+    :param fields: a tuple with the names of the fields of a record
+    :param report: a ImportReport object where the lines which can't be read are recorded
+    :param chunk_size: a integer, the maximum number of records in a chunk
+    :return: a generator of lists of (line number, list with the values of the fields)
+    """
+    lines = iter(stream)
+    first_line_number = 1
+    for first_line in lines:
+        if first_line.strip():
+            break
+        first_line_number += 1
+    else:
+        return
+    lines = itertools.chain([first_line], lines)
+    if first_line.lstrip().startswith("{"):
+        records = _read_json_lines(lines, fields, report, first_line_number)
+    else:
+        records = _read_csv_lines(lines, fields, report, first_line_number)
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def _read_json_lines(lines, fields, report, first_line_number):
+    for line_number, line in enumerate(lines, first_line_number):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            report.add_error(line_number, "Invalid JSON")
+            continue
+        if not isinstance(record, dict):
+            report.add_error(line_number, "Invalid JSON, expected an object")
+            continue
+        missing_fields = [field for field in fields if field not in record]
+        if len(missing_fields) != 0:
+            report.add_error(line_number, "Missing fields: " + ", ".join(missing_fields))
+            continue
+        yield line_number, [record[field] for field in fields]
+
+
+def _read_csv_lines(lines, fields, report, first_line_number):
+    reader = csv.reader(lines)
+    header = [name.strip() for name in next(reader)]
+    missing_fields = [field for field in fields if field not in header]
+    if len(missing_fields) != 0:
+        report.add_error(first_line_number, "Missing columns: " + ", ".join(missing_fields))
+        return
+    positions = [header.index(field) for field in fields]
+    for row in reader:
+        line_number = first_line_number + reader.line_num - 1
+        if len(row) == 0:
+            continue
+        if len(row) != len(header):
+            report.add_error(line_number, "Expected " + str(len(header)) + " fields, found " + str(len(row)))
+            continue
+        yield line_number, [row[position] for position in positions]
+
+
+def import_records(stream, fields, parse_record, add_record, repository_exception, chunk_size=CHUNK_SIZE):
+    """
+    Read the records of a CSV or NDJSON file a chunk at a time, parse every record of a chunk and then add the valid
+    ones; the lines which can't be parsed or added are recorded in the report and the other lines are still imported
+    :param stream: a text file object, or any iterable of lines
+    :param fields: a tuple with the names of the fields of a record
+    :param parse_record: a function which gets the list with the values of the fields and returns the entity, and
+                         raises ValueError or TypeError if the values are invalid
+    :param add_record: a function which adds the entity to the repository
+    :param repository_exception: the exception class raised by add_record for a entity which can't be added
+    :param chunk_size: a integer, the number of lines which are validated together
+    :return: a ImportReport object with the number of added entities and the errors of the other lines
+    """
+    report = ImportReport()
+    for chunk in read_chunks(stream, fields, report, chunk_size):
+        entities = []
+        for line_number, values in chunk:
+            try:
+                entities.append((line_number, parse_record(values)))
+            except (ValueError, TypeError) as error:
+                report.add_error(line_number, str(error))
+        for line_number, entity in entities:
+            try:
+                add_record(entity)
+            except repository_exception as error:
+                report.add_error(line_number, str(error))
+                continue
+            report.imported += 1
+    return report
+
+
+def read_text(field, value):
+    """
+    Check the value of a text field, a NDJSON file can hold a null or a number in it
+    :param field: a string, the name of the field
+    :param value: the value read for the field
+    :return: the value, a string
+    :except ValueError, if the value is not a string
+    """
+    if not isinstance(value, str):
+        raise ValueError("Field " + field + " must be a string")
+    return value
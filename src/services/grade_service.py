@@ -1,22 +1,45 @@
+from array import array
+from contextlib import closing
+
 from src.domain.grade import Grade
 from src.repository.grade_repository import GradeRepositoryException
 from random import randint
 from datetime import date
 from src.domain.undo_redo import *
-from src.repository.iter_sort_filter import gnome_sort, filter_a_list
+from src.repository.read_write_lock import lock_in_order
+from src.services.bulk_import import CHUNK_SIZE, import_records
+from src.services.report_export import ReportExportException, write_report
+from src.services.undo_record_interpreter import UndoRecordInterpreter
+
+# report name -> names of the columns of its rows
+REPORT_HEADERS = {
+    "grades": ("assignment_id", "description", "student_id", "name", "group", "grade_value"),
+    "assignment ranking": ("student_id", "name", "group", "grade_value"),
+    "late students": ("student_id", "name", "group"),
+    "average ranking": ("student_id", "name", "group", "average_grade"),
+}
 
 
 class GradeService:
-    def __init__(self, grade_repository, student_repository, assignment_repository, undo_redo_service):
+    def __init__(self, grade_repository, student_repository, assignment_repository, undo_redo_service,
+                 statistics_engine=None, statistics_cache=None):
         """
         Initialize the grade service object
         :param grade_repository: a GradeRepository object used to manage the grades
         :param student_repository: a StudentRepository object used to get students groups
+        :param statistics_engine: a StatisticsEngine object which computes the reports, or None for computing them
+                                  with the repositories
+        :param statistics_cache: a StatisticsCache object which keeps the reports until the repositories they depend
+                                 on are modified, or None for computing the reports on every call
         """
         self._grade_repository = grade_repository
         self._students_repository = student_repository
         self._assignment_repository = assignment_repository
         self._undo_redo_service = undo_redo_service
+        self._statistics_engine = statistics_engine
+        self._statistics_cache = statistics_cache
+        self._undo_record_interpreter = UndoRecordInterpreter(student_repository, assignment_repository,
+                                                              grade_repository)
 
     def generate_grades(self):
         """
@@ -38,11 +61,11 @@ class GradeService:
         :param student_id: integer, which represents the student id
         :param grade_value: integer, between 1 and 10, which represents the grade value
         """
-        self._grade_repository.add_grade(Grade(assignment_id, student_id, grade_value))
-
-        undo_call = Call(self._grade_repository.remove_a_grade, assignment_id, student_id)
-        redo_call = Call(self._grade_repository.add_grade, Grade(assignment_id, student_id, grade_value))
-        self._undo_redo_service.record_operation(Operation(undo_call, redo_call))
+        with self._grade_repository.get_lock().write():
+            self._grade_repository.add_grade(Grade(assignment_id, student_id, grade_value))
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter, ADD_GRADES,
+                                                                ((assignment_id,), (student_id,)),
+                                                                after=(grade_value or 0,)))
 
     def give_assignment_to_a_group_of_students(self, assignment_id, group):
         """
@@ -50,20 +73,83 @@ class GradeService:
         :param assignment_id: a integer which indicate the id of the assignment to give
         :param group: a integer which indicates the group which will get the assignment
         """
-        operation_list = []
-        for student in self._students_repository.get_student_data():
-            if student.group == group:
-                try:
-                    self._grade_repository.add_grade(Grade(assignment_id, student.student_id))
-                    undo_call = Call(self._grade_repository.remove_a_grade, assignment_id, student.student_id)
-                    redo_call = Call(self._grade_repository.add_grade, Grade(assignment_id, student.student_id, None))
-                    operation_list.append(Operation(undo_call, redo_call))
-                except GradeRepositoryException:
-                    # if there is a student in the group which already have the assignment, we continue to search for
-                    # other students from the group
-                    pass
-        if len(operation_list)!=0:
-            self._undo_redo_service.record_operation(ComplexOperation(operation_list))
+        given_student_ids = array("q")
+        # the students are read while the grades are written, so the locks are taken in their order before the batch
+        with lock_in_order(self._locks_of(self._students_repository), self._locks_of(self._grade_repository)):
+            with self._grade_repository.batch():
+                for student in self._students_repository.get_students_in_group(group):
+                    try:
+                        self._grade_repository.add_grade(Grade(assignment_id, student.student_id))
+                        given_student_ids.append(student.student_id)
+                    except GradeRepositoryException:
+                        # if there is a student in the group which already have the assignment, we continue with
+                        # the other students from the group
+                        pass
+            if len(given_student_ids) != 0:
+                # the whole group is undone with a single record
+                self._undo_redo_service.record_operation(UndoRecord(
+                    self._undo_record_interpreter, ADD_GRADES,
+                    (array("q", [assignment_id]) * len(given_student_ids), given_student_ids),
+                    after=array("b", bytes(len(given_student_ids)))))
+
+    def give_assignment(self, assignment_id, student_id):
+        """
+        Give an assignment to a student; the student and the assignment are checked while their repositories are
+        locked, so a grade is never given for a student or an assignment which another thread is removing
+        :param assignment_id: a integer which represents the id of the assignment
+        :param student_id: a integer which represents the id of the student
+        :except AssignmentRepositoryException, StudentRepositoryException, if the assignment or the student doesn't
+                exist
+        :except GradeRepositoryException, if the student already has the assignment
+        """
+        with lock_in_order(self._locks_of(self._students_repository, self._assignment_repository),
+                           self._locks_of(self._grade_repository)):
+            self._assignment_repository.check_valid_assignment_id(assignment_id)
+            self._students_repository.check_valid_student_id(student_id)
+            self.add_grade(assignment_id, student_id)
+
+    def import_grades(self, stream, chunk_size=CHUNK_SIZE):
+        """
+        Add the grades of a CSV file (header: assignment_id,student_id,grade_value) or of a NDJSON file, an empty or
+        null grade value meaning an ungraded assignment; the file is read a chunk at a time and the repository is saved
+        once, at the end. The valid lines are imported even if other lines fail, and the whole import is undone as a
+        single operation
+        :param stream: a text file object, or any iterable of lines
+        :param chunk_size: a integer, the number of lines which are validated together
+        :return: a ImportReport object with the number of imported grades and the errors of the other lines
+        """
+        # the imported grades are kept for undo and redo as columns, 0 meaning ungraded, not as grade objects
+        imported_assignment_ids = array("q")
+        imported_student_ids = array("q")
+        imported_grade_values = array("b")
+        student_data = self._students_repository.get_student_data()
+        assignment_data = self._assignment_repository.get_assignment_data()
+
+        def parse_grade(values):
+            assignment_id, student_id, grade_value = values
+            grade = Grade(int(assignment_id), int(student_id), None if grade_value in ("", None) else int(grade_value))
+            if grade.assignment_id not in assignment_data:
+                raise ValueError("Assignment with id: " + str(grade.assignment_id) + " not present in repository")
+            if grade.student_id not in student_data:
+                raise ValueError("Student with id: " + str(grade.student_id) + " not present in repository")
+            return grade
+
+        def add_grade(grade):
+            self._grade_repository.add_grade(grade)
+            imported_assignment_ids.append(grade.assignment_id)
+            imported_student_ids.append(grade.student_id)
+            imported_grade_values.append(grade.grade_value or 0)
+
+        # the students and the assignments can't be removed while the grades given for them are imported
+        with lock_in_order(self._locks_of(self._students_repository, self._assignment_repository),
+                           self._locks_of(self._grade_repository)), self._grade_repository.batch():
+            report = import_records(stream, ("assignment_id", "student_id", "grade_value"), parse_grade, add_grade,
+                                    GradeRepositoryException, chunk_size)
+        if report.imported != 0:
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter, ADD_GRADES,
+                                                                (imported_assignment_ids, imported_student_ids),
+                                                                after=imported_grade_values))
+        return report
 
     def remove_grades(self, entity_id, id_position):
         """
@@ -72,27 +158,30 @@ class GradeService:
         :param entity_id: an integer, which can be the assigment id or the student id
         :param id_position: an integer, which can be 0 or 1 ( postiton of assignment_id or student_id in grade object)
         """
-        operations_list = []
-        if id_position == 1:
-            undo_call = Call(self._students_repository.add_student, self._students_repository.get_student_data()[entity_id])
-            redo_call = Call(self._students_repository.remove_student, entity_id)
-            operations_list.append(Operation(undo_call, redo_call))
-            for grade in self._grade_repository.get_grade_data():
-                    if grade.student_id == entity_id:
-                        undo_call = Call(self._grade_repository.add_grade, grade)
-                        redo_call = Call(self._grade_repository.remove_grades, grade.student_id, id_position)
-                        operations_list.append(Operation(undo_call, redo_call))
-        else:
-            undo_call = Call(self._assignment_repository.add_assignment, self._assignment_repository.get_assignment_data()[entity_id])
-            redo_call = Call(self._assignment_repository.remove_assignment, entity_id)
-            operations_list.append(Operation(undo_call, redo_call))
-            for grade in self._grade_repository.get_grade_data():
-                if grade.assignment_id == entity_id:
-                    undo_call = Call(self._grade_repository.add_grade, grade)
-                    redo_call = Call(self._grade_repository.remove_grades, grade.assignment_id, id_position)
-                    operations_list.append(Operation(undo_call, redo_call))
-        self._undo_redo_service.record_operation(ComplexOperation(operations_list))
-        self._grade_repository.remove_grades(entity_id, id_position)
+        entity_repository = self._students_repository if id_position == 1 else self._assignment_repository
+        with lock_in_order(self._locks_of(entity_repository), self._locks_of(self._grade_repository)):
+            # the removal of the entity and of its grades is undone with a single record, which keeps the removed grades
+            # as columns
+            other_ids = array("q")
+            grade_values = array("b")
+            if id_position == 1:
+                student = self._students_repository.get_student_data()[entity_id]
+                for grade in self._grade_repository.get_grades_of_student(entity_id):
+                    other_ids.append(grade.assignment_id)
+                    grade_values.append(grade.grade_value or 0)
+                record = UndoRecord(self._undo_record_interpreter, REMOVE_STUDENT, entity_id,
+                                    (student.name, student.group, other_ids, grade_values))
+            else:
+                assignment = self._assignment_repository.get_assignment_data()[entity_id]
+                for grade in self._grade_repository.get_grades_of_assignment(entity_id):
+                    other_ids.append(grade.student_id)
+                    grade_values.append(grade.grade_value or 0)
+                record = UndoRecord(self._undo_record_interpreter, REMOVE_ASSIGNMENT, entity_id,
+                                    (assignment.description, assignment.deadline.toordinal(), other_ids,
+                                     grade_values))
+            self._undo_redo_service.record_operation(record)
+            with self._grade_repository.batch():
+                self._grade_repository.remove_grades(entity_id, id_position)
 
     def grade_student_from_ungraded_assignments_list(self, position_in_ungraded_assignments_list, grade_value):
         """
@@ -100,56 +189,72 @@ class GradeService:
         :param position_in_ungraded_assignments_list: a integer which indicates to the assignment that will be graded
         :param grade_value: a integer which will represent the student's grade for the selected assignment
         """
-        ungraded_assignment_to_grade = self.get_ungraded_assignments()[position_in_ungraded_assignments_list]
-        ungraded_assignment_to_grade.grade_value = grade_value
-        self._grade_repository.grade_student_for_a_given_assignment(ungraded_assignment_to_grade)
-        assignment_id = ungraded_assignment_to_grade.assignment_id
-        student_id = ungraded_assignment_to_grade.student_id
-        undo_call = Call(self._grade_repository.grade_student_for_a_given_assignment, Grade(assignment_id, student_id, None))
-        redo_call = Call(self._grade_repository.grade_student_for_a_given_assignment, Grade(assignment_id, student_id, grade_value))
-        self._undo_redo_service.record_operation(Operation(undo_call, redo_call))
+        with self._grade_repository.get_lock().write():
+            ungraded_assignment_to_grade = self._grade_repository.get_ungraded_grade_at(
+                position_in_ungraded_assignments_list)
+            assignment_id = ungraded_assignment_to_grade.assignment_id
+            student_id = ungraded_assignment_to_grade.student_id
+            self._grade_repository.grade_student_for_a_given_assignment(Grade(assignment_id, student_id, grade_value))
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter, GRADE,
+                                                                (assignment_id, student_id), 0, grade_value))
+
+    def grade_student(self, assignment_id, student_id, grade_value):
+        """
+        Grade a student for an assignment which was given to the student
+        :param assignment_id: a integer which represents the id of the assignment
+        :param student_id: a integer which represents the id of the student
+        :param grade_value: a integer between 1 and 10
+        :except GradeRepositoryException, if the student didn't receive the assignment
+        """
+        with self._grade_repository.get_lock().write():
+            grade_data = self._grade_repository.get_grade_data()
+            if (assignment_id, student_id) not in grade_data:
+                raise GradeRepositoryException("The student with id: " + str(student_id) + " doesn't have the "
+                                               "assignment with id: " + str(assignment_id))
+            old_grade_value = grade_data[assignment_id, student_id].grade_value
+            self._grade_repository.grade_student_for_a_given_assignment(Grade(assignment_id, student_id, grade_value))
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter, GRADE,
+                                                                (assignment_id, student_id), old_grade_value or 0,
+                                                                grade_value))
 
     def get_ungraded_assignments(self):
         """
         Get the list of ungraded assignments
         :return: a list of grade objects, which will have the grade value None
         """
-        ungraded_assignments_list = list()
-        for grade in self._grade_repository.get_grade_data():
-            if grade.grade_value is None:
-                ungraded_assignments_list.append(grade)
-        return ungraded_assignments_list
+        return self._grade_repository.get_ungraded_grades()
 
     def get_graded_assignments(self):
         """
         Get the list of graded assignments
         :return: a list of grade objects, which will have the grade value not None
         """
-        graded_assignments_list = list()
-        for grade in self._grade_repository.get_grade_data():
-            if grade.grade_value is not None:
-                graded_assignments_list.append(grade)
-        return graded_assignments_list
+        return self._grade_repository.get_graded_grades()
 
-    def get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(self, assignment_id):
+    def get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(self, assignment_id, limit=None,
+                                                                                     min_grade=None):
         """
         Get the list of ll students who received a given assignment, ordered descending by grade
         :param assignment_id: a integer which represent the id of the assignment
+        :param limit: a non-negative integer, the maximum number of grades to return, or None for all of them
+        :param min_grade: a integer, only the grades with at least this value are returned, or None for all of them
         :return: a list of grades, sorted descending by grade value
                 ( the ungraded assignments will be added at the end of the list )
+        :except GradeRepositoryException, if no filter was given and the assignment isn't given to anyone
         """
-        graded_students_list = []
-        ungraded_students_list = []
-        for grade in self._grade_repository.get_grade_data():
-            if grade.assignment_id == assignment_id:
-                if grade.grade_value is None:
-                    ungraded_students_list.append(grade)
-                else:
-                    graded_students_list.append(grade)
-        if len(graded_students_list) + len(ungraded_students_list) ==0:
+        return self._get_report(("assignment ranking", assignment_id, limit, min_grade), (self._grade_repository,),
+                                lambda: self._compute_assignment_ranking(assignment_id, limit, min_grade))
+
+    def _compute_assignment_ranking(self, assignment_id, limit, min_grade):
+        if self._statistics_engine is not None:
+            students_list = self._statistics_engine.get_grades_of_assignment_sorted_descending(assignment_id, limit,
+                                                                                               min_grade)
+        else:
+            students_list = self._grade_repository.get_grades_of_assignment_sorted_descending(assignment_id, limit,
+                                                                                              min_grade)
+        if len(students_list) == 0 and limit is None and min_grade is None:
             raise GradeRepositoryException("Assignment with id: " + str(assignment_id) + " isn't given to anyone")
-        graded_students_list = gnome_sort(graded_students_list, lambda entity, previous_entity:previous_entity.grade_value > entity.grade_value)
-        return graded_students_list + ungraded_students_list
+        return students_list
 
     def get_list_of_all_students_who_are_late_in_handing_in_at_least_one_assignment(self):
         """
@@ -157,43 +262,176 @@ class GradeService:
         These are all the students who have an ungraded assignment for which the deadline has passed.
         :return: a list of ungraded assignments , for which the deadline has passed
         """
-        grades_list = self.get_ungraded_assignments()
-        # students_list = self._students_repository.get_student_data().copy()
-        students_list = dict()
-        for student in self._students_repository.get_student_data():
-            students_list[student.student_id] = student
-        list_of_students_who_are_late = []
-        today = date.today()
-        grades_list = filter_a_list(grades_list, lambda grade: self._assignment_repository.get_assignment_data()[grade.assignment_id].deadline < today)
-        for grade in grades_list:
-            if grade.student_id in students_list:
-                list_of_students_who_are_late.append(self._students_repository.get_student_data()[grade.student_id])
-                students_list.pop(grade.student_id)
-        return list_of_students_who_are_late
-
-    def get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(self):
+        # the report changes with the day too, so the day is part of the key
+        return self._get_report(("late students", date.today()),
+                                (self._grade_repository, self._students_repository, self._assignment_repository),
+                                self._compute_late_students)
+
+    def _compute_late_students(self):
+        if self._statistics_engine is not None:
+            return self._statistics_engine.get_students_late_in_handing_in_at_least_one_assignment()
+        # only the ungraded grades of the assignments whose deadline has passed are visited
+        overdue_assignment_ids = self._assignment_repository.get_assignments_with_deadline_before(date.today())
+        student_data = self._students_repository.get_student_data()
+        return [student_data[student_id] for student_id in
+                self._grade_repository.get_students_with_ungraded_grades_of_assignments(overdue_assignment_ids)
+                if student_id in student_data]
+
+    def get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(self, limit=None,
+                                                                                             min_average=None):
         """
         Get the list of students, sorted in descending order of the average grade received for all graded assignments.
-        :return: a dictionary sorted by values, where the keys are the id's of the students and the values are
-                the average grade received for all graded assignments
-        """
-        graded_assignments_list = self.get_graded_assignments()
-        list_of_average_grade_received = {}
-        counter_list = {}
-        for grade in graded_assignments_list:
-            if grade.student_id not in list_of_average_grade_received:
-                counter_list[grade.student_id] = 1
-                list_of_average_grade_received[grade.student_id] = grade.grade_value
-            else:
-                counter_list[grade.student_id] += 1
-                list_of_average_grade_received[grade.student_id] += grade.grade_value
-        for student_id in list_of_average_grade_received:
-            list_of_average_grade_received[student_id] /= counter_list[student_id]
-        students_list = []
-        for student_id in list_of_average_grade_received:
-            students_list.append((student_id, list_of_average_grade_received[student_id]))
-        average_grade_position = 1
-        return gnome_sort(students_list, lambda entity, previous_entity: entity[average_grade_position] < previous_entity[average_grade_position])
+        :param limit: a non-negative integer, the maximum number of students to return, or None for all of them
+        :param min_average: a number, only the students with at least this average are returned, or None for all of them
+        :return: a list of tuples (student_id, average_grade), sorted descending by the average grade received for
+                all graded assignments
+        """
+        return self._get_report(("average ranking", limit, min_average), (self._grade_repository,),
+                                lambda: self._compute_average_ranking(limit, min_average))
+
+    def _compute_average_ranking(self, limit, min_average):
+        if self._statistics_engine is not None:
+            return self._statistics_engine.get_students_sorted_descending_by_average_grade(limit, min_average)
+        return self._grade_repository.get_students_sorted_descending_by_average_grade(limit, min_average)
+
+    def _get_report(self, key, repositories, compute_report):
+        """
+        Get a report from the statistics cache, if there is one, or compute it
+        :param key: a tuple which identifies the report and its arguments
+        :param repositories: a tuple with the repositories the report is computed from
+        :param compute_report: a function without arguments which computes the report
+        """
+        # the report is read while its repositories are locked for reading, so the reports of several threads are
+        # computed at the same time, but never while one of the repositories is modified
+        with lock_in_order(self._locks_of(*repositories)):
+            if self._statistics_cache is None:
+                return compute_report()
+            return self._statistics_cache.get_report(key, repositories, compute_report)
+
+    @staticmethod
+    def _locks_of(*repositories):
+        return [repository.get_lock() for repository in repositories]
+
+    def _reading_all_repositories(self):
+        return lock_in_order(self._locks_of(self._students_repository, self._assignment_repository,
+                                            self._grade_repository))
+
+    def _student_lookup(self):
+        """
+        Get a function which returns the (name, group) of a student id, or (None, None) for an unknown student; every
+        student is looked up in the repository only once per report
+        """
+        student_data = self._students_repository.get_student_data()
+        known_students = dict()
+
+        def lookup(student_id):
+            student_fields = known_students.get(student_id)
+            if student_fields is None:
+                student = student_data[student_id] if student_id in student_data else None
+                student_fields = known_students[student_id] = (None, None) if student is None else \
+                    (student.name, student.group)
+            return student_fields
+        return lookup
+
+    def iterate_grades_report(self):
+        """
+        Get every grade, joined with its assignment and student, without building a list of all the grades
+        :return: a generator of tuples with the columns of REPORT_HEADERS["grades"]
+        """
+        student_lookup = self._student_lookup()
+        assignment_data = self._assignment_repository.get_assignment_data()
+        descriptions = dict()
+        # the repositories stay locked for reading until the last row is read, or until the generator is closed
+        with self._reading_all_repositories():
+            for grade in self._grade_repository.get_grade_data():
+                assignment_id = grade.assignment_id
+                description = descriptions.get(assignment_id)
+                if description is None:
+                    description = descriptions[assignment_id] = assignment_data[assignment_id].description \
+                        if assignment_id in assignment_data else ""
+                yield (assignment_id, description, grade.student_id) + student_lookup(grade.student_id) + \
+                    (grade.grade_value,)
+
+    def iterate_assignment_ranking_report(self, assignment_id, limit=None, min_grade=None):
+        """
+        Get the rows of the report of the students who received a given assignment, ordered descending by grade
+        :return: a generator of tuples with the columns of REPORT_HEADERS["assignment ranking"]
+        """
+        student_lookup = self._student_lookup()
+        for grade in self.get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(
+                assignment_id, limit, min_grade):
+            yield (grade.student_id,) + student_lookup(grade.student_id) + (grade.grade_value,)
+
+    def iterate_late_students_report(self):
+        """
+        Get the rows of the report of the students who are late in handing in at least one assignment
+        :return: a generator of tuples with the columns of REPORT_HEADERS["late students"]
+        """
+        for student in self.get_list_of_all_students_who_are_late_in_handing_in_at_least_one_assignment():
+            yield student.student_id, student.name, student.group
+
+    def iterate_average_ranking_report(self, limit=None, min_average=None):
+        """
+        Get the rows of the report of the students sorted descending by their average grade
+        :return: a generator of tuples with the columns of REPORT_HEADERS["average ranking"]
+        """
+        student_lookup = self._student_lookup()
+        for student_id, average_grade in \
+                self.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(
+                    limit, min_average):
+            yield (student_id,) + student_lookup(student_id) + (average_grade,)
+
+    def export_report(self, report_name, stream, file_format, **report_arguments):
+        """
+        Write a report to a text stream, row by row, as CSV or JSON
+        :param report_name: a string, one of the keys of REPORT_HEADERS
+        :param stream: a text file object, e.g. an opened file or sys.stdout
+        :param file_format: a string, "csv" or "json"
+        :param report_arguments: the arguments of the report, e.g. assignment_id for the assignment ranking
+        :return: a integer, the number of exported rows
+        :except ReportExportException, if the report or the format is not known
+        """
+        if report_name == "grades":
+            rows = self.iterate_grades_report()
+        elif report_name == "assignment ranking":
+            rows = self.iterate_assignment_ranking_report(**report_arguments)
+        elif report_name == "late students":
+            rows = self.iterate_late_students_report()
+        elif report_name == "average ranking":
+            rows = self.iterate_average_ranking_report(**report_arguments)
+        else:
+            raise ReportExportException("Unknown report: " + str(report_name))
+        # the rows are joined with the students and the assignments as they are written, so nothing is modified
+        # until the report is written
+        with self._reading_all_repositories(), closing(rows):
+            return write_report(stream, REPORT_HEADERS[report_name], rows, file_format)
 
     def get_grades(self):
         return self._grade_repository.get_grade_data()
+
+    def list_grades(self):
+        """
+        Get a copy of the grades, taken while the repository is locked for reading, which can be iterated while
+        other threads modify the repository
+        :return: a list of grade objects
+        """
+        with self._grade_repository.get_lock().read():
+            return list(self._grade_repository.get_grade_data())
+
+    def flush(self):
+        """
+        Write the pending modifications of the repository to its storage
+        """
+        self._grade_repository.flush()
+
+    def batch(self):
+        """
+        Group the modifications done inside a with block, so the repository persists them together when it ends
+        """
+        return self._grade_repository.batch()
+
+    def check_persistence_errors(self):
+        """
+        Report the errors which happened while the repository was saved in background
+        """
+        self._grade_repository.check_persistence_errors()
@@ -0,0 +1,64 @@
+import csv
+import io
+import itertools
+import json
+
+# number of rows which are formatted in memory and written to the output with a single call
+ROWS_PER_WRITE = 4096
+
+
+class ReportExportException(Exception):
+    pass
+
+
+def write_report(stream, header, rows, file_format):
+    """
+    Write the rows of a report to a text stream as they are produced, so the report is never held in memory
+    :param stream: a text file object, e.g. an opened file or sys.stdout
+    :param header: a tuple with the names of the columns
+    :param rows: an iterable of tuples, with a value for every column
+    :param file_format: a string, "csv" (with a header line) or "json" (an array of objects)
+    :return: a integer, the number of written rows
+    :except ReportExportException, if the format is not known
+    """
+    if file_format == "csv":
+        return _write_csv(stream, header, rows)
+    if file_format == "json":
+        return _write_json(stream, header, rows)
+    raise ReportExportException("Unknown export format: " + str(file_format))
+
+
+def _chunks(rows):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, ROWS_PER_WRITE))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def _write_csv(stream, header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    row_count = 0
+    for chunk in _chunks(rows):
+        writer.writerows(chunk)
+        stream.write(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+        row_count += len(chunk)
+    stream.write(buffer.getvalue())
+    return row_count
+
+
+def _write_json(stream, header, rows):
+    row_count = 0
+    for chunk in _chunks(rows):
+        # a whole chunk is encoded with one call, without the brackets of the list; nothing is written before the
+        # first chunk, so a report which fails at once leaves the stream untouched
+        objects = json.dumps([dict(zip(header, row)) for row in chunk])[1:-1]
+        stream.write((",\n" if row_count != 0 else "[\n") + objects)
+        row_count += len(chunk)
+    stream.write(("[" if row_count == 0 else "") + "\n]\n")
+    return row_count
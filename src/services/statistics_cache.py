@@ -0,0 +1,60 @@
+import threading
+from collections import OrderedDict
+
+
+class StatisticsCache:
+    def __init__(self, max_entries=64):
+        """
+        Initialize the cache of the statistics reports. Every report is stored together with the versions of the
+        repositories it was computed from, and it is thrown away as soon as one of them is modified
+        :param max_entries: a integer, when the cache is full the least recently used report is evicted
+        """
+        self._max_entries = max_entries
+        # key of the report -> (repositories the report depends on, their versions, the report)
+        self._entries = OrderedDict()
+        # held while the entries are read or changed, not while a report is computed, so the reports of several
+        # threads are computed at the same time
+        self._lock = threading.Lock()
+
+    def get_report(self, key, repositories, compute_report):
+        """
+        Get a report from the cache, or compute it and keep it in the cache
+        :param key: a hashable object which identifies the report and its arguments
+        :param repositories: a tuple with the repositories the report is computed from
+        :param compute_report: a function without arguments which computes the report as a list
+        :return: a new list with the report, so the caller can't modify the cached one
+        """
+        with self._lock:
+            self._evict_outdated_reports()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return list(entry[2])
+            versions = self._versions_of(repositories)
+        report = compute_report()
+        with self._lock:
+            self._entries[key] = (repositories, versions, list(report))
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return report
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict_outdated_reports(self):
+        """
+        Remove the reports whose repositories were modified since they were computed; the modifications done by undo
+        and redo are seen too, since they go through the repositories
+        """
+        outdated_keys = [key for key, (repositories, versions, report) in self._entries.items()
+                         if self._versions_of(repositories) != versions]
+        for key in outdated_keys:
+            del self._entries[key]
+
+    @staticmethod
+    def _versions_of(repositories):
+        return tuple(repository.get_version() for repository in repositories)
@@ -0,0 +1,124 @@
+from datetime import date
+
+from src.domain.grade import Grade
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# integer values below this limit are grouped with arrays indexed by the value instead of being sorted
+DENSE_VALUES_LIMIT = 1 << 24
+
+
+class StatisticsEngineException(Exception):
+    pass
+
+
+class StatisticsEngine:
+    def __init__(self, grade_repository, student_repository, assignment_repository):
+        """
+        Initialize the statistics engine, which computes the reports of the grade service with numpy: the grade
+        columns are pulled into arrays once per report and processed without a Python call per grade
+        :param grade_repository: a GradeRepository object used to get the grade columns
+        :param student_repository: a StudentRepository object used to get the students
+        :param assignment_repository: a AssignmentRepository object used to get the deadlines
+        :except StatisticsEngineException, if numpy is not installed
+        """
+        if numpy is None:
+            raise StatisticsEngineException("The statistics engine needs numpy, which is not installed")
+        self._grade_repository = grade_repository
+        self._students_repository = student_repository
+        self._assignment_repository = assignment_repository
+
+    def _get_grade_arrays(self):
+        assignment_ids, student_ids, grade_values = self._grade_repository.get_grade_columns()
+        return (numpy.asarray(assignment_ids, dtype=numpy.int64), numpy.asarray(student_ids, dtype=numpy.int64),
+                numpy.asarray(grade_values, dtype=numpy.int64))
+
+    @staticmethod
+    def _in_order_of_first_appearance(values):
+        """
+        Get the distinct values of an array
+        :param values: a numpy array of integers
+        :return: a tuple (distinct values, for every element the position of its value among the distinct values),
+                 the distinct values being in the order of their first appearance
+        """
+        if len(values) != 0 and values.min() >= 0 and values.max() < DENSE_VALUES_LIMIT:
+            # small non-negative values (the usual ids) are grouped by using them directly as positions, which
+            # avoids sorting all the elements
+            group_values = numpy.arange(values.max() + 1)
+            first_positions = numpy.full(len(group_values), len(values), dtype=numpy.int64)
+            numpy.minimum.at(first_positions, values, numpy.arange(len(values)))
+            groups = values
+        else:
+            group_values, first_positions, groups = numpy.unique(values, return_index=True, return_inverse=True)
+            groups = groups.reshape(-1)
+        present_groups = numpy.flatnonzero(first_positions < len(values))
+        present_groups = present_groups[numpy.argsort(first_positions[present_groups], kind="stable")]
+        rank = numpy.empty(len(first_positions), dtype=numpy.int64)
+        rank[present_groups] = numpy.arange(len(present_groups))
+        return group_values[present_groups], rank[groups]
+
+    def get_grades_of_assignment_sorted_descending(self, assignment_id, limit=None, min_grade=None):
+        """
+        Get the grades given for an assignment, sorted descending by grade value
+        :param assignment_id: a integer which represents the id of the assignment
+        :param limit: a non-negative integer, the maximum number of grades to return, or None for no limit
+        :param min_grade: a integer, only the grades with at least this value are returned, or None
+        :return: a list of grade objects, the ungraded ones are at the end of the list
+        """
+        assignment_ids, student_ids, grade_values = self._get_grade_arrays()
+        selected = assignment_ids == assignment_id
+        if min_grade is not None:
+            selected &= grade_values >= max(min_grade, 1)
+        rows = numpy.flatnonzero(selected)
+        # an ungraded grade has the value 0, so a stable sort by the negated value keeps the graded grades of equal
+        # value, and then the ungraded ones, in their original order
+        rows = rows[numpy.argsort(-grade_values[rows], kind="stable")][:limit]
+        return [Grade(assignment_id, student_id, grade_value or None)
+                for student_id, grade_value in zip(student_ids[rows].tolist(), grade_values[rows].tolist())]
+
+    def get_students_sorted_descending_by_average_grade(self, limit=None, min_average=None):
+        """
+        Get the average grade of every student who has at least one graded assignment
+        :param limit: a non-negative integer, the maximum number of students to return, or None for no limit
+        :param min_average: a number, only the students with at least this average are returned, or None
+        :return: a list of tuples (student_id, average_grade), sorted descending by average grade; students with the
+                 same average keep the order in which they received their first graded assignment
+        """
+        assignment_ids, student_ids, grade_values = self._get_grade_arrays()
+        graded = grade_values != 0
+        students, student_positions = self._in_order_of_first_appearance(student_ids[graded])
+        # the sums of small integers are exact in float64, so the averages equal the ones computed in Python
+        sums = numpy.bincount(student_positions, weights=grade_values[graded], minlength=len(students))
+        counts = numpy.bincount(student_positions, minlength=len(students))
+        averages = sums / counts
+        order = numpy.argsort(-averages, kind="stable")
+        if min_average is not None:
+            order = order[averages[order] >= min_average]
+        order = order[:limit]
+        return list(zip(students[order].tolist(), averages[order].tolist()))
+
+    def get_students_late_in_handing_in_at_least_one_assignment(self):
+        """
+        Get the students who have an ungraded assignment for which the deadline has passed
+        :return: a list of student objects, in the order of their first late assignment among the ungraded grades
+        """
+        assignment_ids, student_ids = (numpy.asarray(column, dtype=numpy.int64)
+                                       for column in self._grade_repository.get_ungraded_grade_columns())
+        assignments = list(self._assignment_repository.get_assignment_data())
+        deadline_assignment_ids = numpy.array([assignment.assigment_id for assignment in assignments],
+                                              dtype=numpy.int64)
+        deadlines = numpy.array([assignment.deadline.toordinal() for assignment in assignments], dtype=numpy.int64)
+        if len(assignment_ids) == 0 or len(deadline_assignment_ids) == 0:
+            return []
+        # join every ungraded grade with the deadline of its assignment
+        by_assignment_id = numpy.argsort(deadline_assignment_ids)
+        positions = numpy.searchsorted(deadline_assignment_ids, assignment_ids, sorter=by_assignment_id)
+        positions = by_assignment_id[numpy.minimum(positions, len(by_assignment_id) - 1)]
+        has_deadline = deadline_assignment_ids[positions] == assignment_ids
+        late = has_deadline & (deadlines[positions] < date.today().toordinal())
+        late_students = self._in_order_of_first_appearance(student_ids[late])[0].tolist()
+        student_data = self._students_repository.get_student_data()
+        return [student_data[student_id] for student_id in late_students if student_id in student_data]
@@ -1,6 +1,10 @@
 from src.domain.student import Student
 from random import randint
 from src.domain.undo_redo import *
+from src.repository.student_repository import StudentRepositoryException
+from src.services.bulk_import import CHUNK_SIZE, import_records, read_text
+from src.services.undo_record_interpreter import UndoRecordInterpreter
+from array import array
 
 STUDENT_NAMES = ['Turcu', 'Oprea', 'Moldovan', 'Pop', 'Rus', 'Albu', 'Petrovan', 'Jordan', 'Tapoi', 'Mircea',
                  'Andrei', 'Bargaoanu', 'Vidican', 'Forogau', 'Campan', 'Micu', 'Muresan', 'Grigore', 'Iancu', 'Hagi']
@@ -14,6 +18,7 @@ class StudentService:
         """
         self._student_repository = student_repository
         self._undo_redo_service = undo_redo_service
+        self._undo_record_interpreter = UndoRecordInterpreter(student_repository=student_repository)
 
     def generate_students(self):
         """
@@ -35,10 +40,42 @@ class StudentService:
         :param name: string, which represents the student's name
         :param group: integer, which indicates the group where the student belongs to
         """
-        self._student_repository.add_student(Student(student_id, name, group))
-        undo_call = Call(self._student_repository.remove_student, student_id)
-        redo_call = Call(self._student_repository.add_student, Student(student_id, name, group))
-        self._undo_redo_service.record_operation(Operation(undo_call, redo_call))
+        with self._student_repository.get_lock().write():
+            self._student_repository.add_student(Student(student_id, name, group))
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter, ADD_STUDENTS,
+                                                                (student_id,), after=((name,), (group,))))
+
+    def import_students(self, stream, chunk_size=CHUNK_SIZE):
+        """
+        Add the students of a CSV file (header: student_id,name,group) or of a NDJSON file; the file is read a chunk at
+        a time and the repository is saved once, at the end. The valid lines are imported even if other lines fail,
+        and the whole import is undone as a single operation
+        :param stream: a text file object, or any iterable of lines
+        :param chunk_size: a integer, the number of lines which are validated together
+        :return: a ImportReport object with the number of imported students and the errors of the other lines
+        """
+        # the imported students are kept for undo and redo as columns, not as student objects
+        imported_ids = array("q")
+        imported_names = []
+        imported_groups = array("i")
+
+        def parse_student(values):
+            student_id, name, group = values
+            return Student(int(student_id), read_text("name", name), int(group))
+
+        def add_student(student):
+            self._student_repository.add_student(student)
+            imported_ids.append(student.student_id)
+            imported_names.append(student.name)
+            imported_groups.append(student.group)
+
+        with self._student_repository.batch():
+            report = import_records(stream, ("student_id", "name", "group"), parse_student, add_student,
+                                    StudentRepositoryException, chunk_size)
+        if report.imported != 0:
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter, ADD_STUDENTS,
+                                                                imported_ids, after=(imported_names, imported_groups)))
+        return report
 
     def remove_student(self, student_id):
         """
@@ -53,12 +90,12 @@ class StudentService:
         :param student_id: a integer which indicates the id of the student to update
         :param new_name: a string which will replace the actual name of the student
         """
-        self.check_valid_student(student_id)
-        actual_name = self._student_repository.get_student_data()[student_id].name
-        undo_call = Call(self._student_repository.update_student_name, student_id, actual_name)
-        redo_call = Call(self._student_repository.update_student_name, student_id, new_name)
-        self._undo_redo_service.record_operation(Operation(undo_call, redo_call))
-        self._student_repository.update_student_name(student_id, new_name)
+        with self._student_repository.get_lock().write():
+            self.check_valid_student(student_id)
+            actual_name = self._student_repository.get_student_data()[student_id].name
+            self._student_repository.update_student_name(student_id, new_name)
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter, UPDATE_STUDENT_NAME,
+                                                                student_id, actual_name, new_name))
 
     def update_student_group(self, student_id, new_group):
         """
@@ -66,12 +103,12 @@ class StudentService:
         :param student_id: a integer which represents the id of the student to update
         :param new_group: a integer which repesents the new group number of the student
         """
-        self.check_valid_student(student_id)
-        actual_group = self._student_repository.get_student_data()[student_id].group
-        undo_call = Call(self._student_repository.update_student_group, student_id, actual_group)
-        redo_call = Call(self._student_repository.update_student_group, student_id, new_group)
-        self._undo_redo_service.record_operation(Operation(undo_call, redo_call))
-        self._student_repository.update_student_group(student_id, new_group)
+        with self._student_repository.get_lock().write():
+            self.check_valid_student(student_id)
+            actual_group = self._student_repository.get_student_data()[student_id].group
+            self._student_repository.update_student_group(student_id, new_group)
+            self._undo_redo_service.record_operation(UndoRecord(self._undo_record_interpreter, UPDATE_STUDENT_GROUP,
+                                                                student_id, actual_group, new_group))
 
     def check_valid_student(self, student_id):
         """
@@ -82,3 +119,33 @@ class StudentService:
 
     def get_students(self):
         return self._student_repository.get_student_data()
+
+    def list_students(self):
+        """
+        Get a copy of the students, taken while the repository is locked for reading, which can be iterated while
+        other threads modify the repository
+        :return: a list of student objects
+        """
+        with self._student_repository.get_lock().read():
+            return list(self._student_repository.get_student_data())
+
+    def get_students_in_group(self, group):
+        return self._student_repository.get_students_in_group(group)
+
+    def flush(self):
+        """
+        Write the pending modifications of the repository to its storage
+        """
+        self._student_repository.flush()
+
+    def batch(self):
+        """
+        Group the modifications done inside a with block, so the repository persists them together when it ends
+        """
+        return self._student_repository.batch()
+
+    def check_persistence_errors(self):
+        """
+        Report the errors which happened while the repository was saved in background
+        """
+        self._student_repository.check_persistence_errors()
@@ -1,3 +1,8 @@
+import io
+import json
+import os
+import tempfile
+import threading
 import unittest
 
 from src.repository.assigment_repository import *
@@ -10,11 +15,20 @@ from datetime import date
 from src.repository.assigment_repository import AssignmentRepository
 from src.repository.grade_repository import GradeRepository
 from src.repository.student_repository import StudentRepository
-from src.repository.undo_redo_repository import UndoRedoRepository
+from src.repository.sqlite_database import SqliteDatabase
+from src.repository.undo_redo_repository import UndoRedoRepository, UndoRedoFileRepository
 from src.services.assignment_service import AssignmentService
+from src.services.bulk_import import ImportReport
 from src.services.grade_service import GradeService
+from src.services.report_export import ReportExportException
+from src.services.statistics_cache import StatisticsCache
+from src.services.statistics_engine import StatisticsEngine, numpy
 from src.services.student_service import StudentService
+from src.services.undo_record_interpreter import UndoRecordInterpreter
 from src.services.undo_redo_service import UndoRedoService, UndoRedoServiceException
+from src.ui.batch_ui import BatchUI
+from src.services.transaction_service import TransactionService
+from src.domain.undo_redo import UndoRecord, ComplexOperation
 
 
 class assignment_tests(unittest.TestCase):
@@ -144,6 +158,15 @@ class grade_tests(unittest.TestCase):
         self._grade_service.add_grade(1, 3002)
         self.assertEqual(self._grade_service.get_grades()[1, 3002], Grade(1, 3002))
 
+    def test_grade_student__given_assignment__grade_it(self):
+        self._grade_service.add_grade(1, 3002)
+        self._grade_service.grade_student(1, 3002, 8)
+        self.assertEqual(self._grade_service.get_grades()[1, 3002], Grade(1, 3002, 8))
+
+    def test_grade_student__assignment_not_given__raise_repository_exception(self):
+        with self.assertRaises(GradeRepositoryException):
+            self._grade_service.grade_student(1, 3002, 8)
+
     def test_add_grade__invalid_grade__raise_value_error(self):
         with self.assertRaises(ValueError):
             self._grade_service.add_grade(1, 3002, 'jeah')
@@ -249,22 +272,749 @@ class grade_tests(unittest.TestCase):
             self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(),
             [(3002, 7.0), (3001, 6.0), (3003, 5.0)])
 
+    def test_get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments__limit_and_min_average__return_the_best_students(
+            self):
+        for student_id, grade_value in [(3001, 6), (3002, 9), (3003, 4), (3004, 9), (3005, 7)]:
+            self._grade_service.add_grade(2, student_id, grade_value)
+        self.assertEqual(
+            self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(
+                limit=2),
+            [(3002, 9.0), (3004, 9.0)])
+        self.assertEqual(
+            self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(
+                min_average=6),
+            [(3002, 9.0), (3004, 9.0), (3005, 7.0), (3001, 6.0)])
+
+    def test_get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment__limit_and_min_grade__return_the_best_grades(
+            self):
+        for student_id, grade_value in [(3001, 6), (3002, None), (3003, 8), (3004, 6), (3005, 10)]:
+            self._grade_service.add_grade(3, student_id, grade_value)
+        self.assertEqual(
+            self._grade_service.get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(3, limit=3),
+            [Grade(3, 3005, 10), Grade(3, 3003, 8), Grade(3, 3001, 6)])
+        self.assertEqual(
+            self._grade_service.get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(
+                3, min_grade=7),
+            [Grade(3, 3005, 10), Grade(3, 3003, 8)])
+        self.assertEqual(
+            self._grade_service.get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(3, limit=9),
+            [Grade(3, 3005, 10), Grade(3, 3003, 8), Grade(3, 3001, 6), Grade(3, 3004, 6), Grade(3, 3002, None)])
+
     def test_gemerate_grades__valid_method_call__add_grades_to_repository(self):
         self._grade_service.generate_grades()
         self.assertNotEqual(len(self._grade_service.get_grades()), 0)
 
 
-class test_undo_redo_service(unittest.TestCase):
+@unittest.skipIf(numpy is None, "the statistics engine needs numpy")
+class statistics_engine_tests(unittest.TestCase):
     def setUp(self) -> None:
-        undo_redo_repository = UndoRedoRepository()
         student_repository = StudentRepository()
         assignment_repository = AssignmentRepository()
         grade_repository = GradeRepository()
-        self._undo_redo_service = UndoRedoService(undo_redo_repository)
+        for student_id in range(3000, 3006):
+            student_repository.add_student(Student(student_id, 'name', 911 + student_id % 2))
+        assignment_repository.add_assignment(Assignment(1, 'past', date(2020, 1, 1)))
+        assignment_repository.add_assignment(Assignment(2, 'future', date(2999, 1, 1)))
+        assignment_repository.add_assignment(Assignment(3, 'past', date(2021, 5, 5)))
+        for assignment_id, student_id, grade_value in [(2, 3004, None), (1, 3003, 7), (3, 3005, None),
+                                                       (1, 3001, 9), (1, 3002, None), (1, 3000, 7), (3, 3000, 9),
+                                                       (2, 3001, 5), (1, 3005, None), (3, 3002, 4), (2, 3003, 8)]:
+            grade_repository.add_grade(Grade(assignment_id, student_id, grade_value))
+        grade_repository.grade_student_for_a_given_assignment(Grade(1, 3003, None))
+        self._grade_service = GradeService(grade_repository, student_repository, assignment_repository,
+                                           UndoRedoService(UndoRedoRepository()))
+        self._vectorized_grade_service = GradeService(grade_repository, student_repository, assignment_repository,
+                                                      UndoRedoService(UndoRedoRepository()),
+                                                      StatisticsEngine(grade_repository, student_repository,
+                                                                       assignment_repository))
+
+    def test_get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment__valid_assignment__same_as_grade_service(self):
+        for assignment_id in (1, 2, 3):
+            self.assertEqual(self._vectorized_grade_service.
+                             get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(assignment_id),
+                             self._grade_service.
+                             get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(assignment_id))
+
+    def test_get_list_of_all_students_who_are_late_in_handing_in_at_least_one_assignment__valid_call__same_as_grade_service(self):
+        self.assertEqual(
+            self._vectorized_grade_service.get_list_of_all_students_who_are_late_in_handing_in_at_least_one_assignment(),
+            self._grade_service.get_list_of_all_students_who_are_late_in_handing_in_at_least_one_assignment())
+
+    def test_get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment__limit_and_min_grade__same_as_grade_service(self):
+        for limit, min_grade in [(0, None), (2, None), (None, 8), (1, 7)]:
+            self.assertEqual(self._vectorized_grade_service.
+                             get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(1, limit,
+                                                                                                          min_grade),
+                             self._grade_service.
+                             get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(1, limit,
+                                                                                                          min_grade))
+
+    def test_get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments__limit_and_min_average__same_as_grade_service(self):
+        for limit, min_average in [(0, None), (2, None), (None, 7), (1, 6.5)]:
+            self.assertEqual(self._vectorized_grade_service.
+                             get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(
+                                 limit, min_average),
+                             self._grade_service.
+                             get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(
+                                 limit, min_average))
+
+    def test_get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments__valid_call__same_as_grade_service(self):
+        self.assertEqual(self._vectorized_grade_service.
+                         get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(),
+                         self._grade_service.
+                         get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments())
+
+
+class domain_tests(unittest.TestCase):
+    def test_eq__same_fields__equal_objects_with_equal_hashes(self):
+        self.assertEqual(Grade(1, 3000, 7), Grade(1, 3000, 7))
+        self.assertNotEqual(Grade(1, 3000, 7), Grade(1, 3000))
+        self.assertEqual(len({Student(3000, 'Pop', 912), Student(3000, 'Pop', 912)}), 1)
+        self.assertEqual(hash(Assignment(1, 'a', date(2021, 1, 1))), hash(Assignment(1, 'a', date(2021, 1, 1))))
+        self.assertNotEqual(Student(3000, 'Pop', 912), "3000: Pop, Group: 912")
+
+    def test_init__invalid_grade_or_group__raise_value_error(self):
+        for invalid_grade in (0, 11, '7', 7.5):
+            with self.assertRaises(ValueError):
+                Grade(1, 3000, invalid_grade)
+        for invalid_group in (910, 918, '912'):
+            with self.assertRaises(ValueError):
+                Student(3000, 'Pop', invalid_group)
+
+    def test_init__whole_float_grade_or_group__store_an_integer(self):
+        self.assertIs(type(Grade(1, 3000, 7.0).grade_value), int)
+        self.assertEqual(Grade(1, 3000, 7.0), Grade(1, 3000, 7))
+        self.assertIs(type(Student(3000, 'Pop', 911.0).group), int)
+        for invalid_grade in (True, 7.5, float("nan"), float("inf")):
+            with self.assertRaises(ValueError):
+                Grade(1, 3000, invalid_grade)
+
+    def test_init__any_object__no_per_object_dictionary(self):
+        with self.assertRaises(AttributeError):
+            Grade(1, 3000).some_attribute = 1
+
+
+class statistics_cache_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._undo_redo_service = UndoRedoService(UndoRedoRepository())
+        self._student_repository = StudentRepository()
+        self._assignment_repository = AssignmentRepository()
+        self._grade_repository = GradeRepository()
+        self._student_service = StudentService(self._student_repository, self._undo_redo_service)
+        self._statistics_cache = StatisticsCache(max_entries=2)
+        self._grade_service = GradeService(self._grade_repository, self._student_repository,
+                                           self._assignment_repository, self._undo_redo_service,
+                                           statistics_cache=self._statistics_cache)
+        self._grade_service.add_grade(1, 3000, 8)
+        self._grade_service.add_grade(1, 3001, 6)
+        self._computed_reports = 0
+        compute_ranking = self._grade_repository.get_students_sorted_descending_by_average_grade
+
+        def count_computed_reports(*arguments):
+            self._computed_reports += 1
+            return compute_ranking(*arguments)
+
+        self._grade_repository.get_students_sorted_descending_by_average_grade = count_computed_reports
+
+    def tearDown(self) -> None:
+        pass
+
+    def test_get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments__no_modification__compute_the_report_once(self):
+        for counter in range(3):
+            self.assertEqual(
+                self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(),
+                [(3000, 8.0), (3001, 6.0)])
+        self.assertEqual(self._computed_reports, 1)
+
+    def test_get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments__student_modification__keep_the_report(self):
+        self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments()
+        self._student_service.add_student(3005, 'yeah', 914)
+        self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments()
+        self.assertEqual(self._computed_reports, 1)
+
+    def test_undo__grade_added_after_the_report__compute_the_report_again(self):
+        self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments()
+        self._grade_service.add_grade(2, 3001, 10)
+        self.assertEqual(
+            self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(),
+            [(3000, 8.0), (3001, 8.0)])
+        self._undo_redo_service.undo()
+        self.assertEqual(
+            self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(),
+            [(3000, 8.0), (3001, 6.0)])
+        self.assertEqual(self._computed_reports, 3)
+
+    def test_get_report__more_reports_than_the_limit__evict_the_least_recently_used(self):
+        self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments()
+        self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(limit=1)
+        self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments()
+        self._grade_service.get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(1)
+        self.assertEqual(len(self._statistics_cache), 2)
+        self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments()
+        self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(limit=1)
+        self.assertEqual(self._computed_reports, 3)
+
+
+class import_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._undo_redo_service = UndoRedoService(UndoRedoRepository())
+        student_repository = StudentRepository()
+        assignment_repository = AssignmentRepository()
+        self._student_service = StudentService(student_repository, self._undo_redo_service)
+        self._assignment_service = AssignmentService(assignment_repository, self._undo_redo_service)
+        self._grade_service = GradeService(GradeRepository(), student_repository, assignment_repository,
+                                           self._undo_redo_service)
+
+    def test_import_students__csv_file__add_valid_lines_and_report_the_others(self):
+        report = self._student_service.import_students(io.StringIO(
+            "student_id,name,group\n1,Pop,911\n2,Rus,999\nx,Albu,912\n1,Micu,913\n\n3,Hagi,917\n"))
+        self.assertEqual(report.imported, 2)
+        self.assertEqual([line_number for line_number, message in report.errors], [3, 4, 5])
+        self.assertEqual(self._student_service.get_students()[3], Student(3, "Hagi", 917))
+
+    def test_import_students__small_chunks__same_result(self):
+        lines = ["student_id,name,group\n"] + [str(student_id) + ",Pop,911\n" for student_id in range(10)]
+        report = self._student_service.import_students(iter(lines), chunk_size=3)
+        self.assertEqual(report.imported, 10)
+        self.assertEqual(len(self._student_service.get_students()), 10)
+
+    def test_import_students__missing_column__report_header(self):
+        report = self._student_service.import_students(io.StringIO("student_id,name\n1,Pop\n"))
+        self.assertEqual(report.imported, 0)
+        self.assertEqual(report.errors, [(1, "Missing columns: group")])
+
+    def test_import_students__ndjson_null_name__report_the_line(self):
+        report = self._student_service.import_students(io.StringIO(
+            '{"student_id": 1, "name": null, "group": 911}\n{"student_id": 2, "name": "Pop", "group": 911}\n'))
+        self.assertEqual(report.imported, 1)
+        self.assertEqual(report.errors, [(1, "Field name must be a string")])
+        self.assertNotIn(1, self._student_service.get_students())
+
+    def test_import_assignments__ndjson_file__add_valid_lines_and_report_the_others(self):
+        report = self._assignment_service.import_assignments(io.StringIO(
+            '{"assignment_id": 1, "description": "a", "deadline": "2021-10-10"}\n'
+            '{"assignment_id": 2, "description": "b"}\n'
+            'not json\n'
+            '{"assignment_id": 3, "description": "c", "deadline": "2021-13-10"}\n'))
+        self.assertEqual(report.imported, 1)
+        self.assertEqual([line_number for line_number, message in report.errors], [2, 3, 4])
+        self.assertEqual(self._assignment_service.get_assignments()[1].deadline, date(2021, 10, 10))
+
+    def test_import_grades__unknown_ids__report_them(self):
+        self._student_service.add_student(1, "Pop", 911)
+        self._assignment_service.add_assignment(1, "a", date(2021, 10, 10))
+        report = self._grade_service.import_grades(io.StringIO(
+            "assignment_id,student_id,grade_value\n1,1,9\n2,1,\n1,2,\n1,1,\n"))
+        self.assertEqual(report.imported, 1)
+        self.assertEqual([line_number for line_number, message in report.errors], [3, 4, 5])
+        self.assertEqual(self._grade_service.get_graded_assignments(), [Grade(1, 1, 9)])
+
+    def test_import__undo_and_redo__whole_import_at_once(self):
+        self._student_service.import_students(io.StringIO("student_id,name,group\n1,Pop,911\n2,Rus,912\n"))
+        self._assignment_service.add_assignment(1, "a", date(2021, 10, 10))
+        self._grade_service.import_grades(io.StringIO("assignment_id,student_id,grade_value\n1,1,9\n1,2,\n"))
+        self._undo_redo_service.undo()
+        self.assertEqual(len(self._grade_service.get_grades()), 0)
+        self._undo_redo_service.redo()
+        self.assertEqual(self._grade_service.get_ungraded_assignments(), [Grade(1, 2)])
+        self._undo_redo_service.undo()
+        self._undo_redo_service.undo()
+        self._undo_redo_service.undo()
+        self.assertEqual(len(self._student_service.get_students()), 0)
+
+    def test_import_report__many_errors__keep_only_the_first_ones(self):
+        report = ImportReport(max_errors=2)
+        for line_number in range(5):
+            report.add_error(line_number, "error")
+        self.assertEqual(report.failed, 5)
+        self.assertEqual(len(report.errors), 2)
+
+
+class report_export_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        undo_redo_service = UndoRedoService(UndoRedoRepository())
+        student_repository = StudentRepository()
+        assignment_repository = AssignmentRepository()
+        self._grade_service = GradeService(GradeRepository(), student_repository, assignment_repository,
+                                           undo_redo_service)
+        StudentService(student_repository, undo_redo_service).add_student(1, "Pop", 911)
+        StudentService(student_repository, undo_redo_service).add_student(2, "Rus", 912)
+        AssignmentService(assignment_repository, undo_redo_service).add_assignment(1, "a, b", date(2021, 10, 10))
+        self._grade_service.add_grade(1, 1, 7)
+        self._grade_service.add_grade(1, 2)
+
+    def test_iterate_grades_report__grades__joined_rows(self):
+        self.assertEqual(list(self._grade_service.iterate_grades_report()),
+                         [(1, "a, b", 1, "Pop", 911, 7), (1, "a, b", 2, "Rus", 912, None)])
+
+    def test_export_report__csv__header_and_quoted_rows(self):
+        output = io.StringIO()
+        row_count = self._grade_service.export_report("grades", output, "csv")
+        self.assertEqual(row_count, 2)
+        self.assertEqual(output.getvalue(), "assignment_id,description,student_id,name,group,grade_value\n"
+                                            "1,\"a, b\",1,Pop,911,7\n1,\"a, b\",2,Rus,912,\n")
+
+    def test_export_report__json__array_of_objects(self):
+        output = io.StringIO()
+        self._grade_service.export_report("average ranking", output, "json", min_average=5)
+        self.assertEqual(json.loads(output.getvalue()),
+                         [{"student_id": 1, "name": "Pop", "group": 911, "average_grade": 7.0}])
+
+    def test_export_report__no_rows__empty_array(self):
+        output = io.StringIO()
+        self.assertEqual(self._grade_service.export_report("assignment ranking", output, "json", assignment_id=1,
+                                                           min_grade=10), 0)
+        self.assertEqual(json.loads(output.getvalue()), [])
+
+    def test_export_report__failing_report__nothing_written(self):
+        output = io.StringIO()
+        with self.assertRaises(GradeRepositoryException):
+            self._grade_service.export_report("assignment ranking", output, "json", assignment_id=5)
+        self.assertEqual(output.getvalue(), "")
+
+    def test_export_report__unknown_format__raise_report_export_exception(self):
+        with self.assertRaises(ReportExportException):
+            self._grade_service.export_report("grades", io.StringIO(), "xml")
+
+
+class batch_ui_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self._students_file = os.path.join(self._directory.name, "students.txt")
+        open(self._students_file, "wt").close()
+        self._undo_redo_service = UndoRedoService(UndoRedoRepository())
+        student_repository = StudentFileTextRepository(self._students_file)
+        assignment_repository = AssignmentRepository()
+        grade_repository = GradeRepository()
+        self._student_service = StudentService(student_repository, self._undo_redo_service)
+        self._assignment_service = AssignmentService(assignment_repository, self._undo_redo_service)
+        self._grade_service = GradeService(grade_repository, student_repository, assignment_repository,
+                                           self._undo_redo_service)
+        self._output = io.StringIO()
+        transaction_service = TransactionService(student_repository, assignment_repository, grade_repository,
+                                                 self._undo_redo_service)
+        self._batch_ui = BatchUI(self._student_service, self._assignment_service, self._grade_service,
+                                 self._undo_redo_service, transaction_service, self._output)
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_run__script__run_every_command(self):
+        failed_commands = self._batch_ui.run(io.StringIO(
+            "# end of term\n"
+            "add_student 1 Pop 911\n"
+            "add_assignment 1 \"Build a game\" 2021-10-10\n"
+            "\n"
+            "give 1 1\n"
+            "grade 1 1 9\n"
+            "report csv ranking 1\n"))
+        self.assertEqual(failed_commands, 0)
+        self.assertEqual(self._assignment_service.get_assignments()[1].description, "Build a game")
+        self.assertEqual(self._grade_service.get_graded_assignments(), [Grade(1, 1, 9)])
+        self.assertIn("student_id,name,group,grade_value\n1,Pop,911,9\n", self._output.getvalue())
+        self.assertIn("line 6: grade ok", self._output.getvalue())
+
+    def test_run__failing_commands__report_them_and_go_on(self):
+        failed_commands = self._batch_ui.run(["remove_student 5\n", "fly\n", "add_student 1\n",
+                                              "add_student 2 Rus 912\n"])
+        self.assertEqual(failed_commands, 3)
+        self.assertIn("line 2: fly error: Unknown command: fly", self._output.getvalue())
+        self.assertEqual(len(self._student_service.get_students()), 1)
+
+    def test_run__checkpoint__save_the_modifications_done_so_far(self):
+        saved_students = []
+
+        def script():
+            yield "add_student 1 Pop 911\n"
+            yield "checkpoint\n"
+            saved_students.append(open(self._students_file, "rt").read())
+            yield "add_student 2 Rus 912\n"
+            saved_students.append(open(self._students_file, "rt").read())
+
+        self._batch_ui.run(script())
+        self.assertEqual(saved_students, ["1/Pop/911\n", "1/Pop/911\n"])
+        self.assertEqual(open(self._students_file, "rt").read(), "1/Pop/911\n2/Rus/912\n")
+
+    def test_run__undo__undo_the_last_command(self):
+        self._batch_ui.run(["add_student 1 Pop 911\n", "add_student 2 Rus 912\n", "undo\n"])
+        self.assertEqual(len(self._student_service.get_students()), 1)
+
+    def test_run__interrupted_sqlite_script__roll_back_the_undo_history_with_the_data(self):
+        database = SqliteDatabase(os.path.join(self._directory.name, "data.db"))
+        student_repository = StudentSqliteRepository(database)
+        assignment_repository = AssignmentSqliteRepository(database)
+        grade_repository = GradeSqliteRepository(database)
+        undo_file_name = os.path.join(self._directory.name, "undo.journal")
+        interpreter = UndoRecordInterpreter(student_repository, assignment_repository, grade_repository)
+        undo_redo_repository = UndoRedoFileRepository(undo_file_name, interpreter)
+        undo_redo_service = UndoRedoService(undo_redo_repository,
+                                            (student_repository, assignment_repository, grade_repository))
+        student_service = StudentService(student_repository, undo_redo_service)
+        assignment_service = AssignmentService(assignment_repository, undo_redo_service)
+        grade_service = GradeService(grade_repository, student_repository, assignment_repository, undo_redo_service)
+        batch_ui = BatchUI(student_service, assignment_service, grade_service, undo_redo_service,
+                           TransactionService(student_repository, assignment_repository, grade_repository,
+                                              undo_redo_service), self._output)
+
+        def script():
+            yield "add_student 1 Pop 911\n"
+            yield "add_student 2 Rus 912\n"
+            yield "checkpoint\n"
+            yield "add_student 3 Ion 913\n"
+            yield "undo\n"
+            yield "undo\n"
+            raise KeyboardInterrupt()
+
+        with self.assertRaises(KeyboardInterrupt):
+            batch_ui.run(script())
+        self.assertEqual(sorted(student_service.get_students().keys()), [1, 2])
+        self.assertEqual(undo_redo_repository.get_index_in_modification_history(), 1)
+        undo_redo_repository.close()
+        undo_redo_repository = UndoRedoFileRepository(undo_file_name, interpreter)
+        self.assertEqual(len(undo_redo_repository.get_modifications_history()), 2)
+        self.assertEqual(undo_redo_repository.get_index_in_modification_history(), 1)
+        undo_redo_repository.close()
+        database.close()
+
+
+class undo_record_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._undo_redo_repository = UndoRedoRepository()
+        self._undo_redo_service = UndoRedoService(self._undo_redo_repository)
+        self._grade_repository = GradeRepository()
+        student_repository = StudentRepository()
+        assignment_repository = AssignmentRepository()
+        self._student_service = StudentService(student_repository, self._undo_redo_service)
         self._assignment_service = AssignmentService(assignment_repository, self._undo_redo_service)
+        self._grade_service = GradeService(self._grade_repository, student_repository, assignment_repository,
+                                           self._undo_redo_service)
+        for student_id in range(5):
+            self._student_service.add_student(student_id, "Pop", 911)
+        for assignment_id in range(3):
+            self._assignment_service.add_assignment(assignment_id, "a", date(2021, 10, 10))
+
+    def test_give_assignment_to_a_group_of_students__undo_redo__single_record(self):
+        history_length = len(self._undo_redo_repository.get_modifications_history())
+        self._grade_service.give_assignment_to_a_group_of_students(1, 911)
+        self.assertEqual(len(self._undo_redo_repository.get_modifications_history()), history_length + 1)
+        self.assertIsInstance(self._undo_redo_repository.get_modifications_history()[-1], UndoRecord)
+        self._undo_redo_service.undo()
+        self.assertEqual(len(self._grade_service.get_grades()), 0)
+        self._undo_redo_service.redo()
+        self.assertEqual(len(self._grade_service.get_ungraded_assignments()), 5)
+
+    def test_remove_student__undo_redo__restore_grades_and_remove_them_with_one_call(self):
+        for assignment_id in range(3):
+            self._grade_service.add_grade(assignment_id, 2, assignment_id + 5)
+        self._grade_service.add_grade(0, 3)
+        self._grade_service.remove_grades(2, 1)
+        self._student_service.remove_student(2)
+        self._undo_redo_service.undo()
+        self.assertEqual(self._student_service.get_students()[2], Student(2, "Pop", 911))
+        self.assertEqual(sorted(self._grade_repository.get_grades_of_student(2), key=lambda grade: grade.assignment_id),
+                         [Grade(0, 2, 5), Grade(1, 2, 6), Grade(2, 2, 7)])
+        removals = []
+        remove_grades = self._grade_repository.remove_grades
+        self._grade_repository.remove_grades = lambda *arguments: removals.append(arguments) or \
+            remove_grades(*arguments)
+        self._undo_redo_service.redo()
+        self.assertEqual(removals, [(2, 1)])
+        self.assertNotIn(2, self._student_service.get_students())
+        self.assertEqual(len(self._grade_service.get_grades()), 1)
+
+    def test_remove_assignment__undo__restore_assignment_and_grades(self):
+        self._grade_service.add_grade(1, 0, 9)
+        self._grade_service.add_grade(1, 1)
+        self._grade_service.remove_grades(1, 0)
+        self._assignment_service.remove_assignment(1)
+        self._undo_redo_service.undo()
+        self.assertEqual(self._assignment_service.get_assignments()[1], Assignment(1, "a", date(2021, 10, 10)))
+        self.assertEqual(self._grade_service.get_grades()[1, 0], Grade(1, 0, 9))
+        self.assertEqual(self._grade_service.get_grades()[1, 1], Grade(1, 1))
+
+    def test_grade_student__regrade_and_undo__restore_previous_value(self):
+        self._grade_service.add_grade(1, 0, 4)
+        self._grade_service.grade_student(1, 0, 9)
+        self._undo_redo_service.undo()
+        self.assertEqual(self._grade_service.get_grades()[1, 0], Grade(1, 0, 4))
+        self._undo_redo_service.redo()
+        self.assertEqual(self._grade_service.get_grades()[1, 0], Grade(1, 0, 9))
+
+    def test_update_assignment_deadline__undo_redo__deadline_kept_as_ordinal_day(self):
+        self._assignment_service.update_assignment_deadline(1, date(2021, 12, 1))
+        record = self._undo_redo_repository.get_modifications_history()[-1]
+        self.assertEqual((record.before, record.after), (date(2021, 10, 10).toordinal(), date(2021, 12, 1).toordinal()))
+        self._undo_redo_service.undo()
+        self.assertEqual(self._assignment_service.get_assignments()[1].deadline, date(2021, 10, 10))
+        self._undo_redo_service.redo()
+        self.assertEqual(self._assignment_service.get_assignments()[1].deadline, date(2021, 12, 1))
+
+    def test_update_student_group__invalid_group__nothing_recorded(self):
+        history_length = len(self._undo_redo_repository.get_modifications_history())
+        with self.assertRaises(ValueError):
+            self._student_service.update_student_group(1, 1000)
+        self.assertEqual(len(self._undo_redo_repository.get_modifications_history()), history_length)
+
+
+class transaction_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._undo_redo_repository = UndoRedoRepository()
+        self._undo_redo_service = UndoRedoService(self._undo_redo_repository)
+        student_repository = StudentRepository()
+        assignment_repository = AssignmentRepository()
+        grade_repository = GradeRepository()
         self._student_service = StudentService(student_repository, self._undo_redo_service)
+        self._assignment_service = AssignmentService(assignment_repository, self._undo_redo_service)
         self._grade_service = GradeService(grade_repository, student_repository, assignment_repository,
                                            self._undo_redo_service)
+        self._transaction_service = TransactionService(student_repository, assignment_repository, grade_repository,
+                                                       self._undo_redo_service)
+        self._student_service.add_student(1, "Pop", 911)
+        self._assignment_service.add_assignment(1, "a", date(2021, 10, 10))
+        self._grade_service.add_grade(1, 1, 9)
+
+    def test_transaction__several_modifications__record_one_complex_operation(self):
+        history_length = len(self._undo_redo_repository.get_modifications_history())
+        with self._transaction_service.transaction():
+            self._student_service.add_student(2, "Rus", 912)
+            self._grade_service.add_grade(1, 2, 7)
+            self._student_service.update_student_name(1, "Albu")
+        self.assertEqual(len(self._undo_redo_repository.get_modifications_history()), history_length + 1)
+        self.assertIsInstance(self._undo_redo_repository.get_modifications_history()[-1], ComplexOperation)
+        self._undo_redo_service.undo()
+        self.assertEqual(list(self._student_service.get_students()), [Student(1, "Pop", 911)])
+        self.assertEqual(len(self._grade_service.get_grades()), 1)
+        self._undo_redo_service.redo()
+        self.assertEqual(self._grade_service.get_grades()[1, 2], Grade(1, 2, 7))
+        self.assertEqual(self._student_service.get_students()[1].name, "Albu")
+
+    def test_transaction__failing_modification__undo_the_others_and_record_nothing(self):
+        history_length = len(self._undo_redo_repository.get_modifications_history())
+        with self.assertRaises(StudentRepositoryException):
+            with self._transaction_service.transaction():
+                self._student_service.add_student(2, "Rus", 912)
+                self._grade_service.add_grade(1, 2)
+                self._student_service.add_student(1, "Pop", 911)
+        self.assertEqual(len(self._undo_redo_repository.get_modifications_history()), history_length)
+        self.assertNotIn(2, self._student_service.get_students())
+        self.assertNotIn((1, 2), self._grade_service.get_grades())
+
+    def test_transaction__remove_student__undo_restores_student_and_grades(self):
+        with self._transaction_service.transaction():
+            self._grade_service.remove_grades(1, 1)
+            self._student_service.remove_student(1)
+        self._undo_redo_service.undo()
+        self.assertEqual(self._student_service.get_students()[1], Student(1, "Pop", 911))
+        self.assertEqual(self._grade_service.get_grades()[1, 1], Grade(1, 1, 9))
+
+    def test_transaction__file_repository__record_after_the_file_is_saved(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "students.txt")
+            with open(file_name, "wt"):
+                pass
+            student_repository = StudentFileTextRepository(file_name)
+            undo_redo_repository = UndoRedoRepository()
+            undo_redo_service = UndoRedoService(undo_redo_repository)
+            student_service = StudentService(student_repository, undo_redo_service)
+            transaction_service = TransactionService(student_repository, AssignmentRepository(), GradeRepository(),
+                                                     undo_redo_service)
+            saved_files = []
+            add_operation = undo_redo_repository.add_new_operation_to_modifications_history
+
+            def add_operation_after_reading_the_file(operation):
+                with open(file_name, "rt") as file:
+                    saved_files.append(file.read())
+                add_operation(operation)
+
+            undo_redo_repository.add_new_operation_to_modifications_history = add_operation_after_reading_the_file
+            with transaction_service.transaction():
+                student_service.add_student(1, "Pop", 911)
+                student_service.add_student(2, "Rus", 912)
+            self.assertEqual(saved_files, ["1/Pop/911\n2/Rus/912\n"])
+
+    def test_transaction__sqlite_repositories__commit_nothing_if_it_fails(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database_file = os.path.join(directory, "data.db")
+            database = SqliteDatabase(database_file)
+            student_repository = StudentSqliteRepository(database)
+            grade_repository = GradeSqliteRepository(database)
+            undo_redo_service = UndoRedoService(UndoRedoRepository())
+            student_service = StudentService(student_repository, undo_redo_service)
+            grade_service = GradeService(grade_repository, student_repository, None, undo_redo_service)
+            transaction_service = TransactionService(student_repository, AssignmentSqliteRepository(database),
+                                                     grade_repository, undo_redo_service)
+            student_service.add_student(1, "Pop", 911)
+            grade_service.add_grade(1, 1, 9)
+            with self.assertRaises(KeyboardInterrupt):
+                with transaction_service.transaction():
+                    grade_service.remove_grades(1, 1)
+                    student_service.remove_student(1)
+                    raise KeyboardInterrupt()
+            database.close()
+            database = SqliteDatabase(database_file)
+            self.assertEqual(StudentSqliteRepository(database).get_student_data()[1], Student(1, "Pop", 911))
+            self.assertEqual(GradeSqliteRepository(database).get_grade_data()[1, 1], Grade(1, 1, 9))
+            database.close()
+
+    def test_transaction__file_repositories__persist_every_file_on_its_own(self):
+        # the file repositories have no commit record shared by their files, so a transaction is not atomic on disk:
+        # when the grades file can't be written, the students file is saved anyway and the grades are left orphaned
+        with tempfile.TemporaryDirectory() as directory:
+            students_file = os.path.join(directory, "students.txt")
+            grades_file = os.path.join(directory, "grades.txt")
+            with open(students_file, "wt") as file:
+                file.write("1/Pop/911\n")
+            with open(grades_file, "wt") as file:
+                file.write("1/1/9\n")
+            student_repository = StudentFileTextRepository(students_file)
+            grade_repository = GradeTextFileRepository(grades_file)
+            undo_redo_service = UndoRedoService(UndoRedoRepository())
+            student_service = StudentService(student_repository, undo_redo_service)
+            grade_service = GradeService(grade_repository, student_repository, None, undo_redo_service)
+            transaction_service = TransactionService(student_repository, AssignmentRepository(), grade_repository,
+                                                     undo_redo_service)
+            # the temporary file of the grades can't be created
+            os.mkdir(grades_file + ".tmp")
+            with self.assertRaises(OSError):
+                with transaction_service.transaction():
+                    grade_service.remove_grades(1, 1)
+                    student_service.remove_student(1)
+            with open(students_file, "rt") as file:
+                self.assertEqual(file.read(), "")
+            with open(grades_file, "rt") as file:
+                self.assertEqual(file.read(), "1/1/9\n")
+
+
+class undo_redo_file_tests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self._file_name = os.path.join(self._directory.name, "undo.journal")
+        self._student_repository = StudentRepository()
+        self._assignment_repository = AssignmentRepository()
+        self._grade_repository = GradeRepository()
+        self._assignment_repository.add_assignment(Assignment(1, "a", date(2021, 10, 10)))
+        self._undo_redo_repository = self._open_repository()
+
+    def tearDown(self) -> None:
+        self._undo_redo_repository.close()
+        self._directory.cleanup()
+
+    def _open_repository(self):
+        interpreter = UndoRecordInterpreter(self._student_repository, self._assignment_repository,
+                                            self._grade_repository)
+        return UndoRedoFileRepository(self._file_name, interpreter)
+
+    def _services(self):
+        undo_redo_service = UndoRedoService(self._undo_redo_repository)
+        student_service = StudentService(self._student_repository, undo_redo_service)
+        grade_service = GradeService(self._grade_repository, self._student_repository, self._assignment_repository,
+                                     undo_redo_service)
+        return undo_redo_service, student_service, grade_service
+
+    def test_undo__after_reopening__undo_the_history_from_the_file(self):
+        undo_redo_service, student_service, grade_service = self._services()
+        student_service.add_student(1, "Pop", 911)
+        student_service.add_student(2, "Rus", 911)
+        grade_service.give_assignment_to_a_group_of_students(1, 911)
+        grade_service.grade_student(1, 2, 8)
+        grade_service.remove_grades(1, 1)
+        self._student_repository.remove_student(1)
+        undo_redo_service.undo()
+        self._undo_redo_repository.close()
+        self._undo_redo_repository = self._open_repository()
+        undo_redo_service, student_service, grade_service = self._services()
+        self.assertEqual(self._undo_redo_repository.get_index_in_modification_history(), 3)
+        undo_redo_service.redo()
+        self.assertNotIn(1, self._student_repository.get_student_data())
+        for undo_count in range(5):
+            undo_redo_service.undo()
+        self.assertEqual(len(self._student_repository.get_student_data()), 0)
+        self.assertEqual(len(self._grade_repository.get_grade_data()), 0)
+        with self.assertRaises(UndoRedoServiceException):
+            undo_redo_service.undo()
+
+    def test_undo__transaction_after_reopening__undo_it_as_a_whole(self):
+        undo_redo_service, student_service, grade_service = self._services()
+        student_service.add_student(1, "Pop", 911)
+        with undo_redo_service.group_operations():
+            student_service.add_student(2, "Rus", 911)
+            grade_service.add_grade(1, 2, 10)
+        self._undo_redo_repository.close()
+        self._undo_redo_repository = self._open_repository()
+        undo_redo_service, student_service, grade_service = self._services()
+        undo_redo_service.undo()
+        self.assertEqual(list(self._student_repository.get_student_data()), [Student(1, "Pop", 911)])
+        self.assertEqual(len(self._grade_repository.get_grade_data()), 0)
+
+    def test_batch__file_repository__persist_the_history_once_after_the_file_is_saved(self):
+        file_name = os.path.join(self._directory.name, "students.txt")
+        with open(file_name, "wt"):
+            pass
+        student_repository = StudentFileTextRepository(file_name)
+        undo_redo_service = UndoRedoService(self._undo_redo_repository, (student_repository,))
+        student_service = StudentService(student_repository, undo_redo_service)
+        transaction_service = TransactionService(student_repository, self._assignment_repository,
+                                                 self._grade_repository, undo_redo_service)
+        saved_files = []
+        persist = self._undo_redo_repository.persist
+
+        def persist_after_reading_the_file():
+            if self._undo_redo_repository.has_unpersisted_modifications():
+                with open(file_name, "rt") as file:
+                    saved_files.append(file.read())
+            persist()
+
+        self._undo_redo_repository.persist = persist_after_reading_the_file
+        with transaction_service.batch():
+            for student_id in range(1, 4):
+                student_service.add_student(student_id, "Pop", 911)
+            undo_redo_service.undo()
+        self.assertEqual(saved_files, ["1/Pop/911\n2/Pop/911\n"])
+        self._undo_redo_repository.close()
+        self._undo_redo_repository = self._open_repository()
+        self.assertEqual(len(self._undo_redo_repository.get_modifications_history()), 3)
+        self.assertEqual(self._undo_redo_repository.get_index_in_modification_history(), 1)
+
+
+class undo_redo_concurrency_tests(unittest.TestCase):
+    def test_add_grade_and_undo__several_threads__keep_repository_and_history_consistent(self):
+        student_repository = StudentRepository()
+        grade_repository = GradeRepository()
+        undo_redo_service = UndoRedoService(UndoRedoRepository(max_operations=None),
+                                            (student_repository, grade_repository))
+        grade_service = GradeService(grade_repository, student_repository, None, undo_redo_service)
+
+        def give_and_undo(thread_index):
+            for assignment_id in range(100):
+                grade_service.add_grade(assignment_id, thread_index, assignment_id % 10 + 1)
+            for undo_index in range(25):
+                undo_redo_service.undo()
+
+        threads = [threading.Thread(target=give_and_undo, args=(thread_index,)) for thread_index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+            self.assertFalse(thread.is_alive())
+        self.assertEqual(len(grade_repository.get_grade_data()), 8 * 75)
+        self.assertEqual(undo_redo_service.get_history_metrics()["undoable_operations"], 8 * 75)
+        for student_id in range(8):
+            grades = grade_repository.get_grades_of_student(student_id)
+            self.assertEqual(grade_repository.get_average_grade_of_student(student_id),
+                             sum(grade.grade_value for grade in grades) / len(grades) if len(grades) != 0 else None)
+
+
+class test_undo_redo_service(unittest.TestCase):
+    def setUp(self) -> None:
+        undo_redo_repository = UndoRedoRepository()
+        self._student_repository = StudentRepository()
+        assignment_repository = AssignmentRepository()
+        grade_repository = GradeRepository()
+        self._undo_redo_service = UndoRedoService(undo_redo_repository)
+        self._assignment_service = AssignmentService(assignment_repository, self._undo_redo_service)
+        self._student_service = StudentService(self._student_repository, self._undo_redo_service)
+        self._grade_service = GradeService(grade_repository, self._student_repository, assignment_repository,
+                                           self._undo_redo_service)
 
     def tearDown(self) -> None:
         pass
@@ -484,6 +1234,19 @@ class test_undo_redo_service(unittest.TestCase):
         self._undo_redo_service.redo()
         self.assertEqual(self._grade_service.get_grades()[2,3001].grade_value, 8)
 
+    def test_undo_remove_grades_for_a_student__valid_undo__restore_the_grade_indexes(self):
+        self._student_service.add_student(3001, "someone", 917)
+        self._student_service.add_student(3002, "someone else", 917)
+        self._assignment_service.add_assignment(2, "something", date(2020, 10, 10))
+        self._grade_service.give_assignment_to_a_group_of_students(2, 917)
+        self._grade_service.remove_grades(3002, 1)
+        self._student_service.remove_student(3002)
+        self.assertEqual(self._grade_service.get_ungraded_assignments(), [Grade(2, 3001)])
+        self._undo_redo_service.undo()
+        self.assertEqual(self._grade_service.get_ungraded_assignments(), [Grade(2, 3001), Grade(2, 3002)])
+        self._undo_redo_service.redo()
+        self.assertEqual(self._grade_service.get_ungraded_assignments(), [Grade(2, 3001)])
+
     def test_undo__invalid_undo__raise_service_exception(self):
         self._student_service.add_student(3001, "someone", 917)
         self._undo_redo_service.undo()
@@ -496,3 +1259,14 @@ class test_undo_redo_service(unittest.TestCase):
         self._undo_redo_service.redo()
         with self.assertRaises(UndoRedoServiceException):
             self._undo_redo_service.redo()
+
+    def test_undo__failing_undo__undo_the_same_operation_next_time(self):
+        self._student_service.add_student(3000, "someone", 917)
+        self._student_service.add_student(3001, "someone else", 917)
+        self._student_repository.remove_student(3001)
+        with self.assertRaises(StudentRepositoryException):
+            self._undo_redo_service.undo()
+        self._student_repository.add_student(Student(3001, "someone else", 917))
+        self._undo_redo_service.undo()
+        self._undo_redo_service.undo()
+        self.assertEqual(len(self._student_service.get_students()), 0)
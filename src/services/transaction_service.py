@@ -0,0 +1,61 @@
+from contextlib import contextmanager, ExitStack
+
+from src.repository.read_write_lock import lock_in_order
+
+
+class TransactionService:
+    def __init__(self, student_repository, assignment_repository, grade_repository, undo_redo_service):
+        """
+        Initialize the transaction service, which groups modifications of several repositories into a unit of work
+        :param student_repository: a StudentRepository object
+        :param assignment_repository: a AssignmentRepository object
+        :param grade_repository: a GradeRepository object
+        :param undo_redo_service: a UndoRedoService object where the transactions are recorded
+        """
+        self._repositories = (student_repository, assignment_repository, grade_repository)
+        self._undo_redo_service = undo_redo_service
+
+    def _locking_all_repositories(self):
+        """
+        Lock the repositories for writing in the order of their locks, so two threads which group modifications never
+        wait for each other in a circle
+        """
+        return lock_in_order(write_locks=[repository.get_lock() for repository in self._repositories])
+
+    @contextmanager
+    def _repository_batches(self):
+        with ExitStack() as batches:
+            for repository in self._repositories:
+                batches.enter_context(repository.batch())
+            yield
+
+    @contextmanager
+    def batch(self):
+        """
+        Group the modifications of the with block in every repository, so each of them persists them once when the
+        block ends. The repositories are locked for writing before any of them starts its batch
+        """
+        with self._locking_all_repositories(), self._repository_batches():
+            yield
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run the modifications of the with block as one transaction: they are applied in memory, persisted once by
+        every repository when the block ends, and undone and redone as a single complex operation, which is recorded
+        only after the repositories persisted the modifications. If the block fails, the recorded modifications are
+        undone before the repositories persist anything. The other threads see the transaction only when it is done.
+        Only the sqlite repositories, which share one database, persist the transaction atomically, with a single
+        commit; the file and journal repositories persist it with one save or one fsync per file, one file after the
+        other, so a crash between two of them leaves some of the files without the transaction
+        """
+        with self._locking_all_repositories(), self._undo_redo_service.group_operations() as operations:
+            # the transaction may be part of a larger group, only its own operations are undone if it fails
+            first_operation = len(operations)
+            with self._repository_batches():
+                try:
+                    yield
+                except BaseException:
+                    while len(operations) > first_operation:
+                        operations.pop().undo()
+                    raise
@@ -0,0 +1,148 @@
+from datetime import date
+
+from src.domain.assignment import Assignment
+from src.domain.grade import Grade
+from src.domain.student import Student
+from src.domain.undo_redo import *
+
+
+class UndoRecordInterpreter:
+    def __init__(self, student_repository=None, assignment_repository=None, grade_repository=None):
+        """
+        Initialize the interpreter of the undo records, which applies them to the repositories. What a record keeps
+        depends on its operation code:
+            ADD_STUDENTS: keys = student ids, after = (names, groups)
+            REMOVE_STUDENT: keys = student id, before = (name, group, assignment ids of the removed grades, their
+                            values)
+            UPDATE_STUDENT_NAME, UPDATE_STUDENT_GROUP: keys = student id, before/after = the name or the group
+            ADD_ASSIGNMENTS: keys = assignment ids, after = (descriptions, deadlines as ordinal days)
+            REMOVE_ASSIGNMENT: keys = assignment id, before = (description, deadline as ordinal day, student ids of
+                               the removed grades, their values)
+            UPDATE_ASSIGNMENT_DESCRIPTION: keys = assignment id, before/after = the description
+            UPDATE_ASSIGNMENT_DEADLINE: keys = assignment id, before/after = the deadline as ordinal day
+            ADD_GRADES: keys = (assignment ids, student ids), after = grade values
+            GRADE: keys = (assignment id, student id), before/after = grade value
+        The grade values are kept as integers, 0 meaning ungraded
+        :param student_repository: a StudentRepository object, needed by the student records
+        :param assignment_repository: a AssignmentRepository object, needed by the assignment records
+        :param grade_repository: a GradeRepository object, needed by the grade, student removal and assignment removal
+                                 records
+        """
+        self._student_repository = student_repository
+        self._assignment_repository = assignment_repository
+        self._grade_repository = grade_repository
+        # operation code -> (undo function, redo function)
+        self._functions = {
+            ADD_STUDENTS: (self._remove_students, self._add_students),
+            REMOVE_STUDENT: (self._restore_student, self._remove_student),
+            UPDATE_STUDENT_NAME: (self._set_student_name_before, self._set_student_name_after),
+            UPDATE_STUDENT_GROUP: (self._set_student_group_before, self._set_student_group_after),
+            ADD_ASSIGNMENTS: (self._remove_assignments, self._add_assignments),
+            REMOVE_ASSIGNMENT: (self._restore_assignment, self._remove_assignment),
+            UPDATE_ASSIGNMENT_DESCRIPTION: (self._set_description_before, self._set_description_after),
+            UPDATE_ASSIGNMENT_DEADLINE: (self._set_deadline_before, self._set_deadline_after),
+            ADD_GRADES: (self._remove_grades, self._add_grades),
+            GRADE: (self._set_grade_value_before, self._set_grade_value_after),
+        }
+
+    def undo(self, record):
+        """
+        Undo the modification of a record
+        :param record: a UndoRecord object
+        """
+        self._functions[record.op_code][0](record)
+
+    def redo(self, record):
+        """
+        Redo the modification of a record
+        :param record: a UndoRecord object
+        """
+        self._functions[record.op_code][1](record)
+
+    def _add_students(self, record):
+        names, groups = record.after
+        with self._student_repository.batch():
+            for student_id, name, group in zip(record.keys, names, groups):
+                self._student_repository.add_student(Student(student_id, name, group))
+
+    def _remove_students(self, record):
+        with self._student_repository.batch():
+            for student_id in record.keys:
+                self._student_repository.remove_student(student_id)
+
+    def _restore_student(self, record):
+        name, group, assignment_ids, grade_values = record.before
+        self._student_repository.add_student(Student(record.keys, name, group))
+        with self._grade_repository.batch():
+            for assignment_id, grade_value in zip(assignment_ids, grade_values):
+                self._grade_repository.add_grade(Grade(assignment_id, record.keys, grade_value or None))
+
+    def _remove_student(self, record):
+        # the grades of the student are found with the index of the repository, with a single call
+        self._grade_repository.remove_grades(record.keys, 1)
+        self._student_repository.remove_student(record.keys)
+
+    def _set_student_name_before(self, record):
+        self._student_repository.update_student_name(record.keys, record.before)
+
+    def _set_student_name_after(self, record):
+        self._student_repository.update_student_name(record.keys, record.after)
+
+    def _set_student_group_before(self, record):
+        self._student_repository.update_student_group(record.keys, record.before)
+
+    def _set_student_group_after(self, record):
+        self._student_repository.update_student_group(record.keys, record.after)
+
+    def _add_assignments(self, record):
+        descriptions, deadlines = record.after
+        with self._assignment_repository.batch():
+            for assignment_id, description, deadline in zip(record.keys, descriptions, deadlines):
+                self._assignment_repository.add_assignment(Assignment(assignment_id, description,
+                                                                      date.fromordinal(deadline)))
+
+    def _remove_assignments(self, record):
+        with self._assignment_repository.batch():
+            for assignment_id in record.keys:
+                self._assignment_repository.remove_assignment(assignment_id)
+
+    def _restore_assignment(self, record):
+        description, deadline, student_ids, grade_values = record.before
+        self._assignment_repository.add_assignment(Assignment(record.keys, description, date.fromordinal(deadline)))
+        with self._grade_repository.batch():
+            for student_id, grade_value in zip(student_ids, grade_values):
+                self._grade_repository.add_grade(Grade(record.keys, student_id, grade_value or None))
+
+    def _remove_assignment(self, record):
+        self._grade_repository.remove_grades(record.keys, 0)
+        self._assignment_repository.remove_assignment(record.keys)
+
+    def _set_description_before(self, record):
+        self._assignment_repository.update_assignment_description(record.keys, record.before)
+
+    def _set_description_after(self, record):
+        self._assignment_repository.update_assignment_description(record.keys, record.after)
+
+    def _set_deadline_before(self, record):
+        self._assignment_repository.update_assignment_deadline(record.keys, date.fromordinal(record.before))
+
+    def _set_deadline_after(self, record):
+        self._assignment_repository.update_assignment_deadline(record.keys, date.fromordinal(record.after))
+
+    def _add_grades(self, record):
+        assignment_ids, student_ids = record.keys
+        with self._grade_repository.batch():
+            for assignment_id, student_id, grade_value in zip(assignment_ids, student_ids, record.after):
+                self._grade_repository.add_grade(Grade(assignment_id, student_id, grade_value or None))
+
+    def _remove_grades(self, record):
+        assignment_ids, student_ids = record.keys
+        with self._grade_repository.batch():
+            for assignment_id, student_id in zip(assignment_ids, student_ids):
+                self._grade_repository.remove_a_grade(assignment_id, student_id)
+
+    def _set_grade_value_before(self, record):
+        self._grade_repository.grade_student_for_a_given_assignment(Grade(*record.keys, record.before or None))
+
+    def _set_grade_value_after(self, record):
+        self._grade_repository.grade_student_for_a_given_assignment(Grade(*record.keys, record.after or None))
@@ -1,41 +1,112 @@
+import threading
+from contextlib import contextmanager
+
+from src.repository.read_write_lock import lock_in_order
+
+from src.domain.undo_redo import ComplexOperation
+
+
 class UndoRedoServiceException(Exception):
     pass
 
 class UndoRedoService:
 
-    def __init__(self, undo_redo_repository):
+    def __init__(self, undo_redo_repository, repositories=()):
         """
         Initialize the undo redo service
         :param undo_redo_repository: a undo redo repository object used for working with operations
+        :param repositories: the repositories modified by the operations; undo and redo hold their locks for writing,
+                             so the other threads never see an operation which is undone or redone halfway, and the
+                             history is persisted only after all of them committed the modifications it describes
         """
         self._undo_redo_repository = undo_redo_repository
+        self._repositories = tuple(repositories)
+        self._repository_locks = [repository.get_lock() for repository in self._repositories]
+        # every thread groups its own operations, the ones recorded inside a group, or None when no group is open
+        self._thread_state = threading.local()
 
     def undo(self):
         """
         Undo the last performed operation
         """
-        if self._undo_redo_repository.get_index_in_modification_history() < 0:
-            raise UndoRedoServiceException("Cannot undo anymore")
-        self._undo_redo_repository.update_index_in_modification_history(-1)
-        self._undo_redo_repository.get_modifications_history()[
-        self._undo_redo_repository.get_index_in_modification_history()+1].undo()
-
+        with lock_in_order(write_locks=self._repository_locks), \
+                self._undo_redo_repository.stepping_back_in_modification_history() as operation:
+            if operation is None:
+                raise UndoRedoServiceException("Cannot undo anymore")
+            operation.undo()
+        self._persist_after_commit()
 
     def redo(self):
         """
         Redo the recent program modification that you undo
         """
-        if self._undo_redo_repository.get_index_in_modification_history() + 1 >= len(self._undo_redo_repository.get_modifications_history()):
-            raise UndoRedoServiceException("Cannot redo anymore")
-        self._undo_redo_repository.update_index_in_modification_history(1)
-        self._undo_redo_repository.get_modifications_history()[
-        self._undo_redo_repository.get_index_in_modification_history()].redo()
-
-
+        with lock_in_order(write_locks=self._repository_locks), \
+                self._undo_redo_repository.stepping_forward_in_modification_history() as operation:
+            if operation is None:
+                raise UndoRedoServiceException("Cannot redo anymore")
+            operation.redo()
+        self._persist_after_commit()
 
     def record_operation(self, operation):
         """
         Add a new operation/complex operation to the undo/redo repository
         :param operation: a operation/complex operation object to add
         """
-        self._undo_redo_repository.add_new_operation_to_modifications_history(operation)
\ No newline at end of file
+        grouped_operations = getattr(self._thread_state, "grouped_operations", None)
+        if grouped_operations is not None:
+            grouped_operations.append(operation)
+        else:
+            self._undo_redo_repository.add_new_operation_to_modifications_history(operation)
+            self._persist_after_commit()
+
+    def _persist_after_commit(self):
+        """
+        Persist the history once every repository committed the modifications it describes: when the outermost batch
+        ends, so a batch of commands writes the history once, or right away outside of a batch. If the repositories
+        roll the batch back, the history goes back to the persisted one too
+        """
+        if not self._undo_redo_repository.has_unpersisted_modifications():
+            return
+        if len(self._repositories) == 0:
+            self._undo_redo_repository.persist()
+            return
+        uncommitted_repositories = [len(self._repositories)]
+
+        def persist_when_every_repository_committed():
+            uncommitted_repositories[0] -= 1
+            if uncommitted_repositories[0] == 0:
+                self._undo_redo_repository.persist()
+
+        for repository in self._repositories:
+            repository.after_commit(persist_when_every_repository_committed,
+                                    self._undo_redo_repository.revert_to_persisted)
+
+    @contextmanager
+    def group_operations(self):
+        """
+        Record the operations of the with block as a single complex operation, so they are undone and redone together;
+        if the block fails, the operations it recorded are undone and the error goes on. Nested groups belong to the
+        outermost one, and the operations recorded by other threads meanwhile don't belong to the group
+        :return: the list of the operations recorded so far in the group, the one of the outermost group if it's nested
+        """
+        if getattr(self._thread_state, "grouped_operations", None) is not None:
+            yield self._thread_state.grouped_operations
+            return
+        operations = self._thread_state.grouped_operations = []
+        try:
+            yield operations
+        except BaseException:
+            self._thread_state.grouped_operations = None
+            for operation in reversed(operations):
+                operation.undo()
+            raise
+        self._thread_state.grouped_operations = None
+        if len(operations) != 0:
+            self.record_operation(ComplexOperation(operations))
+
+    def get_history_metrics(self):
+        """
+        Get the numbers which describe the size of the modifications history
+        :return: a dictionary, see UndoRedoRepository.get_history_metrics
+        """
+        return self._undo_redo_repository.get_history_metrics()
@@ -1,65 +1,131 @@
+import argparse
+import os
+import sys
+
 from src.repository.student_repository import *
 from src.repository.assigment_repository import *
-from src.repository.undo_redo_repository import UndoRedoRepository
+from src.repository.undo_redo_repository import UndoRedoRepository, UndoRedoFileRepository, DEFAULT_MAX_OPERATIONS, \
+    DEFAULT_MAX_BYTES
 from src.services.student_service import StudentService
 from src.services.assignment_service import AssignmentService
 from src.ui.ui import UI
+from src.ui.batch_ui import BatchUI
 from src.repository.grade_repository import *
+from src.repository.sqlite_database import SqliteDatabase
+from src.repository.async_writer import AsyncFileWriter
 from src.services.grade_service import GradeService
+from src.services.statistics_cache import StatisticsCache
+from src.services.statistics_engine import StatisticsEngine
 from src.services.undo_redo_service import UndoRedoService
+from src.services.undo_record_interpreter import UndoRecordInterpreter
+from src.services.transaction_service import TransactionService
+
+# "start.py --batch script.txt" (or "--batch -" for the standard input) runs a script of commands instead of the menu
+argument_parser = argparse.ArgumentParser()
+argument_parser.add_argument("--batch", metavar="SCRIPT", help="run the commands of a script file, - for stdin")
+argument_parser.add_argument("--checkpoint", metavar="N", type=int,
+                             help="in batch mode, save the modifications after every N commands")
+arguments = argument_parser.parse_args()
 
+settings = dict()
 settings_file = open("settings.properties", "rt")
-lines = settings_file.readlines()
+for line in settings_file.readlines():
+    if "=" in line:
+        setting_name, setting_value = line.split(maxsplit=1, sep="=")
+        settings[setting_name.strip()] = setting_value.strip()
+settings_file.close()
 
-line_number = 0
-position_of_repository_type = 2
-repository_type = lines[line_number].split(maxsplit=3, sep=" ")[position_of_repository_type].strip()
+repository_type = settings["repository"]
+# "undo_max_operations" and "undo_max_bytes" limit the undo history, "none" removes the limit
+undo_max_operations = DEFAULT_MAX_OPERATIONS
+undo_max_bytes = DEFAULT_MAX_BYTES
+if "undo_max_operations" in settings:
+    undo_max_operations = None if settings["undo_max_operations"] == "none" else int(settings["undo_max_operations"])
+if "undo_max_bytes" in settings:
+    undo_max_bytes = None if settings["undo_max_bytes"] == "none" else int(settings["undo_max_bytes"])
 
 if repository_type == "inmemory":
     student_repository = StudentRepository()
     assignment_repository = AssignmentRepository()
     grade_repository = GradeRepository()
-    undo_redo_repository = UndoRedoRepository()
+    undo_redo_repository = UndoRedoRepository(undo_max_operations, undo_max_bytes)
 
-    undo_redo_service = UndoRedoService(undo_redo_repository)
+    undo_redo_service = UndoRedoService(undo_redo_repository,
+                                        (student_repository, assignment_repository, grade_repository))
     student_service = StudentService(student_repository, undo_redo_service)
     assignment_service = AssignmentService(assignment_repository, undo_redo_service)
-    grade_service = GradeService(grade_repository, student_repository, assignment_repository, undo_redo_service)
+    # with "statistics = numpy" the reports are computed by the numpy statistics engine
+    statistics_engine = StatisticsEngine(grade_repository, student_repository, assignment_repository) \
+        if settings.get("statistics") == "numpy" else None
+    grade_service = GradeService(grade_repository, student_repository, assignment_repository, undo_redo_service,
+                                 statistics_engine, StatisticsCache())
 
     student_service.generate_students()
     assignment_service.generate_assignments()
     grade_service.generate_grades()
 
 else:
-    position_of_file_location = 2
-
-    line_number = 1
-    assignments_file_location = lines[line_number].split(maxsplit=3, sep=" ")[
-        position_of_file_location].strip()
-
-    line_number = 2
-    students_file_location = lines[line_number].split(maxsplit=3, sep=" ")[
-        position_of_file_location].strip()
-
-    line_number = 3
-    grades_file_location = lines[line_number].split(maxsplit=3, sep=" ")[
-        position_of_file_location].strip()
+    assignments_file_location = settings["assignments"]
+    students_file_location = settings["students"]
+    grades_file_location = settings["grades"]
+    # with "persistence = async" the text and binary files are written by a background thread
+    writer = AsyncFileWriter() if settings.get("persistence") == "async" else None
 
     if repository_type == "textfiles":
-        student_repository = StudentFileTextRepository(students_file_location)
-        assignment_repository = AssignmentTextFileRepository(assignments_file_location)
-        grade_repository = GradeTextFileRepository(grades_file_location)
-        undo_redo_repository = UndoRedoRepository()
+        student_repository = StudentFileTextRepository(students_file_location, writer)
+        assignment_repository = AssignmentTextFileRepository(assignments_file_location, writer)
+        grade_repository = GradeTextFileRepository(grades_file_location, writer)
+        undo_redo_repository = UndoRedoRepository(undo_max_operations, undo_max_bytes)
     elif repository_type == "binaryfiles":
-        student_repository = StudentBinaryFileRepository(students_file_location)
-        assignment_repository = AssignmentBinaryFileRepository(assignments_file_location)
-        grade_repository = GradeBinaryFileRepository(grades_file_location)
-        undo_redo_repository = UndoRedoRepository()
+        student_repository = StudentBinaryFileRepository(students_file_location, writer)
+        assignment_repository = AssignmentBinaryFileRepository(assignments_file_location, writer)
+        grade_repository = GradeBinaryFileRepository(grades_file_location, writer)
+        undo_redo_repository = UndoRedoRepository(undo_max_operations, undo_max_bytes)
+    elif repository_type == "journal":
+        # the journals are kept next to the configured files, e.g. students.txt -> students.journal
+        student_repository = StudentJournalRepository(os.path.splitext(students_file_location)[0] + ".journal")
+        assignment_repository = AssignmentJournalRepository(
+            os.path.splitext(assignments_file_location)[0] + ".journal")
+        grade_repository = GradeJournalRepository(os.path.splitext(grades_file_location)[0] + ".journal")
+        undo_redo_repository = UndoRedoRepository(undo_max_operations, undo_max_bytes)
+    elif repository_type == "columnar":
+        # the grades are kept in a memory-mapped file next to the configured one, e.g. grades.bin -> grades.col
+        student_repository = StudentBinaryFileRepository(students_file_location, writer)
+        assignment_repository = AssignmentBinaryFileRepository(assignments_file_location, writer)
+        grade_repository = GradeColumnarRepository(os.path.splitext(grades_file_location)[0] + ".col")
+        undo_redo_repository = UndoRedoRepository(undo_max_operations, undo_max_bytes)
+    elif repository_type == "sqlite":
+        database = SqliteDatabase(settings["database"])
+        student_repository = StudentSqliteRepository(database)
+        assignment_repository = AssignmentSqliteRepository(database)
+        grade_repository = GradeSqliteRepository(database)
+        undo_redo_repository = UndoRedoRepository(undo_max_operations, undo_max_bytes)
+
+    # with "undo_history = <file>" the undo history is kept in a file, so it can be undone after a restart too
+    if "undo_history" in settings:
+        undo_redo_repository = UndoRedoFileRepository(settings["undo_history"], UndoRecordInterpreter(
+            student_repository, assignment_repository, grade_repository))
 
-    undo_redo_service = UndoRedoService(undo_redo_repository)
+    undo_redo_service = UndoRedoService(undo_redo_repository,
+                                        (student_repository, assignment_repository, grade_repository))
     student_service = StudentService(student_repository, undo_redo_service)
     assignment_service = AssignmentService(assignment_repository, undo_redo_service)
-    grade_service = GradeService(grade_repository, student_repository, assignment_repository, undo_redo_service)
-ui = UI(student_service, assignment_service, grade_service, undo_redo_service)
-ui.start()
+    # with "statistics = numpy" the reports are computed by the numpy statistics engine
+    statistics_engine = StatisticsEngine(grade_repository, student_repository, assignment_repository) \
+        if settings.get("statistics") == "numpy" else None
+    grade_service = GradeService(grade_repository, student_repository, assignment_repository, undo_redo_service,
+                                 statistics_engine, StatisticsCache())
+# the modifications which span several repositories, like removing a student with the grades, run as transactions
+transaction_service = TransactionService(student_repository, assignment_repository, grade_repository,
+                                         undo_redo_service)
+if arguments.batch is None:
+    ui = UI(student_service, assignment_service, grade_service, undo_redo_service, transaction_service)
+    ui.start()
+else:
+    script_file = sys.stdin if arguments.batch == "-" else open(arguments.batch, "rt")
+    batch_ui = BatchUI(student_service, assignment_service, grade_service, undo_redo_service, transaction_service)
+    failed_commands = batch_ui.run(script_file, arguments.checkpoint)
+    if script_file is not sys.stdin:
+        script_file.close()
+    sys.exit(1 if failed_commands != 0 else 0)
 
@@ -0,0 +1,199 @@
+import shlex
+import sys
+import time
+from contextlib import ExitStack
+from datetime import date
+
+from src.repository.student_repository import StudentRepositoryException
+from src.repository.assigment_repository import AssignmentRepositoryException
+from src.repository.grade_repository import GradeRepositoryException
+from src.services.undo_redo_service import UndoRedoServiceException
+from src.repository.async_writer import PersistenceException
+from src.services.report_export import ReportExportException
+
+# report name in a script -> report name of the grade service
+REPORT_NAMES = {"grades": "grades", "ranking": "assignment ranking", "late": "late students",
+                "averages": "average ranking"}
+
+COMMAND_ERRORS = (ValueError, TypeError, IndexError, KeyError, StudentRepositoryException,
+                  AssignmentRepositoryException, GradeRepositoryException, UndoRedoServiceException,
+                  PersistenceException, ReportExportException, OSError)
+
+
+class BatchUI:
+    def __init__(self, student_service, assignment_service, grade_service, undo_redo_service, transaction_service,
+                 output=None):
+        """
+        Initialize the batch user interface, which runs a script of commands instead of asking for them. A script has
+        a command per line, with the arguments separated by spaces (quotes group the arguments with spaces); empty
+        lines and lines starting with # are skipped. The commands are:
+            add_student ID NAME GROUP, remove_student ID, update_student_name ID NAME, update_student_group ID GROUP,
+            add_assignment ID DESCRIPTION DEADLINE, remove_assignment ID,
+            update_assignment_description ID DESCRIPTION, update_assignment_deadline ID DEADLINE,
+            give ASSIGNMENT_ID STUDENT_ID, give_group ASSIGNMENT_ID GROUP, grade ASSIGNMENT_ID STUDENT_ID VALUE,
+            undo, redo, history (the size of the undo history), checkpoint, report csv|json grades|ranking ASSIGNMENT_ID|late|averages
+        :param transaction_service: a TransactionService object, the removals of students and assignments run as
+                                    transactions
+        :param output: a text file object where the results are written, or None for the console
+        """
+        self._student_service = student_service
+        self._assignment_service = assignment_service
+        self._grade_service = grade_service
+        self._undo_redo_service = undo_redo_service
+        self._transaction_service = transaction_service
+        self._output = output
+        self._commands = {
+            "add_student": self._add_student,
+            "remove_student": self._remove_student,
+            "update_student_name": self._update_student_name,
+            "update_student_group": self._update_student_group,
+            "add_assignment": self._add_assignment,
+            "remove_assignment": self._remove_assignment,
+            "update_assignment_description": self._update_assignment_description,
+            "update_assignment_deadline": self._update_assignment_deadline,
+            "give": self._give,
+            "give_group": self._give_group,
+            "grade": self._grade,
+            "undo": self._undo,
+            "redo": self._redo,
+            "history": self._history,
+            "report": self._report,
+        }
+
+    def _write(self, text):
+        (self._output or sys.stdout).write(text + "\n")
+
+    def run(self, script, checkpoint_every=None):
+        """
+        Run the commands of a script; the repositories save the modifications only at the checkpoints and at the end
+        of the script, not after every command, and the other threads wait for the repositories until then. A failed
+        command is reported and the script goes on. If the script stops on another error (e.g. KeyboardInterrupt),
+        the sqlite repositories roll back the commands since the last checkpoint and the undo history goes back with
+        them, since it is persisted only when the repositories commit; the file repositories save those commands,
+        and the undo history with them
+        :param script: a text file object, or any iterable of lines
+        :param checkpoint_every: a integer, the modifications are saved after this many commands, or None for saving
+                                 them only at the checkpoint commands and at the end
+        :return: a integer, the number of failed commands
+        """
+        command_count = 0
+        failed_count = 0
+        script_start = time.perf_counter()
+        with ExitStack() as batches:
+            self._enter_batches(batches)
+            for line_number, line in enumerate(script, 1):
+                line = line.strip()
+                if line == "" or line.startswith("#"):
+                    continue
+                command_count += 1
+                command_name = line.split()[0]
+                command_start = time.perf_counter()
+                try:
+                    arguments = shlex.split(line)
+                    if command_name == "checkpoint":
+                        self._checkpoint(batches)
+                    elif command_name in self._commands:
+                        self._commands[command_name](*arguments[1:])
+                    else:
+                        raise ValueError("Unknown command: " + command_name)
+                    result = "ok"
+                except COMMAND_ERRORS as error_message:
+                    failed_count += 1
+                    result = "error: " + str(error_message)
+                self._write("line " + str(line_number) + ": " + command_name + " " + result + " (" +
+                            self._format_time(time.perf_counter() - command_start) + ")")
+                if checkpoint_every is not None and command_count % checkpoint_every == 0:
+                    self._checkpoint(batches)
+            commit_start = time.perf_counter()
+        self._flush()
+        self._write("commit (" + self._format_time(time.perf_counter() - commit_start) + ")")
+        self._write(str(command_count) + " commands, " + str(failed_count) + " failed (" +
+                    self._format_time(time.perf_counter() - script_start) + ")")
+        return failed_count
+
+    @staticmethod
+    def _format_time(seconds):
+        return format(seconds * 1000, ".3f") + " ms"
+
+    def _enter_batches(self, batches):
+        batches.enter_context(self._transaction_service.batch())
+
+    def _checkpoint(self, batches):
+        """
+        Save the modifications done so far and go on grouping the next ones
+        """
+        batches.close()
+        self._flush()
+        self._enter_batches(batches)
+
+    def _flush(self):
+        self._student_service.flush()
+        self._assignment_service.flush()
+        self._grade_service.flush()
+        self._student_service.check_persistence_errors()
+        self._assignment_service.check_persistence_errors()
+        self._grade_service.check_persistence_errors()
+
+    def _add_student(self, student_id, name, group):
+        self._student_service.add_student(int(student_id), name, int(group))
+
+    def _remove_student(self, student_id):
+        student_id = int(student_id)
+        self._student_service.check_valid_student(student_id)
+        with self._transaction_service.transaction():
+            self._grade_service.remove_grades(student_id, 1)
+            self._student_service.remove_student(student_id)
+
+    def _update_student_name(self, student_id, name):
+        self._student_service.update_student_name(int(student_id), name)
+
+    def _update_student_group(self, student_id, group):
+        self._student_service.update_student_group(int(student_id), int(group))
+
+    def _add_assignment(self, assignment_id, description, deadline):
+        self._assignment_service.add_assignment(int(assignment_id), description, date.fromisoformat(deadline))
+
+    def _remove_assignment(self, assignment_id):
+        assignment_id = int(assignment_id)
+        self._assignment_service.check_valid_assignment(assignment_id)
+        with self._transaction_service.transaction():
+            self._grade_service.remove_grades(assignment_id, 0)
+            self._assignment_service.remove_assignment(assignment_id)
+
+    def _update_assignment_description(self, assignment_id, description):
+        self._assignment_service.update_assignment_description(int(assignment_id), description)
+
+    def _update_assignment_deadline(self, assignment_id, deadline):
+        self._assignment_service.update_assignment_deadline(int(assignment_id), date.fromisoformat(deadline))
+
+    def _give(self, assignment_id, student_id):
+        self._grade_service.give_assignment(int(assignment_id), int(student_id))
+
+    def _give_group(self, assignment_id, group):
+        assignment_id = int(assignment_id)
+        self._assignment_service.check_valid_assignment(assignment_id)
+        self._grade_service.give_assignment_to_a_group_of_students(assignment_id, int(group))
+
+    def _grade(self, assignment_id, student_id, grade_value):
+        self._grade_service.grade_student(int(assignment_id), int(student_id), int(grade_value))
+
+    def _undo(self):
+        self._undo_redo_service.undo()
+
+    def _redo(self):
+        self._undo_redo_service.redo()
+
+    def _history(self):
+        metrics = self._undo_redo_service.get_history_metrics()
+        self._write(", ".join(name + ": " + str(value) for name, value in metrics.items()))
+
+    def _report(self, file_format, report_name, *report_arguments):
+        if report_name not in REPORT_NAMES:
+            raise ValueError("Unknown report: " + report_name)
+        if report_name == "ranking":
+            if len(report_arguments) != 1:
+                raise ValueError("The ranking report needs an assignment id")
+            self._grade_service.export_report(REPORT_NAMES[report_name], self._output or sys.stdout, file_format,
+                                              assignment_id=int(report_arguments[0]))
+        else:
+            self._grade_service.export_report(REPORT_NAMES[report_name], self._output or sys.stdout, file_format)
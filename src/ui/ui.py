@@ -2,16 +2,22 @@ from src.repository.student_repository import StudentRepositoryException
 from src.repository.assigment_repository import AssignmentRepositoryException
 from src.repository.grade_repository import GradeRepositoryException
 from src.services.undo_redo_service import UndoRedoServiceException
+from src.repository.async_writer import PersistenceException
+from src.services.report_export import ReportExportException
+
+import os
+import sys
 
 from datetime import date
 
 
 class UI:
-    def __init__(self, student_service, assignment_service, grade_service, undo_redo_service):
+    def __init__(self, student_service, assignment_service, grade_service, undo_redo_service, transaction_service):
         self._student_service = student_service
         self._assignment_service = assignment_service
         self._grade_service = grade_service
         self._undo_redo_service = undo_redo_service
+        self._transaction_service = transaction_service
 
     @staticmethod
     def print_menu():
@@ -50,18 +56,27 @@ class UI:
         print("1. Display all students who received a given assignment, ordered descending by grade")
         print("2. Display all students who are late in handing in at least one assignment")
         print("3. Display Students with the best school situation")
+        print("4. Export a report to a CSV/JSON file")
+        print()
+
+    @staticmethod
+    def print_export_menu():
+        print("1. All the grades")
+        print("2. Students who received a given assignment, ordered descending by grade")
+        print("3. Students who are late in handing in at least one assignment")
+        print("4. Students ordered descending by average grade")
         print()
 
     def print_students(self):
-        for student in self._student_service.get_students():
+        for student in self._student_service.list_students():
             print(student)
 
     def print_assignments(self):
-        for assignment in self._assignment_service.get_assignments():
+        for assignment in self._assignment_service.list_assignments():
             print(assignment)
 
     def print_grades(self):
-        for grade in self._grade_service.get_grades():
+        for grade in self._grade_service.list_grades():
             print(grade)
 
     def print_ungraded_assignments(self):
@@ -70,9 +85,10 @@ class UI:
             print(str(current_index + 1) + " --> " + str(ungraded_assignments_list[current_index]))
 
     def print_sorted_students_descending_by_grade_value_for_a_given_assignment(self, assignment_id):
+        students = self._student_service.get_students()
         for grade in self._grade_service.get_list_of_sorted_students_descending_by_grade_value_for_a_given_assignment(
                 assignment_id):
-            print(str(self._student_service.get_students()[grade.student_id]) + " Grade: " + str(grade.grade_value))
+            print(str(students[grade.student_id]) + " Grade: " + str(grade.grade_value))
 
     def print_students_who_are_late_in_handing_in_at_least_one_assignment(self):
         for student in self._grade_service.get_list_of_all_students_who_are_late_in_handing_in_at_least_one_assignment():
@@ -80,11 +96,50 @@ class UI:
 
     def print_students_with_the_best_school_situation(self):
         good_grade = 5
-        students_list = self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments()
-        for student_id in students_list:
-            if students_list[student_id] >= good_grade:
-                print(str(self._student_service.get_students()[student_id]) + " Average grade: " + str(
-                    students_list[student_id]))
+        students_list = self._grade_service.get_list_of_students_sorted_descending_by_average_grade_received_for_all_assignments(
+            min_average=good_grade)
+        students = self._student_service.get_students()
+        for student_id, average_grade in students_list:
+            print(str(students[student_id]) + " Average grade: " + str(average_grade))
+
+    def export_report(self):
+        self.print_export_menu()
+        user_option = int(input("Input a option: "))
+        report_arguments = dict()
+        if user_option == 1:
+            report_name = "grades"
+        elif user_option == 2:
+            report_name = "assignment ranking"
+            report_arguments["assignment_id"] = self.input_assignment_id()
+        elif user_option == 3:
+            report_name = "late students"
+        elif user_option == 4:
+            report_name = "average ranking"
+        else:
+            raise ValueError("Invalid option")
+        file_format = input("Enter the format (csv/json): ").strip().lower()
+        file_name = input("Enter the file name (empty for the console): ").strip()
+        if file_name == "":
+            row_count = self._grade_service.export_report(report_name, sys.stdout, file_format, **report_arguments)
+        else:
+            # the report is written next to the file and replaces it only when it is complete, so a unknown format
+            # or a failing report leaves the old file as it was
+            temporary_file_name = file_name + ".tmp"
+            try:
+                with open(temporary_file_name, "wt", newline="", buffering=1 << 16) as file:
+                    row_count = self._grade_service.export_report(report_name, file, file_format,
+                                                                  **report_arguments)
+                os.replace(temporary_file_name, file_name)
+            except BaseException:
+                if os.path.exists(temporary_file_name):
+                    os.remove(temporary_file_name)
+                raise
+        print(str(row_count) + " rows exported")
+
+    def check_persistence_errors(self):
+        self._student_service.check_persistence_errors()
+        self._assignment_service.check_persistence_errors()
+        self._grade_service.check_persistence_errors()
 
     @staticmethod
     def input_student_id():
@@ -117,6 +172,7 @@ class UI:
     def start(self):
         while True:
             try:
+                self.check_persistence_errors()
                 self.print_menu()
                 user_option = int(input("Input a option: "))
                 if user_option == 1:
@@ -132,8 +188,10 @@ class UI:
                         student_id = self.input_student_id()
                         self._student_service.check_valid_student(student_id)
                         id_position = 1
-                        self._grade_service.remove_grades(student_id, id_position)
-                        self._student_service.remove_student(student_id)
+                        # the grades and the student are removed, saved and undone together
+                        with self._transaction_service.transaction():
+                            self._grade_service.remove_grades(student_id, id_position)
+                            self._student_service.remove_student(student_id)
                         print("Student removed successfully")
                     elif user_option == 3:
                         student_id = self.input_student_id()
@@ -163,8 +221,9 @@ class UI:
                         assignment_id = self.input_assignment_id()
                         self._assignment_service.check_valid_assignment(assignment_id)
                         id_position = 0
-                        self._grade_service.remove_grades(assignment_id, id_position)
-                        self._assignment_service.remove_assignment(assignment_id)
+                        with self._transaction_service.transaction():
+                            self._grade_service.remove_grades(assignment_id, id_position)
+                            self._assignment_service.remove_assignment(assignment_id)
                         print("Assignment removed successfully")
                     elif user_option == 3:
                         assignment_id = self.input_assignment_id()
@@ -179,9 +238,7 @@ class UI:
                     elif user_option == 5:
                         assignment_id = self.input_assignment_id()
                         student_id = self.input_student_id()
-                        self._assignment_service.check_valid_assignment(assignment_id)
-                        self._student_service.check_valid_student(student_id)
-                        self._grade_service.add_grade(assignment_id, student_id)
+                        self._grade_service.give_assignment(assignment_id, student_id)
                         print("Assignment given successfully")
                     elif user_option == 6:
                         assignment_id = self.input_assignment_id()
@@ -212,6 +269,8 @@ class UI:
                         self.print_students_who_are_late_in_handing_in_at_least_one_assignment()
                     elif user_option == 3:
                         self.print_students_with_the_best_school_situation()
+                    elif user_option == 4:
+                        self.export_report()
                 elif user_option == 4:
                     self._undo_redo_service.undo()
                     print("Undo successfully")
@@ -219,6 +278,9 @@ class UI:
                     self._undo_redo_service.redo()
                     print("Redo successfully")
                 elif user_option == 6:
+                    self._student_service.flush()
+                    self._assignment_service.flush()
+                    self._grade_service.flush()
                     return
                 else:
                     raise ValueError("Invalid option")
@@ -240,4 +302,10 @@ class UI:
                 print(error_message)
             except UndoRedoServiceException as error_message:
                 print(error_message)
+            except PersistenceException as error_message:
+                print(error_message)
+            except ReportExportException as error_message:
+                print(error_message)
+            except OSError as error_message:
+                print(error_message)
             print()